@@ -179,12 +179,14 @@ async def get_priority_queue(
     # Try to get AI priority scores, but fall back to heuristic scoring if AI fails
     scores_map = {}
     try:
+        # Whole hours keep the prompt (and its cached response) stable across refreshes
+        prompt_items = [{**item, "age_hours": round(item["age_hours"])} for item in items]
         prompt = (
             "You are a triage assistant for a cybercrime dashboard.\n"
             "For each item, assign:\n"
             '- \"priority_score\" between 0 and 100 (higher = more urgent)\n'
             '- \"recommended_action\" from [\"freeze\", \"monitor\", \"escalate\", \"review_later\"].\n\n'
-            f"Items:\n{items}\n\n"
+            f"Items:\n{prompt_items}\n\n"
             "Return ONLY JSON: {\"items\": [{\"id\": \"...\", \"priority_score\": 90, \"recommended_action\": \"freeze\"}, ...]}"
         )
 
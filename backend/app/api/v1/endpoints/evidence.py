@@ -115,7 +115,7 @@ async def download_evidence(evidence_id: int, db: Session = Depends(get_db)):
             status_code=404, 
             detail="Evidence file not found on disk. The file may have been deleted or moved."
         )
-    emit_core_event(
+    await emit_core_event(
         action="evidence.download",
         evidence_id=evidence_item.evidence_id,
         case_id=str(evidence_item.case_id) if evidence_item.case_id else None,
@@ -147,7 +147,7 @@ async def view_evidence(evidence_id: int, db: Session = Depends(get_db)):
             status_code=404, 
             detail="Evidence file not found on disk. The file may have been deleted or moved."
         )
-    emit_core_event(
+    await emit_core_event(
         action="evidence.view",
         evidence_id=evidence_item.evidence_id,
         case_id=str(evidence_item.case_id) if evidence_item.case_id else None,
@@ -228,7 +228,7 @@ async def create_evidence(
             f.write(content)
 
         # Attempt sovereign bucket store (graceful degradation to local storage).
-        store_evidence_in_bucket(
+        await store_evidence_in_bucket(
             evidence_id=evidence_id,
             sha256=file_hash,
             filename=file.filename or safe_filename,
@@ -269,7 +269,7 @@ async def create_evidence(
             "high": 0.75,
             "critical": 0.95,
         }.get((risk_level or "").lower(), 0.0)
-        emit_core_event(
+        await emit_core_event(
             action="evidence.upload",
             evidence_id=evidence_id,
             case_id=str(db_evidence.case_id) if db_evidence.case_id else None,
@@ -4,7 +4,9 @@ Fraud Prediction API endpoints
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, List, Dict
+from pydantic import BaseModel
+import asyncio
 import sys
 import os
 
@@ -13,35 +15,42 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirna
 
 from app.db.database import get_db
 from app.db.models import FraudTransaction
-from ml_training.predict_fraud import predict_transaction, load_model
+from ml_training.predict_fraud import predict_transaction, predict_batch
+from ml_training.model_registry import get_model_registry
+from ml_training.prediction_store import join_predictions, resolve_predictions_offloaded, get_store_status, request_refresh
+from app.core.inference_executor import InferenceQueueFull, get_inference_executor
 
 router = APIRouter()
 
+MAX_BATCH_SIZE = 50000
+
+REQUIRED_TRANSACTION_FIELDS = ["step", "type", "amount", "nameOrig", "oldbalanceOrg",
+                               "newbalanceOrig", "nameDest"]
+
+
+class BatchPredictionRequest(BaseModel):
+    transactions: Optional[List[Dict]] = None
+    transaction_ids: Optional[List[int]] = None
+
 
 @router.get("/predict/{transaction_id}")
 async def predict_fraud_for_transaction(
     transaction_id: int,
     db: Session = Depends(get_db)
 ):
-    """Predict fraud for a specific transaction"""
+    """Predict fraud for a specific transaction (stored prediction if already scored)"""
     try:
-        # Get transaction
-        tx = db.query(FraudTransaction).filter(FraudTransaction.id == transaction_id).first()
-        if not tx:
+        loaded = await asyncio.to_thread(get_model_registry().get)
+        
+        # Get transaction with its stored prediction, if any
+        row = join_predictions(db.query(FraudTransaction), loaded.version).filter(
+            FraudTransaction.id == transaction_id
+        ).first()
+        if not row:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
-        # Predict
-        prediction = predict_transaction(transaction_data={
-            "step": tx.step,
-            "type": tx.type,
-            "amount": tx.amount,
-            "nameOrig": tx.name_orig,
-            "oldbalanceOrg": tx.old_balance_orig,
-            "newbalanceOrig": tx.new_balance_orig,
-            "nameDest": tx.name_dest,
-            "oldbalanceDest": tx.old_balance_dest or 0,
-            "newbalanceDest": tx.new_balance_dest or 0,
-        })
+        tx = row[0]
+        prediction = (await resolve_predictions_offloaded([row]))[0]
         
         return {
             "transaction_id": transaction_id,
@@ -49,6 +58,10 @@ async def predict_fraud_for_transaction(
             "prediction": prediction,
             "match": tx.is_fraud == prediction["is_fraud"]
         }
+    except HTTPException:
+        raise
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Inference queue is full. Please retry shortly.")
     except FileNotFoundError as e:
         raise HTTPException(status_code=503, detail="Model not trained yet. Please train the model first.")
     except Exception as e:
@@ -62,10 +75,7 @@ async def predict_fraud_for_transaction_data(
 ):
     """Predict fraud for transaction data (without saving to DB)"""
     try:
-        required_fields = ["step", "type", "amount", "nameOrig", "oldbalanceOrg", 
-                          "newbalanceOrig", "nameDest"]
-        
-        for field in required_fields:
+        for field in REQUIRED_TRANSACTION_FIELDS:
             if field not in transaction:
                 raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
         
@@ -73,12 +83,58 @@ async def predict_fraud_for_transaction_data(
         transaction.setdefault("oldbalanceDest", 0)
         transaction.setdefault("newbalanceDest", 0)
         
-        prediction = predict_transaction(transaction_data=transaction)
+        prediction = await get_inference_executor().run_cpu(predict_transaction, transaction_data=transaction)
         
         return {
             "prediction": prediction,
             "transaction_data": transaction
         }
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Inference queue is full. Please retry shortly.")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail="Model not trained yet. Please train the model first.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+
+@router.post("/predict/batch")
+async def predict_fraud_batch(
+    request: BatchPredictionRequest,
+    db: Session = Depends(get_db)
+):
+    """Predict fraud for many transactions (by ID or raw data) in one vectorized pass"""
+    try:
+        if request.transactions is None and request.transaction_ids is None:
+            raise HTTPException(status_code=400, detail="Provide transactions or transaction_ids")
+        if request.transactions is not None and request.transaction_ids is not None:
+            raise HTTPException(status_code=400, detail="Provide either transactions or transaction_ids, not both")
+        
+        size = len(request.transactions if request.transactions is not None else request.transaction_ids)
+        if size > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"Batch too large: {size} > {MAX_BATCH_SIZE}")
+        
+        if request.transactions is not None:
+            for index, transaction in enumerate(request.transactions):
+                for field in REQUIRED_TRANSACTION_FIELDS:
+                    if field not in transaction:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"Missing required field: {field} (transaction {index})"
+                        )
+                transaction.setdefault("oldbalanceDest", 0)
+                transaction.setdefault("newbalanceDest", 0)
+            result = await get_inference_executor().run_cpu(predict_batch, transactions=request.transactions)
+        else:
+            result = await get_inference_executor().run_cpu(predict_batch, transaction_ids=request.transaction_ids)
+        
+        return {
+            "count": len(result["predictions"]),
+            **result
+        }
+    except HTTPException:
+        raise
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Inference queue is full. Please retry shortly.")
     except FileNotFoundError as e:
         raise HTTPException(status_code=503, detail="Model not trained yet. Please train the model first.")
     except Exception as e:
@@ -89,11 +145,16 @@ async def predict_fraud_for_transaction_data(
 async def get_model_status():
     """Check if model is available"""
     try:
-        model, metadata = load_model()
+        registry = get_model_registry()
+        loaded = await asyncio.to_thread(registry.get)
         return {
             "available": True,
-            "model_type": type(model).__name__,
-            "metadata": metadata
+            "model_type": type(loaded.model).__name__,
+            "version": loaded.version,
+            "feature_columns": loaded.feature_columns,
+            "loaded_at": loaded.loaded_at,
+            "reload_count": registry.reload_count,
+            "metadata": loaded.metadata
         }
     except FileNotFoundError:
         raise HTTPException(
@@ -102,3 +163,29 @@ async def get_model_status():
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unable to load fraud model.") from e
+
+
+@router.get("/store/status")
+async def get_prediction_store_status(db: Session = Depends(get_db)):
+    """Watermark and row counts of the persisted prediction store"""
+    try:
+        return get_store_status(db)
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="Model not trained yet. Please train the model first.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading prediction store: {str(e)}")
+
+
+@router.post("/store/refresh")
+async def refresh_prediction_store(db: Session = Depends(get_db)):
+    """Start scoring transactions above the watermark in the background"""
+    try:
+        started = request_refresh()
+        return {
+            "started": started,
+            **get_store_status(db)
+        }
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="Model not trained yet. Please train the model first.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refreshing prediction store: {str(e)}")
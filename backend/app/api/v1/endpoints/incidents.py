@@ -3,12 +3,14 @@ Incident Report API endpoints
 Analyzes wallet addresses and generates fraud risk reports
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, func
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+import asyncio
 import sys
 import os
 import json
@@ -17,24 +19,26 @@ import json
 backend_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 sys.path.insert(0, backend_path)
 
-from app.db.database import get_db
-from app.db.models import IncidentReport, FraudTransaction, User
+from app.db.database import get_db, SessionLocal
+from app.db.models import IncidentReport, User
 from app.api.v1.schemas import IncidentReportRequest, IncidentReportResponse
-from app.core.ai_service import generate_ai_conclusion, check_ai_available
+from app.core.ai_service import generate_ai_conclusion_async, check_ai_available
 from app.core.ai_orchestrator import call_incident_orchestrator
+from app.core.config import settings
+from app.core.job_queue import enqueue_job, get_job, register_job_handler, request_cancel
 from app.core.security import decode_access_token
+from app.core.transaction_graph import get_transaction_graph
 from app.core.audit_logging import emit_audit_log
 from synthetic_data_generator.generator import generate_wallet_transactions, random_wallet
-from synthetic_data_generator.suspicious_patterns import (
-    calculate_risk_score,
-    detect_rapid_consolidation,
-    detect_layering,
-    detect_circular_pattern
-)
+from synthetic_data_generator.pattern_engine import TransactionColumns, detect_patterns
+from synthetic_data_generator.pattern_signatures import get_signature_library
 from datetime import timedelta
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
+# Real transactions pulled from the wallet's 2-hop network per analysis
+INCIDENT_NETWORK_MAX_EDGES = 500
+
 router = APIRouter()
 
 
@@ -110,35 +114,12 @@ def analyze_wallet_description(description: str) -> Dict[str, float]:
     return weights
 
 
-def detect_pattern_type(txns: List[Dict], description_weights: Dict[str, float]) -> str:
+def detect_pattern_type(txns: List[Dict], wallet: str, description_weights: Dict[str, float]) -> str:
     """
     Detect the most likely pattern type based on transactions and description
+    (cosine similarity against the precomputed typology signatures)
     """
-    pattern_scores = {}
-    
-    # Test each pattern
-    patterns = {
-        "fraud": generate_wallet_transactions("TEST", mode="fraud"),
-        "money_laundering": generate_wallet_transactions("TEST", mode="money_laundering"),
-        "ponzi": generate_wallet_transactions("TEST", mode="ponzi"),
-        "ransomware": generate_wallet_transactions("TEST", mode="ransomware"),
-    }
-    
-    # Calculate similarity scores (simplified - in production use ML)
-    if detect_rapid_consolidation(txns):
-        pattern_scores["fraud"] = 0.4 + description_weights.get("fraud", 0)
-        pattern_scores["ransomware"] = 0.3 + description_weights.get("ransomware", 0)
-    
-    if detect_layering(txns):
-        pattern_scores["money_laundering"] = 0.5 + description_weights.get("money_laundering", 0)
-    
-    if len(txns) > 10 and any(t.get("amount", 0) > 5000 for t in txns):
-        pattern_scores["ponzi"] = 0.3 + description_weights.get("ponzi", 0)
-    
-    # Return pattern with highest score
-    if pattern_scores:
-        return max(pattern_scores, key=pattern_scores.get)
-    return "Unknown"
+    return get_signature_library().classify(txns, wallet, description_weights)
 
 
 def get_risk_level(score: float) -> str:
@@ -214,28 +195,7 @@ def get_detected_patterns_list(txns: List[Dict]) -> List[str]:
     """
     Get list of detected suspicious patterns
     """
-    patterns = []
-    
-    if detect_rapid_consolidation(txns):
-        patterns.append("Rapid Consolidation")
-    
-    if detect_layering(txns):
-        patterns.append("Money Laundering (Layering)")
-        patterns.append("Multiple Hop Transfers")
-    
-    if detect_circular_pattern(txns):
-        patterns.append("Circular Movement")
-    
-    # Check for structuring (multiple transactions just under threshold)
-    amounts = [t.get("amount", 0) for t in txns]
-    if len([a for a in amounts if 9000 < a < 10000]) >= 3:
-        patterns.append("Structuring Detected")
-    
-    # Check for high frequency
-    if len(txns) > 15:
-        patterns.append("High Transaction Frequency")
-    
-    return patterns if patterns else ["No obvious patterns detected"]
+    return detect_patterns(txns).detected_patterns
 
 
 def generate_system_conclusion(
@@ -269,75 +229,441 @@ def generate_system_conclusion(
 def fetch_real_transactions(db: Session, wallet: str) -> List[Dict]:
     """
     Fetch real transactions from the fraud dataset involving the wallet (name_orig or name_dest)
-    Also includes related transactions from connected accounts to show fraud network
+    Also includes transactions between connected accounts (2-hop neighbourhood from the
+    transaction graph index) to show the fraud network
     """
-    # Search for transactions where this ID appears
-    real_txns = db.query(FraudTransaction).filter(
-        or_(FraudTransaction.name_orig == wallet, FraudTransaction.name_dest == wallet)
-    ).order_by(FraudTransaction.step).limit(100).all()
-    
-    if not real_txns:
+    graph = get_transaction_graph()
+    graph.ensure_fresh(db)
+    network = graph.neighbourhood(wallet, hops=2, max_edges=INCIDENT_NETWORK_MAX_EDGES)
+    if network is None:
         return []
     
-    # Collect all related accounts (accounts that transacted with the wallet)
-    related_accounts = set()
-    for tx in real_txns:
-        if tx.name_orig != wallet:
-            related_accounts.add(tx.name_orig)
-        if tx.name_dest != wallet:
-            related_accounts.add(tx.name_dest)
-    
-    # Fetch additional transactions involving related accounts (to show network)
-    if related_accounts:
-        # Limit to first 20 related accounts to avoid too much data
-        related_list = list(related_accounts)[:20]
-        related_txns = db.query(FraudTransaction).filter(
-            or_(
-                FraudTransaction.name_orig.in_(related_list),
-                FraudTransaction.name_dest.in_(related_list)
-            )
-        ).order_by(FraudTransaction.step).limit(50).all()
-        
-        # Add related transactions (avoid duplicates)
-        existing_ids = {tx.id for tx in real_txns}
-        for tx in related_txns:
-            if tx.id not in existing_ids:
-                real_txns.append(tx)
-        
+    # The wallet's own transactions first, then the rest of the network (each in step order)
+    records = graph.edge_records(network["edge_ids"])
+    real_txns = [tx for tx in records if wallet in (tx["from"], tx["to"])]
+    real_txns += [tx for tx in records if wallet not in (tx["from"], tx["to"])]
+    
     formatted_txns = []
     # Base timestamp for step conversion (assuming step 1 = 30 days ago to show history)
     base_time = datetime.utcnow() - timedelta(days=30)
     
     for tx in real_txns:
         # Convert step (hours) to timestamp
-        tx_time = base_time + timedelta(hours=int(tx.step))
+        tx_time = base_time + timedelta(hours=tx["step"])
         
         formatted_txns.append({
-            "from": tx.name_orig,
-            "to": tx.name_dest,
-            "amount": float(tx.amount),
-            "type": tx.type,
+            "from": tx["from"],
+            "to": tx["to"],
+            "amount": tx["amount"],
+            "type": tx["type"],
             "timestamp": tx_time.isoformat(),
-            "is_fraud": tx.is_fraud == 1,  # Use correct attribute name
-            "step": tx.step
+            "is_fraud": tx["is_fraud"],
+            "step": tx["step"]
         })
     
     return formatted_txns
 
+def _fetch_real_transactions_isolated(wallet: str) -> List[Dict]:
+    """
+    fetch_real_transactions on its own session, so it can run in a worker
+    thread and be abandoned at the deadline without touching the request's session
+    """
+    db = SessionLocal()
+    try:
+        return fetch_real_transactions(db, wallet)
+    finally:
+        db.close()
+
+
+def select_synthetic_transactions(wallet: str, description_weights: Dict[str, float]) -> List[Dict]:
+    """
+    Generate synthetic fraud patterns for the wallet, picking the pattern from description weights
+    """
+    if description_weights["ponzi"] > 0:
+        return generate_wallet_transactions(wallet, mode="ponzi")
+    if description_weights["money_laundering"] > 0:
+        return generate_wallet_transactions(wallet, mode="money_laundering")
+    if description_weights["ransomware"] > 0:
+        return generate_wallet_transactions(wallet, mode="ransomware")
+    # Default to fraud pattern (shows multiple victims -> multiple mules -> exit accounts)
+    return generate_wallet_transactions(wallet, mode="fraud")
+
+
+def merge_real_transactions(synthetic_txns: List[Dict], real_txns: List[Dict]) -> List[Dict]:
+    """
+    Always use synthetic fraud data as primary (ensures clear fraud patterns with multiple accounts)
+    Synthetic data shows: multiple victims -> fraud wallet -> multiple mules/intermediates -> exit accounts
+    """
+    txns = synthetic_txns
+    
+    # Optionally add real data as additional context (but don't let it override fraud pattern)
+    if real_txns and len(real_txns) >= 3:
+        # Add real transactions with earlier timestamps to show historical context
+        # But keep synthetic fraud pattern as the main visualization
+        earliest_synthetic_time = min((t.get("timestamp", "") for t in synthetic_txns), default="")
+        if earliest_synthetic_time:
+            try:
+                base_dt = datetime.fromisoformat(earliest_synthetic_time.replace('Z', '+00:00'))
+            except:
+                base_dt = datetime.utcnow()
+        else:
+            base_dt = datetime.utcnow()
+        
+        # Adjust real transaction timestamps to be before synthetic (historical context)
+        adjusted_real = []
+        for i, txn in enumerate(real_txns[:20]):  # Limit to 20 real transactions
+            txn_copy = txn.copy()
+            txn_copy["timestamp"] = (base_dt - timedelta(days=1, minutes=i*10)).isoformat()
+            adjusted_real.append(txn_copy)
+        
+        # Combine: historical real data + synthetic fraud pattern (primary)
+        txns = adjusted_real + synthetic_txns
+    
+    return txns
+
+
+# Analyses calling the orchestrator/LLM at once (per worker process)
+_upstream_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_upstream_slots() -> asyncio.Semaphore:
+    global _upstream_slots
+    if _upstream_slots is None:
+        _upstream_slots = asyncio.Semaphore(max(settings.INCIDENT_UPSTREAM_CONCURRENCY, 1))
+    return _upstream_slots
+
+
+def _has_conclusion(orchestrator_result: Optional[Dict[str, Any]]) -> bool:
+    return bool(
+        orchestrator_result
+        and isinstance(orchestrator_result, dict)
+        and orchestrator_result.get("system_conclusion")
+    )
+
+
+async def resolve_upstream_conclusion(
+    orchestrator_payload: Dict[str, Any],
+    conclusion_kwargs: Dict[str, Any],
+    deadline: float,
+) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+    """
+    Call the orchestrator and the LLM concurrently, within the deadline
+
+    The LLM conclusion is only used when the orchestrator gives none, so it
+    is started alongside it and cancelled once the orchestrator answers
+    with a conclusion.
+
+    Returns:
+        (orchestrator_result, llm_conclusion, timed_out); the first two are
+        None when the upstream failed or ran out of time
+    """
+    loop = asyncio.get_running_loop()
+
+    def time_left() -> float:
+        return max(deadline - loop.time(), 0.0)
+
+    slots = _get_upstream_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), time_left())
+    except asyncio.TimeoutError:
+        return None, None, True
+
+    orchestrator_task = asyncio.create_task(
+        call_incident_orchestrator(orchestrator_payload, timeout=time_left())
+    )
+    llm_task = asyncio.create_task(
+        generate_ai_conclusion_async(**conclusion_kwargs, fallback_to_template=False, timeout=time_left())
+    )
+    try:
+        done, _ = await asyncio.wait({orchestrator_task}, timeout=time_left())
+        if orchestrator_task in done and orchestrator_task.exception() is None:
+            orchestrator_result = orchestrator_task.result()
+            if _has_conclusion(orchestrator_result):
+                return orchestrator_result, None, False
+
+        done, _ = await asyncio.wait({llm_task}, timeout=time_left())
+        if llm_task in done:
+            if llm_task.exception() is None:
+                return None, llm_task.result(), False
+            return None, None, False
+        return None, None, True
+    finally:
+        for task in (orchestrator_task, llm_task):
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Failures are already audit-logged; mark them retrieved
+                task.exception()
+        slots.release()
+
+
+async def run_incident_analysis(
+    request: IncidentReportRequest,
+    investigator_id: Optional[int],
+    db: Session,
+    deadline_seconds: Optional[float] = None,
+) -> IncidentReportResponse:
+    """
+    Analyze a wallet and save the incident report
+
+    Stages run concurrently where they are independent: the real-data DB
+    fetch (in a thread) alongside synthetic generation, then the
+    orchestrator alongside the LLM conclusion. All stages share one
+    deadline (INCIDENT_ANALYSIS_DEADLINE_SECONDS); once it runs out the
+    template conclusion is used, so a slow upstream cannot hold the request.
+    """
+    loop = asyncio.get_running_loop()
+    if deadline_seconds is None:
+        deadline_seconds = settings.INCIDENT_ANALYSIS_DEADLINE_SECONDS
+    deadline = loop.time() + deadline_seconds
+
+    wallet = request.wallet_address
+    
+    # Analyze description to boost pattern scores
+    description_weights = analyze_wallet_description(request.description)
+    
+    # 1. Fetch REAL data from the FraudTransaction dataset for additional context,
+    #    while synthetic fraud patterns (multiple accounts) are generated
+    fetch_task = asyncio.create_task(asyncio.to_thread(_fetch_real_transactions_isolated, wallet))
+    synthetic_txns = select_synthetic_transactions(wallet, description_weights)
+    try:
+        real_txns = await asyncio.wait_for(fetch_task, max(deadline - loop.time(), 0.0))
+    except asyncio.TimeoutError:
+        real_txns = []
+        emit_audit_log(
+            action="incident.analyze",
+            status="warning",
+            message="Real transaction fetch exceeded the analysis deadline; using synthetic data only.",
+            details={"wallet": wallet},
+        )
+    
+    # 2. Combine with the synthetic pattern (primary)
+    txns = merge_real_transactions(synthetic_txns, real_txns)
+    
+    # Run every pattern detector and the flow metrics in one columnar pass
+    columns = TransactionColumns.from_records(txns)
+    patterns = detect_patterns(columns, wallet=wallet)
+    total_in = patterns.total_in
+    total_out = patterns.total_out
+    unique_senders = patterns.unique_senders
+    unique_receivers = patterns.unique_receivers
+    
+    # Calculate risk score
+    base_risk = patterns.risk_score
+    
+    # Boost risk based on description
+    description_boost = sum(description_weights.values()) * 0.1
+    risk_score = min(base_risk + description_boost, 1.0)
+    
+    # Detect pattern type
+    pattern_type = get_signature_library().classify(columns, wallet, description_weights, patterns)
+    risk_level = get_risk_level(risk_score)
+    
+    # Get detected patterns
+    detected_patterns = patterns.detected_patterns
+    
+    # Generate graph data
+    graph_data = generate_graph_data(txns, wallet)
+    
+    # Generate timeline
+    timeline = generate_timeline(txns)
+    
+    # 3. Optionally delegate to external AI orchestrator (e.g. Primary_Bucket_Owner),
+    #    with the OpenRouter conclusion running alongside as the next fallback
+    orchestrator_payload = {
+        "wallet": wallet,
+        "description": request.description,
+        "transactions": txns,
+        "base_metrics": {
+            "total_in": total_in,
+            "total_out": total_out,
+            "tx_count": len(txns),
+            "unique_senders": unique_senders,
+            "unique_receivers": unique_receivers,
+        },
+        "base_risk": {
+            "risk_score": risk_score,
+            "risk_level": risk_level,
+            "pattern_type": pattern_type,
+            "detected_patterns": detected_patterns,
+        },
+    }
+    conclusion_kwargs = {
+        "wallet": wallet,
+        "risk_score": risk_score,
+        "risk_level": risk_level,
+        "pattern_type": pattern_type,
+        "detected_patterns": detected_patterns,
+        "summary": {
+            "total_in": total_in,
+            "total_out": total_out,
+            "tx_count": len(txns),
+            "unique_senders": unique_senders,
+            "unique_receivers": unique_receivers,
+        },
+        "user_description": request.description,
+    }
+    orchestrator_result, llm_conclusion, timed_out = await resolve_upstream_conclusion(
+        orchestrator_payload, conclusion_kwargs, deadline
+    )
+
+    # Generate system conclusion using orchestrator if available, else OpenRouter/template
+    if _has_conclusion(orchestrator_result):
+        # Optionally override risk if orchestrator provides it
+        try:
+            if "risk_score" in orchestrator_result:
+                risk_score = float(orchestrator_result["risk_score"])
+                risk_level = get_risk_level(risk_score)
+            if "risk_level" in orchestrator_result:
+                risk_level = orchestrator_result["risk_level"]
+            extra_patterns = orchestrator_result.get("detected_patterns") or []
+            if isinstance(extra_patterns, list):
+                # Merge and deduplicate patterns
+                detected_patterns = list({*detected_patterns, *[str(p) for p in extra_patterns]})
+        except Exception:
+            # If parsing fails, keep original risk values
+            pass
+
+        system_conclusion = str(orchestrator_result["system_conclusion"])
+    elif llm_conclusion:
+        system_conclusion = llm_conclusion
+    else:
+        if timed_out:
+            emit_audit_log(
+                action="incident.analyze",
+                status="warning",
+                message="Incident analysis deadline reached; using template conclusion.",
+                details={"wallet": wallet, "deadline_seconds": deadline_seconds},
+            )
+        # Fallback to template if AI fails or runs out of time
+        system_conclusion = generate_system_conclusion(
+            risk_score, risk_level, pattern_type, detected_patterns
+        )
+    
+    # Build transaction details for frontend table
+    tx_details = []
+    for idx, t in enumerate(txns):
+        amount = float(t.get("amount", 0))
+        direction = "related"
+        if t.get("from") == wallet and t.get("to") != wallet:
+            direction = "outgoing"
+        elif t.get("to") == wallet and t.get("from") != wallet:
+            direction = "incoming"
+        timestamp = t.get("timestamp")
+        # Simple heuristic for "suspicious" transaction highlight
+        suspicious = amount >= max(total_in, total_out) * 0.4 or amount > 10000
+        tx_details.append({
+            "id": idx + 1,
+            "from_address": t.get("from", ""),
+            "to_address": t.get("to", ""),
+            "amount": amount,
+            "direction": direction,
+            "timestamp": timestamp,
+            "type": t.get("type", None),
+            "suspicious": suspicious,
+        })
+
+    # Prepare response data
+    response_data = IncidentReportResponse(
+        wallet=wallet,
+        risk_score=risk_score,
+        risk_level=risk_level,
+        detected_patterns=detected_patterns,
+        summary={
+            "total_in": total_in,
+            "total_out": total_out,
+            "tx_count": len(txns),
+            "unique_senders": unique_senders,
+            "unique_receivers": unique_receivers,
+            "pattern_type": pattern_type.replace("_", " ").title(),
+            # also embed transactions in summary so they persist in SQL
+            "transactions": tx_details,
+        },
+        graph_data=graph_data,
+        timeline=timeline,
+        transactions=tx_details,
+        system_conclusion=system_conclusion
+    )
+
+    # Save to SQL database (IncidentReport table)
+    try:
+        summary_obj = {
+            "total_in": total_in,
+            "total_out": total_out,
+            "tx_count": len(txns),
+            "unique_senders": unique_senders,
+            "unique_receivers": unique_receivers,
+            "pattern_type": pattern_type.replace("_", " ").title(),
+            "transactions": tx_details,
+        }
+
+        report = IncidentReport(
+            wallet_address=wallet,
+            user_description=request.description,
+            risk_score=risk_score,
+            risk_level=risk_level,
+            detected_patterns=json.dumps(detected_patterns),
+            summary=json.dumps(summary_obj),
+            graph_data=json.dumps(graph_data),
+            timeline=json.dumps(timeline),
+            system_conclusion=system_conclusion,
+            status="investigating",
+            notes=json.dumps([]),
+            investigator_id=investigator_id,  # Use the investigator_id we set based on authentication
+        )
+
+        db.add(report)
+        db.commit()
+        db.refresh(report)
+
+        # Add report ID to response (as string for frontend)
+        response_data.report_id = str(report.id)
+    except Exception as db_error:
+        # Log error but don't fail the request
+        emit_audit_log(
+            action="incident.report.save",
+            status="warning",
+            message="Failed to save incident report.",
+            details={"error": str(db_error)},
+        )
+
+    return response_data
+
+
+INCIDENT_ANALYSIS_JOB = "incident_analysis"
+
+
+async def _run_incident_analysis_job(payload: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Job handler for mode=async analyses; the result is the report response"""
+    request = IncidentReportRequest(**payload["request"])
+    report = await run_incident_analysis(request, payload.get("investigator_id"), db)
+    return report.dict()
+
+
+register_job_handler(INCIDENT_ANALYSIS_JOB, _run_incident_analysis_job)
+
+
 @router.post("/analyze", response_model=IncidentReportResponse)
 async def analyze_wallet_incident(
     request: IncidentReportRequest,
     request_obj: Request,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    mode: str = Query("sync", description="'sync' returns the report; 'async' queues a job and returns 202 with its ID"),
 ):
     """
     Analyze a wallet address and generate comprehensive fraud risk report.
     Saves the report to the SQL database for persistence.
     
+    With mode=async the analysis is queued as a background job: the response
+    is 202 with a job_id, and GET /incidents/jobs/{job_id} returns its status
+    and, once finished, the report.
+    
     Role-based access:
     - Investigators can create reports (automatically linked to their ID)
     - Superadmin can create reports (can specify investigator_id or leave null)
     """
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'async'")
     try:
         # Get current user for role-based access
         current_user: Optional[User] = await get_current_user_from_request(request_obj, db)
@@ -358,238 +684,64 @@ async def analyze_wallet_incident(
                     detail="Authentication required or investigator_id must be provided"
                 )
         
-        wallet = request.wallet_address
-        
-        # Analyze description to boost pattern scores
-        description_weights = analyze_wallet_description(request.description)
-        
-        # 1. Always generate synthetic fraud patterns to show comprehensive fraud activity with multiple accounts
-        # Pick pattern based on description weights
-        if description_weights["ponzi"] > 0:
-            synthetic_txns = generate_wallet_transactions(wallet, mode="ponzi")
-        elif description_weights["money_laundering"] > 0:
-            synthetic_txns = generate_wallet_transactions(wallet, mode="money_laundering")
-        elif description_weights["ransomware"] > 0:
-            synthetic_txns = generate_wallet_transactions(wallet, mode="ransomware")
-        else:
-            # Default to fraud pattern (shows multiple victims -> multiple mules -> exit accounts)
-            synthetic_txns = generate_wallet_transactions(wallet, mode="fraud")
-        
-        # 2. Try to fetch REAL data from FraudTransaction dataset for additional context
-        real_txns = fetch_real_transactions(db, wallet)
-        
-        # 3. Always use synthetic fraud data as primary (ensures clear fraud patterns with multiple accounts)
-        # Synthetic data shows: multiple victims -> fraud wallet -> multiple mules/intermediates -> exit accounts
-        # This creates a clear fraud network visualization
-        txns = synthetic_txns
-        
-        # Optionally add real data as additional context (but don't let it override fraud pattern)
-        if real_txns and len(real_txns) >= 3:
-            # Add real transactions with earlier timestamps to show historical context
-            # But keep synthetic fraud pattern as the main visualization
-            earliest_synthetic_time = min((t.get("timestamp", "") for t in synthetic_txns), default="")
-            if earliest_synthetic_time:
-                try:
-                    base_dt = datetime.fromisoformat(earliest_synthetic_time.replace('Z', '+00:00'))
-                except:
-                    base_dt = datetime.utcnow()
-            else:
-                base_dt = datetime.utcnow()
-            
-            # Adjust real transaction timestamps to be before synthetic (historical context)
-            adjusted_real = []
-            for i, txn in enumerate(real_txns[:20]):  # Limit to 20 real transactions
-                txn_copy = txn.copy()
-                txn_copy["timestamp"] = (base_dt - timedelta(days=1, minutes=i*10)).isoformat()
-                adjusted_real.append(txn_copy)
-            
-            # Combine: historical real data + synthetic fraud pattern (primary)
-            txns = adjusted_real + synthetic_txns
-        
-        # Calculate metrics
-        total_in = sum(t.get("amount", 0) for t in txns if t.get("to") == wallet)
-        total_out = sum(t.get("amount", 0) for t in txns if t.get("from") == wallet)
-        unique_senders = len(set(t.get("from") for t in txns if t.get("from") != wallet))
-        unique_receivers = len(set(t.get("to") for t in txns if t.get("to") != wallet))
-        
-        # Calculate risk score
-        base_risk = calculate_risk_score(txns)
-        
-        # Boost risk based on description
-        description_boost = sum(description_weights.values()) * 0.1
-        risk_score = min(base_risk + description_boost, 1.0)
-        
-        # Detect pattern type
-        pattern_type = detect_pattern_type(txns, description_weights)
-        risk_level = get_risk_level(risk_score)
-        
-        # Get detected patterns
-        detected_patterns = get_detected_patterns_list(txns)
-        
-        # Generate graph data
-        graph_data = generate_graph_data(txns, wallet)
+        if mode == "async":
+            job = enqueue_job(
+                db,
+                INCIDENT_ANALYSIS_JOB,
+                {"request": request.dict(), "investigator_id": investigator_id},
+                created_by=current_user.id if current_user else None,
+            )
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "job_id": job.id,
+                    "status": job.status,
+                    "status_url": f"{settings.API_V1_PREFIX}/incidents/jobs/{job.id}",
+                },
+            )
         
-        # Generate timeline
-        timeline = generate_timeline(txns)
+        return await run_incident_analysis(request, investigator_id, db)
         
-        # Optionally delegate to external AI orchestrator (e.g. Primary_Bucket_Owner)
-        orchestrator_result: Optional[Dict[str, Any]] = None
-        try:
-            orchestrator_payload = {
-                "wallet": wallet,
-                "description": request.description,
-                "transactions": txns,
-                "base_metrics": {
-                    "total_in": total_in,
-                    "total_out": total_out,
-                    "tx_count": len(txns),
-                    "unique_senders": unique_senders,
-                    "unique_receivers": unique_receivers,
-                },
-                "base_risk": {
-                    "risk_score": risk_score,
-                    "risk_level": risk_level,
-                    "pattern_type": pattern_type,
-                    "detected_patterns": detected_patterns,
-                },
-            }
-            orchestrator_result = call_incident_orchestrator(orchestrator_payload)
-        except Exception:
-            orchestrator_result = None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing wallet: {str(e)}")
 
-        # Generate system conclusion using orchestrator if available, else OpenRouter/template
-        if orchestrator_result and isinstance(orchestrator_result, dict) and orchestrator_result.get("system_conclusion"):
-            # Optionally override risk if orchestrator provides it
-            try:
-                if "risk_score" in orchestrator_result:
-                    risk_score = float(orchestrator_result["risk_score"])
-                    risk_level = get_risk_level(risk_score)
-                if "risk_level" in orchestrator_result:
-                    risk_level = orchestrator_result["risk_level"]
-                extra_patterns = orchestrator_result.get("detected_patterns") or []
-                if isinstance(extra_patterns, list):
-                    # Merge and deduplicate patterns
-                    detected_patterns = list({*detected_patterns, *[str(p) for p in extra_patterns]})
-            except Exception:
-                # If parsing fails, keep original risk values
-                pass
 
-            system_conclusion = str(orchestrator_result["system_conclusion"])
-        else:
-            try:
-                system_conclusion = generate_ai_conclusion(
-                    wallet=wallet,
-                    risk_score=risk_score,
-                    risk_level=risk_level,
-                    pattern_type=pattern_type,
-                    detected_patterns=detected_patterns,
-                    summary={
-                        "total_in": total_in,
-                        "total_out": total_out,
-                        "tx_count": len(txns),
-                        "unique_senders": unique_senders,
-                        "unique_receivers": unique_receivers,
-                    },
-                    user_description=request.description,
-                    fallback_to_template=True,
-                )
-            except Exception:
-                # Fallback to template if AI fails
-                system_conclusion = generate_system_conclusion(
-                    risk_score, risk_level, pattern_type, detected_patterns
-                )
-        
-        # Build transaction details for frontend table
-        tx_details = []
-        for idx, t in enumerate(txns):
-            amount = float(t.get("amount", 0))
-            direction = "related"
-            if t.get("from") == wallet and t.get("to") != wallet:
-                direction = "outgoing"
-            elif t.get("to") == wallet and t.get("from") != wallet:
-                direction = "incoming"
-            timestamp = t.get("timestamp")
-            # Simple heuristic for "suspicious" transaction highlight
-            suspicious = amount >= max(total_in, total_out) * 0.4 or amount > 10000
-            tx_details.append({
-                "id": idx + 1,
-                "from_address": t.get("from", ""),
-                "to_address": t.get("to", ""),
-                "amount": amount,
-                "direction": direction,
-                "timestamp": timestamp,
-                "type": t.get("type", None),
-                "suspicious": suspicious,
-            })
-
-        # Prepare response data
-        response_data = IncidentReportResponse(
-            wallet=wallet,
-            risk_score=risk_score,
-            risk_level=risk_level,
-            detected_patterns=detected_patterns,
-            summary={
-                "total_in": total_in,
-                "total_out": total_out,
-                "tx_count": len(txns),
-                "unique_senders": unique_senders,
-                "unique_receivers": unique_receivers,
-                "pattern_type": pattern_type.replace("_", " ").title(),
-                # also embed transactions in summary so they persist in SQL
-                "transactions": tx_details,
-            },
-            graph_data=graph_data,
-            timeline=timeline,
-            transactions=tx_details,
-            system_conclusion=system_conclusion
+def _get_job_for_user(db: Session, job_id: str, current_user: Optional[User]):
+    """Load a job, applying the same access rules as reports"""
+    job = get_job(db, job_id)
+    if not job or job.kind != INCIDENT_ANALYSIS_JOB:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required to view jobs")
+    if current_user.role == "investigator" and job.created_by != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You do not have permission to view this job. You can only view your own jobs."
         )
+    return job
 
-        # Save to SQL database (IncidentReport table)
-        try:
-            summary_obj = {
-                "total_in": total_in,
-                "total_out": total_out,
-                "tx_count": len(txns),
-                "unique_senders": unique_senders,
-                "unique_receivers": unique_receivers,
-                "pattern_type": pattern_type.replace("_", " ").title(),
-                "transactions": tx_details,
-            }
-
-            report = IncidentReport(
-                wallet_address=wallet,
-                user_description=request.description,
-                risk_score=risk_score,
-                risk_level=risk_level,
-                detected_patterns=json.dumps(detected_patterns),
-                summary=json.dumps(summary_obj),
-                graph_data=json.dumps(graph_data),
-                timeline=json.dumps(timeline),
-                system_conclusion=system_conclusion,
-                status="investigating",
-                notes=json.dumps([]),
-                investigator_id=investigator_id,  # Use the investigator_id we set based on authentication
-            )
 
-            db.add(report)
-            db.commit()
-            db.refresh(report)
+@router.get("/jobs/{job_id}", response_model=Dict)
+async def get_incident_job(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Status of a mode=async analysis job; `result` holds the report once it has succeeded.
+    
+    Role-based access:
+    - Superadmin: any job
+    - Investigator: only jobs they queued
+    """
+    current_user: Optional[User] = await get_current_user_from_request(request, db)
+    return _get_job_for_user(db, job_id, current_user).to_dict()
 
-            # Add report ID to response (as string for frontend)
-            response_data.report_id = str(report.id)
-        except Exception as db_error:
-            # Log error but don't fail the request
-            emit_audit_log(
-                action="incident.report.save",
-                status="warning",
-                message="Failed to save incident report.",
-                details={"error": str(db_error)},
-            )
 
-        return response_data
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error analyzing wallet: {str(e)}")
+@router.post("/jobs/{job_id}/cancel", response_model=Dict)
+async def cancel_incident_job(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Cancel a queued or running analysis job (finished jobs are returned unchanged).
+    """
+    current_user: Optional[User] = await get_current_user_from_request(request, db)
+    job = _get_job_for_user(db, job_id, current_user)
+    return request_cancel(db, job).to_dict(include_result=False)
 
 
 @router.get("/reports", response_model=List[Dict])
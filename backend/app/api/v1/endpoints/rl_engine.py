@@ -15,9 +15,18 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirna
 from app.db.database import get_db
 from app.db.models import FraudTransaction
 from ml_training.rl_fraud_detector import get_rl_detector
+from app.core.inference_executor import InferenceQueueFull, get_inference_executor
 
 router = APIRouter()
 
+# The RL detector locks its shared Q-table itself (across threads and worker
+# processes); calls only need to stay off the event loop
+async def _run_rl(fn, *args, **kwargs):
+    return await get_inference_executor().run_light(fn, *args, **kwargs)
+
+
+QUEUE_FULL_DETAIL = "Inference queue is full. Please retry shortly."
+
 
 class RLPredictionRequest(BaseModel):
     transaction_data: Dict
@@ -45,7 +54,7 @@ async def get_rl_status():
         
         return {
             "status": "ready",
-            "model_loaded": len(rl_detector.q_table) > 0,
+            "model_loaded": rl_detector.state_count() > 0,
             **stats
         }
     except Exception as e:
@@ -57,12 +66,14 @@ async def predict_with_rl(request: RLPredictionRequest):
     """Predict fraud using RL agent"""
     try:
         rl_detector = get_rl_detector()
-        prediction = rl_detector.predict(request.transaction_data, use_exploration=True)
+        prediction = await _run_rl(rl_detector.predict, request.transaction_data, use_exploration=True)
         
         return {
             "prediction": prediction,
             "model_type": "reinforcement_learning"
         }
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail=QUEUE_FULL_DETAIL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RL prediction error: {str(e)}")
 
@@ -72,20 +83,25 @@ async def provide_feedback(request: RLFeedbackRequest):
     """Provide feedback to RL agent for learning"""
     try:
         rl_detector = get_rl_detector()
-        reward = rl_detector.learn_from_feedback(
-            request.transaction_data,
-            request.predicted_action,
-            request.actual_is_fraud,
-            request.reward
-        )
         
-        # Save model after learning
-        rl_detector.save_model()
+        def learn():
+            # Appends one record to the update log; snapshots happen on compaction
+            reward = rl_detector.learn_from_feedback(
+                request.transaction_data,
+                request.predicted_action,
+                request.actual_is_fraud,
+                request.reward
+            )
+            return reward, rl_detector.get_statistics()
+        
+        reward, statistics = await _run_rl(learn)
         
         return {
             "reward": reward,
-            "statistics": rl_detector.get_statistics()
+            "statistics": statistics
         }
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail=QUEUE_FULL_DETAIL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RL feedback error: {str(e)}")
 
@@ -127,7 +143,7 @@ async def train_rl_agent(request: RLTrainRequest, db: Session = Depends(get_db))
             labels.append(tx.is_fraud)
         
         # Train RL agent
-        stats = rl_detector.train_on_batch(tx_data_list, labels, epochs=request.epochs)
+        stats = await _run_rl(rl_detector.train_on_batch, tx_data_list, labels, epochs=request.epochs)
         
         return {
             "status": "success",
@@ -138,6 +154,8 @@ async def train_rl_agent(request: RLTrainRequest, db: Session = Depends(get_db))
         
     except HTTPException:
         raise
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail=QUEUE_FULL_DETAIL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RL training error: {str(e)}")
 
@@ -164,7 +182,7 @@ async def predict_transaction_rl(transaction_id: int, db: Session = Depends(get_
         }
         
         rl_detector = get_rl_detector()
-        prediction = rl_detector.predict(tx_data, use_exploration=False)  # Use exploitation for predictions
+        prediction = await _run_rl(rl_detector.predict, tx_data, use_exploration=False)  # Use exploitation for predictions
         
         return {
             "transaction_id": transaction_id,
@@ -175,6 +193,8 @@ async def predict_transaction_rl(transaction_id: int, db: Session = Depends(get_
         
     except HTTPException:
         raise
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail=QUEUE_FULL_DETAIL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RL prediction error: {str(e)}")
 
@@ -211,15 +231,14 @@ async def reset_rl_model():
     """Reset RL model (clear Q-table)"""
     try:
         rl_detector = get_rl_detector()
-        rl_detector.q_table = {}
-        rl_detector.total_predictions = 0
-        rl_detector.correct_predictions = 0
-        rl_detector.rewards_received = []
-        rl_detector.save_model()
+        
+        await _run_rl(rl_detector.reset)
         
         return {
             "status": "success",
             "message": "RL model reset successfully"
         }
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail=QUEUE_FULL_DETAIL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error resetting model: {str(e)}")
@@ -4,16 +4,36 @@ System-level health checks for demo-safe operations.
 
 from __future__ import annotations
 
+import asyncio
+
 from fastapi import APIRouter
 from sqlalchemy import text
 
+from app.core.inference_executor import get_inference_executor
+from app.core.http_client import http_client_stats
+from app.core.job_queue import get_job_queue
+from app.core.llm_cache import get_llm_cache
+from app.core.watchlist_index import get_watchlist_index
+from app.core.watchlist_monitor import get_watchlist_monitor
 from app.core.sovereign_integrations import integration_health, flush_event_buffer
-from app.db.database import engine
+from app.db.database import SessionLocal, engine
+from ml_training.risk_propagation import get_propagation_status
 
 
 router = APIRouter()
 
 
+def _risk_propagation_status() -> dict:
+    """Last risk propagation run (wallet_risk counts), queried off the event loop"""
+    db = SessionLocal()
+    try:
+        return get_propagation_status(db)
+    except Exception as exc:
+        return {"error": str(exc)}
+    finally:
+        db.close()
+
+
 @router.get("/health")
 async def system_health() -> dict:
     db_ok = False
@@ -33,11 +53,18 @@ async def system_health() -> dict:
         "status": status,
         "database": {"ok": db_ok, "error": db_error},
         "integrations": integrations,
+        "inference": get_inference_executor().stats(),
+        "job_queue": get_job_queue().stats(),
+        "watchlist_monitor": get_watchlist_monitor().stats(),
+        "watchlist_index": get_watchlist_index().stats(),
+        "http_clients": http_client_stats(),
+        "llm_cache": get_llm_cache().stats(),
+        "risk_propagation": await asyncio.to_thread(_risk_propagation_status),
     }
 
 
 @router.post("/queue/flush")
 async def flush_queue() -> dict:
-    result = flush_event_buffer(max_items=200)
+    result = await flush_event_buffer(max_items=200)
     return {"success": True, "result": result}
 
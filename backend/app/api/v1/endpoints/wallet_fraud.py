@@ -3,6 +3,9 @@ Wallet Fraud Detection endpoints
 Analyze wallets using fraud transaction data
 """
 
+import asyncio
+import time
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict
@@ -15,7 +18,12 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirna
 
 from app.db.database import get_db
 from app.db.models import Wallet, FraudTransaction
-from ml_training.predict_fraud import predict_transaction, load_model
+from ml_training.model_registry import get_model_registry
+from ml_training.prediction_store import join_predictions, resolve_predictions_offloaded
+from app.core.inference_executor import InferenceQueueFull
+from app.core.config import settings
+from app.core.transaction_graph import get_transaction_graph
+from app.core.account_clusters import get_account_clusters
 
 router = APIRouter()
 
@@ -33,13 +41,26 @@ async def analyze_wallet_fraud(
     - A customer ID from FraudTransaction (e.g., "C1234567890")
     """
     try:
+        try:
+            # Resolving the model may stat and load the artifact, so keep it off the event loop
+            loaded = await asyncio.to_thread(get_model_registry().get)
+        except Exception:
+            loaded = None
+        model_available = loaded is not None
+        
         # Find all transactions where this wallet appears as origin or destination
-        transactions = db.query(FraudTransaction).filter(
+        query = db.query(FraudTransaction).filter(
             or_(
                 FraudTransaction.name_orig == wallet_address,
                 FraudTransaction.name_dest == wallet_address
             )
-        ).order_by(FraudTransaction.step.desc()).all()
+        )
+        if loaded is not None:
+            # Stored predictions come back with the rows in the same indexed read
+            rows = join_predictions(query, loaded.version).order_by(FraudTransaction.step.desc()).all()
+        else:
+            rows = [(tx, None) for tx in query.order_by(FraudTransaction.step.desc()).all()]
+        transactions = [tx for tx, _ in rows]
         
         if not transactions:
             return {
@@ -64,34 +85,16 @@ async def analyze_wallet_fraud(
         normal_count = 0
         predictions = []
         
-        model_available = False
-        try:
-            model, metadata = load_model()
-            model_available = True
-        except:
-            pass
-        
-        for tx in transactions:
-            # Predict fraud if model is available
-            prediction = None
-            if model_available:
-                try:
-                    pred_result = predict_transaction(transaction_data={
-                        "step": tx.step,
-                        "type": tx.type,
-                        "amount": tx.amount,
-                        "nameOrig": tx.name_orig,
-                        "oldbalanceOrg": tx.old_balance_orig,
-                        "newbalanceOrig": tx.new_balance_orig,
-                        "nameDest": tx.name_dest,
-                        "oldbalanceDest": tx.old_balance_dest or 0,
-                        "newbalanceDest": tx.new_balance_dest or 0,
-                    })
-                    prediction = pred_result
-                    predictions.append(pred_result)
-                except Exception as e:
-                    pass
-            
+        # Use stored predictions; only rows not yet in the store are scored
+        scored = [None] * len(transactions)
+        if model_available:
+            try:
+                scored = await resolve_predictions_offloaded(rows)
+                predictions = list(scored)
+            except Exception:
+                scored = [None] * len(transactions)
+        
+        for tx, prediction in zip(transactions, scored):
             analyzed_transactions.append({
                 "transaction_id": tx.id,
                 "step": tx.step,
@@ -162,47 +165,37 @@ async def predict_wallet_fraud(
     Get fraud predictions for a specific wallet's recent transactions
     """
     try:
-        # Find recent transactions for this wallet
-        transactions = db.query(FraudTransaction).filter(
+        loaded = await asyncio.to_thread(get_model_registry().get)
+        
+        # Find recent transactions for this wallet with their stored predictions
+        rows = join_predictions(db.query(FraudTransaction), loaded.version).filter(
             or_(
                 FraudTransaction.name_orig == wallet_address,
                 FraudTransaction.name_dest == wallet_address
             )
         ).order_by(FraudTransaction.step.desc()).limit(limit).all()
         
-        if not transactions:
+        if not rows:
             return {
                 "wallet_address": wallet_address,
                 "predictions": [],
                 "message": "No transactions found"
             }
         
+        transactions = [tx for tx, _ in rows]
+        scored = await resolve_predictions_offloaded(rows)
+        
         predictions = []
-        for tx in transactions:
-            try:
-                pred_result = predict_transaction(transaction_data={
-                    "step": tx.step,
-                    "type": tx.type,
-                    "amount": tx.amount,
-                    "nameOrig": tx.name_orig,
-                    "oldbalanceOrg": tx.old_balance_orig,
-                    "newbalanceOrig": tx.new_balance_orig,
-                    "nameDest": tx.name_dest,
-                    "oldbalanceDest": tx.old_balance_dest or 0,
-                    "newbalanceDest": tx.new_balance_dest or 0,
-                })
-                
-                predictions.append({
-                    "transaction_id": tx.id,
-                    "step": tx.step,
-                    "type": tx.type,
-                    "amount": tx.amount,
-                    "actual_is_fraud": tx.is_fraud,
-                    "prediction": pred_result,
-                    "match": tx.is_fraud == pred_result["is_fraud"]
-                })
-            except Exception as e:
-                continue
+        for tx, pred_result in zip(transactions, scored):
+            predictions.append({
+                "transaction_id": tx.id,
+                "step": tx.step,
+                "type": tx.type,
+                "amount": tx.amount,
+                "actual_is_fraud": tx.is_fraud,
+                "prediction": pred_result,
+                "match": tx.is_fraud == pred_result["is_fraud"]
+            })
         
         return {
             "wallet_address": wallet_address,
@@ -210,12 +203,252 @@ async def predict_wallet_fraud(
             "total": len(predictions)
         }
         
+    except InferenceQueueFull:
+        raise HTTPException(status_code=503, detail="Inference queue is full. Please retry shortly.")
     except FileNotFoundError:
         raise HTTPException(status_code=503, detail="Model not trained yet")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error predicting: {str(e)}")
 
 
+@router.get("/{wallet_address}/network")
+async def get_wallet_network(
+    wallet_address: str,
+    hops: int = Query(2, ge=1, le=3, description="Neighbourhood radius in transactions"),
+    direction: str = Query("both", pattern="^(in|out|both)$", description="Follow outgoing, incoming or both"),
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_amount: Optional[float] = Query(None, ge=0),
+    min_step: Optional[int] = Query(None, ge=0),
+    max_step: Optional[int] = Query(None, ge=0),
+    fraud_only: bool = Query(False, description="Only follow transactions labelled as fraud"),
+    max_edges: int = Query(1000, ge=1, le=settings.TRANSACTION_GRAPH_MAX_EDGES),
+):
+    """
+    Counterparty network of a wallet (customer ID) from the transaction graph index
+    
+    Returns every account within `hops` transactions and the transactions
+    connecting them; only transactions passing the filters are followed.
+    """
+    graph = get_transaction_graph()
+    await asyncio.to_thread(graph.ensure_fresh)
+    
+    result = graph.neighbourhood(
+        wallet_address,
+        hops=hops,
+        direction=direction,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        min_step=min_step,
+        max_step=max_step,
+        fraud_only=fraud_only,
+        max_edges=max_edges,
+    )
+    if result is None:
+        return {
+            "wallet_address": wallet_address,
+            "found": False,
+            "message": "No transactions found for this wallet address",
+            "nodes": [],
+            "edges": [],
+            "node_count": 0,
+            "edge_count": 0,
+            "truncated": False,
+        }
+    
+    nodes = graph.node_records(result["node_ids"], result["node_hops"])
+    edges = graph.edge_records(result["edge_ids"])
+    return {
+        "wallet_address": wallet_address,
+        "found": True,
+        "hops": hops,
+        "direction": direction,
+        "nodes": nodes,
+        "edges": edges,
+        "node_count": len(nodes),
+        "edge_count": len(edges),
+        "fraud_edge_count": sum(1 for edge in edges if edge["is_fraud"]),
+        "truncated": result["truncated"],
+        "index_watermark": graph.watermark,
+    }
+
+
+@router.get("/{wallet_address}/cycles")
+async def get_wallet_cycles(
+    wallet_address: str,
+    max_hops: int = Query(4, ge=2, le=8, description="Longest cycle, in transactions"),
+    window_steps: int = Query(72, ge=1, le=744, description="Time window of a whole cycle, in steps (hours)"),
+    amount_tolerance: float = Query(0.2, ge=0, le=1, description="Allowed change in amount from one hop to the next (fraction)"),
+    max_cycles: int = Query(50, ge=1, le=500),
+):
+    """
+    Circular flows through a wallet (customer ID)
+    
+    Finds transaction cycles that leave the wallet and return to it in time
+    order, within the window, with amounts conserved hop to hop. The search
+    is bounded by CYCLE_SEARCH_BUDGET_SECONDS; `complete` is false if it was
+    cut short.
+    """
+    graph = get_transaction_graph()
+    await asyncio.to_thread(graph.ensure_fresh)
+    
+    started = time.perf_counter()
+    result = await asyncio.to_thread(
+        graph.cycles,
+        wallet_address,
+        max_hops=max_hops,
+        max_step_gap=window_steps,
+        amount_tolerance=amount_tolerance,
+        max_cycles=max_cycles,
+        time_budget=settings.CYCLE_SEARCH_BUDGET_SECONDS,
+    )
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    if result is None:
+        return {
+            "wallet_address": wallet_address,
+            "found": False,
+            "message": "No transactions found for this wallet address",
+            "cycles": [],
+            "cycle_count": 0,
+            "complete": True,
+            "elapsed_ms": elapsed_ms,
+        }
+    
+    cycles = []
+    for path in result["cycles"]:
+        transactions = graph.path_records(path)
+        cycles.append({
+            "length": len(transactions),
+            "accounts": [tx["from"] for tx in transactions] + [wallet_address],
+            "transactions": transactions,
+            "start_step": transactions[0]["step"],
+            "end_step": transactions[-1]["step"],
+            "amount_out": transactions[0]["amount"],
+            "amount_back": transactions[-1]["amount"],
+            "contains_fraud": any(tx["is_fraud"] for tx in transactions),
+        })
+    cycles.sort(key=lambda cycle: (cycle["length"], cycle["start_step"]))
+    
+    return {
+        "wallet_address": wallet_address,
+        "found": True,
+        "cycles": cycles,
+        "cycle_count": len(cycles),
+        "complete": result["complete"],
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+@router.get("/{wallet_address}/cluster")
+async def get_wallet_cluster(
+    wallet_address: str,
+    top: int = Query(10, ge=1, le=100, description="Members to list, most fraud-involved first"),
+):
+    """
+    Cluster of a wallet (customer ID)
+    
+    `component` is the connected component of the counterparty graph, kept
+    up to date as transactions load; `community` is the wallet's Louvain
+    community from the last periodic refinement (None until one has run).
+    """
+    clusters = get_account_clusters()
+    graph = get_transaction_graph()
+    # A refresh also syncs the clusters with the edges it loaded
+    await asyncio.to_thread(graph.ensure_fresh)
+    clusters.request_refine()
+    
+    result = await asyncio.to_thread(clusters.cluster, wallet_address, top)
+    if result is None:
+        return {
+            "wallet_address": wallet_address,
+            "found": False,
+            "message": "No transactions found for this wallet address",
+            "component": None,
+            "community": None,
+        }
+    return {
+        "wallet_address": wallet_address,
+        "found": True,
+        **result,
+    }
+
+
+@router.get("/trace")
+async def trace_money_flow(
+    from_wallet: str = Query(..., alias="from", description="Account the funds leave (e.g. the victim)"),
+    to_wallet: str = Query(..., alias="to", description="Account they may have reached (e.g. an exit)"),
+    max_hops: int = Query(4, ge=1, le=8, description="Longest path, in transactions"),
+    window: Optional[int] = Query(None, ge=0, le=744, description="Max steps (hours) from a path's first to its last transaction"),
+    max_paths: int = Query(20, ge=1, le=200),
+):
+    """
+    Did funds from one account reach another?
+    
+    Searches the transaction graph index for paths whose transactions run
+    in step order (a bidirectional BFS first settles reachability) and
+    returns them ranked by the amount that could have passed all the way
+    (the smallest transaction on the path), then by length. `max_flow` is
+    an upper bound on the total amount traced over the paths found.
+    """
+    if from_wallet == to_wallet:
+        raise HTTPException(status_code=400, detail="'from' and 'to' must be different accounts")
+    graph = get_transaction_graph()
+    await asyncio.to_thread(graph.ensure_fresh)
+    
+    started = time.perf_counter()
+    result = await asyncio.to_thread(
+        graph.trace,
+        from_wallet,
+        to_wallet,
+        max_hops=max_hops,
+        max_step_gap=window,
+        max_paths=max(max_paths * 10, 200),  # Collect more than returned so the ranking has a choice
+        time_budget=settings.TRACE_SEARCH_BUDGET_SECONDS,
+    )
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    if result is None:
+        return {
+            "from": from_wallet,
+            "to": to_wallet,
+            "found": False,
+            "message": "No transactions found for one or both accounts",
+            "reachable": False,
+            "paths": [],
+            "path_count": 0,
+            "max_flow": 0.0,
+            "complete": True,
+            "elapsed_ms": elapsed_ms,
+        }
+    
+    paths = []
+    for path in result["paths"]:
+        transactions = graph.path_records(path)
+        paths.append({
+            "hops": len(transactions),
+            "accounts": [from_wallet] + [tx["to"] for tx in transactions],
+            "transactions": transactions,
+            "start_step": transactions[0]["step"],
+            "end_step": transactions[-1]["step"],
+            "traced_amount": min(tx["amount"] for tx in transactions),
+            "contains_fraud": any(tx["is_fraud"] for tx in transactions),
+        })
+    paths.sort(key=lambda path: (-path["traced_amount"], path["hops"], path["end_step"]))
+    for rank, path in enumerate(paths, start=1):
+        path["rank"] = rank
+    
+    return {
+        "from": from_wallet,
+        "to": to_wallet,
+        "found": True,
+        # False: no path in time order within max_hops; None: none found before the budget ran out
+        "reachable": bool(paths) or (None if result["reachable"] and not result["complete"] else False),
+        "paths": paths[:max_paths],
+        "path_count": len(paths),
+        "max_flow": round(result["max_flow"], 2),
+        "complete": result["complete"],
+        "elapsed_ms": elapsed_ms,
+    }
+
+
 @router.get("/search/transactions")
 async def search_wallet_in_transactions(
     wallet_address: str = Query(..., description="Wallet address or customer ID to search"),
@@ -8,8 +8,10 @@ from sqlalchemy import inspect, or_
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
+import asyncio
 import json
 
+from app.core.config import settings
 from app.db.database import engine, get_db
 from app.db.models import Wallet, Complaint, IncidentReport, Evidence, User, FraudTransaction
 from app.api.v1.schemas import WalletResponse, WalletCreate
@@ -152,12 +154,57 @@ async def search_wallet(wallet_address: str, db: Session = Depends(get_db)):
     ml_tags = list(set(ml_tags))  # Remove duplicates
     
     # Get fraud transactions for this wallet (if wallet address matches customer ID)
-    fraud_transactions = db.query(FraudTransaction).filter(
+    fraud_query = db.query(FraudTransaction).filter(
         or_(
             FraudTransaction.name_orig == wallet_address,
             FraudTransaction.name_dest == wallet_address
         )
-    ).order_by(FraudTransaction.step.desc()).limit(50).all()
+    )
+    
+    # Try to read stored predictions alongside the rows if model is available
+    predictions_available = False
+    loaded = None
+    try:
+        from ml_training.model_registry import get_model_registry
+        from ml_training.prediction_store import join_predictions, resolve_predictions_offloaded
+        # Resolving the model may stat and load the artifact, so keep it off the event loop
+        loaded = await asyncio.to_thread(get_model_registry().get)
+        predictions_available = True
+    except Exception:
+        pass
+    
+    if loaded is not None:
+        fraud_rows = join_predictions(fraud_query, loaded.version).order_by(FraudTransaction.step.desc()).limit(50).all()
+    else:
+        fraud_rows = [(tx, None) for tx in fraud_query.order_by(FraudTransaction.step.desc()).limit(50).all()]
+    fraud_transactions = [tx for tx, _ in fraud_rows]
+    
+    # Counterparty network around the wallet from the transaction graph index
+    network = None
+    try:
+        from app.core.transaction_graph import get_transaction_graph
+        graph = get_transaction_graph()
+        await asyncio.to_thread(graph.ensure_fresh)
+        neighbourhood = graph.neighbourhood(wallet_address, hops=2, max_edges=settings.TRANSACTION_GRAPH_MAX_EDGES)
+        if neighbourhood is not None:
+            hops = neighbourhood["node_hops"]
+            network = {
+                "direct_counterparties": int((hops == 1).sum()),
+                "two_hop_accounts": int((hops == 2).sum()),
+                "transactions": len(neighbourhood["edge_ids"]),
+                "fraud_transactions": int(graph.is_fraud[neighbourhood["edge_ids"]].sum()),
+                "truncated": neighbourhood["truncated"],
+            }
+    except Exception:
+        pass
+    
+    # Network risk from the last propagation run (ml_training/risk_propagation.py)
+    propagated_risk = None
+    try:
+        from ml_training.risk_propagation import get_wallet_risk
+        propagated_risk = get_wallet_risk(db, wallet_address)
+    except Exception:
+        pass
     
     fraud_analysis = None
     if fraud_transactions:
@@ -165,14 +212,19 @@ async def search_wallet(wallet_address: str, db: Session = Depends(get_db)):
         normal_count = len(fraud_transactions) - fraud_count
         fraud_percentage = (fraud_count / len(fraud_transactions) * 100) if fraud_transactions else 0
         
-        # Try to get predictions if model is available
-        predictions_available = False
-        try:
-            from ml_training.predict_fraud import load_model
-            load_model()
-            predictions_available = True
-        except:
-            pass
+        predictions = [None] * len(fraud_transactions)
+        if loaded is not None:
+            try:
+                predictions = await resolve_predictions_offloaded(fraud_rows)
+            except Exception:
+                predictions_available = False
+        
+        recent_transactions = []
+        for tx, prediction in list(zip(fraud_transactions, predictions))[:10]:
+            tx_dict = tx.to_dict()
+            if prediction is not None:
+                tx_dict["prediction"] = prediction
+            recent_transactions.append(tx_dict)
         
         fraud_analysis = {
             "total_transactions": len(fraud_transactions),
@@ -181,7 +233,8 @@ async def search_wallet(wallet_address: str, db: Session = Depends(get_db)):
             "fraud_percentage": round(fraud_percentage, 2),
             "risk_level": "VERY HIGH" if fraud_percentage >= 50 else "HIGH" if fraud_percentage >= 30 else "MEDIUM" if fraud_percentage >= 10 else "LOW",
             "predictions_available": predictions_available,
-            "recent_transactions": [tx.to_dict() for tx in fraud_transactions[:10]]
+            "predicted_fraud_count": sum(1 for p in predictions if p and p["is_fraud"] == 1) if predictions_available else None,
+            "recent_transactions": recent_transactions
         }
     
     return {
@@ -217,6 +270,8 @@ async def search_wallet(wallet_address: str, db: Session = Depends(get_db)):
         "incident_reports_count": len(incident_reports_data),
         "evidence_count": len(evidence_data),
         "fraud_analysis": fraud_analysis,  # New: fraud detection analysis
+        "network": network,  # 2-hop counterparty network summary (None if not in the dataset)
+        "propagated_risk": propagated_risk,  # Personalized PageRank risk (None until the batch job has scored it)
     }
 
 
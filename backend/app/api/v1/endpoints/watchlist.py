@@ -4,14 +4,25 @@ Allow saving wallets for quick analysis and tracking latest risk.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
+import asyncio
+import json
+import time
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.core.watchlist_index import get_watchlist_index
+from app.core.watchlist_monitor import latest_activity
+from app.db.database import get_db, SessionLocal
 from app.db.models import WatchlistWallet, IncidentReport
-from app.api.v1.endpoints.incidents import analyze_wallet_incident
+from app.api.v1.endpoints.incidents import (
+    analyze_wallet_incident,
+    get_current_user_from_request,
+    run_incident_analysis,
+)
 from app.api.v1.schemas import IncidentReportRequest
 
 
@@ -29,7 +40,6 @@ def get_watchlist(db: Session = Depends(get_db)):
     items = db.query(WatchlistWallet).order_by(WatchlistWallet.created_at.desc()).all()
     result = []
     for w in items:
-        # Use getattr with defaults to handle missing columns gracefully
         result.append(
             {
                 "id": w.id,
@@ -38,10 +48,10 @@ def get_watchlist(db: Session = Depends(get_db)):
                 "active": w.active,
                 "created_by": w.created_by,  # Include created_by for filtering
                 "created_at": w.created_at.isoformat() if w.created_at else None,
-                "last_risk_score": getattr(w, 'last_risk_score', None),
-                "last_risk_level": getattr(w, 'last_risk_level', None),
-                "last_checked_at": getattr(w, 'last_checked_at', None).isoformat() if getattr(w, 'last_checked_at', None) else None,
-                "last_report_id": getattr(w, 'last_report_id', None),
+                "last_risk_score": w.last_risk_score,
+                "last_risk_level": w.last_risk_level,
+                "last_checked_at": w.last_checked_at.isoformat() if w.last_checked_at else None,
+                "last_report_id": w.last_report_id,
             }
         )
     return result
@@ -70,6 +80,7 @@ def add_to_watchlist(
             db.add(existing)
             db.commit()
             db.refresh(existing)
+            get_watchlist_index().add(existing.wallet_address)
         return {
             "id": existing.id,
             "wallet_address": existing.wallet_address,
@@ -81,6 +92,7 @@ def add_to_watchlist(
     db.add(item)
     db.commit()
     db.refresh(item)
+    get_watchlist_index().add(item.wallet_address)
     return {
         "id": item.id,
         "wallet_address": item.wallet_address,
@@ -89,15 +101,39 @@ def add_to_watchlist(
     }
 
 
+@router.get("/hits", response_model=dict)
+def get_watchlist_hits(limit: int = Query(100, ge=1, le=1000)):
+    """
+    Recent transactions that involved a watchlisted wallet, newest first.
+
+    Hits are detected in this worker as rows are inserted into
+    fraud_transactions or transactions; see also the watchlist.hit audit log.
+    """
+    index = get_watchlist_index()
+    hits = list(index.recent_hits)[-limit:]
+    hits.reverse()
+    return {"index": index.stats(), "count": len(hits), "hits": hits}
+
+
 @router.delete("/{watch_id}", response_model=dict)
 def remove_from_watchlist(watch_id: int, db: Session = Depends(get_db)):
     """Soft-remove a wallet from the watchlist."""
     item = db.query(WatchlistWallet).filter(WatchlistWallet.id == watch_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Watchlist entry not found")
+    was_active = item.active
     item.active = False
     db.add(item)
     db.commit()
+    if was_active:
+        # Another active entry may hold the same address
+        still_watched = (
+            db.query(WatchlistWallet.id)
+            .filter(WatchlistWallet.wallet_address == item.wallet_address, WatchlistWallet.active.is_(True))
+            .first()
+        )
+        if still_watched is None:
+            get_watchlist_index().discard(item.wallet_address)
     return {"message": "Removed from watchlist", "id": watch_id}
 
 
@@ -118,8 +154,10 @@ async def analyze_watchlist_wallet(
         wallet_address=item.wallet_address,
         description="Periodic watchlist analysis",
     )
+    # Mark the activity this analysis covers before it runs, so rows added meanwhile count as new
+    seen_tx_id = latest_activity(db, [item.wallet_address]).get(item.wallet_address, 0)
     # Re-use existing analysis pipeline - pass request_obj for authentication
-    report = await analyze_wallet_incident(request, request_obj, db)
+    report = await analyze_wallet_incident(request, request_obj, db, mode="sync")
 
     # Find the last incident report row for this wallet to link
     last_report = (
@@ -129,83 +167,185 @@ async def analyze_watchlist_wallet(
         .first()
     )
 
-    # Note: Not updating watchlist monitoring fields since columns don't exist yet
-    # Once migration adds the columns, uncomment the code below:
-    # if hasattr(item, 'last_risk_score'):
-    #     item.last_risk_score = report.risk_score
-    # if hasattr(item, 'last_risk_level'):
-    #     item.last_risk_level = report.risk_level
-    # if hasattr(item, 'last_checked_at'):
-    #     item.last_checked_at = datetime.utcnow()
-    # if hasattr(item, 'last_report_id'):
-    #     item.last_report_id = last_report.id if last_report else None
-    # db.add(item)
-    # db.commit()
-    # db.refresh(item)
+    item.last_risk_score = report.risk_score
+    item.last_risk_level = report.risk_level
+    item.last_checked_at = datetime.utcnow()
+    item.last_report_id = last_report.id if last_report else None
+    item.last_seen_tx_id = max(item.last_seen_tx_id or 0, seen_tx_id)
+    db.add(item)
+    db.commit()
+    db.refresh(item)
 
     return {
         "id": item.id,
         "wallet_address": item.wallet_address,
         "label": item.label,
-        "last_risk_score": report.risk_score,
-        "last_risk_level": report.risk_level,
-        "last_checked_at": datetime.utcnow().isoformat(),
-        "last_report_id": last_report.id if last_report else None,
+        "last_risk_score": item.last_risk_score,
+        "last_risk_level": item.last_risk_level,
+        "last_checked_at": item.last_checked_at.isoformat(),
+        "last_report_id": item.last_report_id,
         "message": "Analysis complete. View the incident report for details.",
     }
 
 
+async def _analyze_watch_item(
+    watch_id: int,
+    wallet_address: str,
+    investigator_id: Optional[int],
+    deadline_seconds: float,
+    seen_tx_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Analyze one watchlist wallet in its own session and record the result
+
+    The analysis gets deadline_seconds (after which it falls back to the
+    template conclusion) plus the same again as a hard limit. The report
+    and the monitoring fields are committed before returning, so a sweep
+    that stops early keeps every wallet finished so far. seen_tx_id, the
+    wallet's newest transaction when the analysis started, advances its
+    monitoring high-water mark.
+    """
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        request = IncidentReportRequest(
+            wallet_address=wallet_address,
+            description="Periodic watchlist analysis",
+        )
+        report = await asyncio.wait_for(
+            run_incident_analysis(request, investigator_id, db, deadline_seconds=deadline_seconds),
+            timeout=deadline_seconds * 2,
+        )
+        checked_at = datetime.utcnow()
+        last_report_id = int(report.report_id) if report.report_id else None
+
+        item = db.query(WatchlistWallet).filter(WatchlistWallet.id == watch_id).first()
+        if item is not None:
+            item.last_risk_score = report.risk_score
+            item.last_risk_level = report.risk_level
+            item.last_checked_at = checked_at
+            item.last_report_id = last_report_id
+            if seen_tx_id is not None:
+                item.last_seen_tx_id = max(item.last_seen_tx_id or 0, seen_tx_id)
+            db.add(item)
+            db.commit()
+        return {
+            "id": watch_id,
+            "wallet_address": wallet_address,
+            "status": "ok",
+            "last_risk_score": report.risk_score,
+            "last_risk_level": report.risk_level,
+            "last_checked_at": checked_at.isoformat(),
+            "last_report_id": last_report_id,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+    except asyncio.TimeoutError:
+        db.rollback()
+        status, error = "timeout", f"Analysis exceeded {deadline_seconds * 2:g}s"
+    except Exception as e:
+        db.rollback()
+        status, error = "error", str(e)
+    finally:
+        db.close()
+    return {
+        "id": watch_id,
+        "wallet_address": wallet_address,
+        "status": status,
+        "error": error,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+async def sweep_watchlist(
+    items: List[Tuple[int, str]],
+    investigator_id: Optional[int],
+    concurrency: int,
+    deadline_seconds: float,
+    seen_tx_ids: Optional[Dict[int, int]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Analyze watchlist wallets concurrently, yielding each result as it finishes
+
+    At most `concurrency` analyses run at once. If the consumer stops
+    iterating (e.g. the client disconnects) the remaining analyses are
+    cancelled and awaited, so their sessions are closed when it returns;
+    finished ones are already committed. seen_tx_ids maps
+    watchlist ids to the high-water marks to record (see _analyze_watch_item).
+    """
+    seen_tx_ids = seen_tx_ids or {}
+    slots = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(watch_id: int, wallet_address: str) -> Dict[str, Any]:
+        async with slots:
+            return await _analyze_watch_item(
+                watch_id, wallet_address, investigator_id, deadline_seconds, seen_tx_ids.get(watch_id)
+            )
+
+    tasks = [asyncio.create_task(run(watch_id, wallet_address)) for watch_id, wallet_address in items]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let the cancelled analyses unwind so their sessions are closed before the sweep returns
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
 @router.post("/batch-analyze", response_model=dict)
 async def batch_analyze_watchlist(
     request_obj: Request,  # Add Request object for authentication
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    stream: bool = Query(False, description="Stream one NDJSON line per wallet as it finishes, then a summary line"),
+    concurrency: Optional[int] = Query(None, ge=1, le=64, description="Wallets analyzed at once (default WATCHLIST_SWEEP_CONCURRENCY)"),
 ):
     """
     Run analysis for all active watchlist wallets.
     This auto-creates new incident reports and updates monitoring status.
+    
+    Wallets are analyzed concurrently, each in its own DB session with its
+    own deadline, and committed as they finish. With stream=true the
+    response is NDJSON: {"event": "wallet", ...} per wallet in completion
+    order, then {"event": "done", ...}.
     """
-    active_items = (
-        db.query(WatchlistWallet)
+    current_user = await get_current_user_from_request(request_obj, db)
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    investigator_id = current_user.id if current_user.role == "investigator" else None
+
+    items = [
+        (watch_id, wallet_address)
+        for watch_id, wallet_address in db.query(WatchlistWallet.id, WatchlistWallet.wallet_address)
         .filter(WatchlistWallet.active.is_(True))
+        .order_by(WatchlistWallet.id)
         .all()
+    ]
+    latest = latest_activity(db, (wallet_address for _, wallet_address in items))
+    db.close()  # Each wallet uses its own session; don't hold this one for the whole sweep
+    sweep = sweep_watchlist(
+        items,
+        investigator_id,
+        concurrency or settings.WATCHLIST_SWEEP_CONCURRENCY,
+        settings.WATCHLIST_SWEEP_WALLET_DEADLINE_SECONDS,
+        {watch_id: latest.get(wallet_address, 0) for watch_id, wallet_address in items},
     )
-    results = []
-    for item in active_items:
-        request = IncidentReportRequest(
-            wallet_address=item.wallet_address,
-            description="Periodic watchlist analysis",
-        )
-        report = await analyze_wallet_incident(request, request_obj, db)
 
-        last_report = (
-            db.query(IncidentReport)
-            .filter(IncidentReport.wallet_address == item.wallet_address)
-            .order_by(IncidentReport.created_at.desc())
-            .first()
-        )
+    if stream:
+        async def lines():
+            started = time.perf_counter()
+            counts = {"ok": 0, "timeout": 0, "error": 0}
+            async for result in sweep:
+                counts[result["status"]] += 1
+                yield json.dumps({"event": "wallet", **result}) + "\n"
+            yield json.dumps({
+                "event": "done",
+                "count": len(items),
+                **counts,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            }) + "\n"
 
-        # Safely set attributes (in case columns don't exist yet)
-        if hasattr(item, 'last_risk_score'):
-            item.last_risk_score = report.risk_score
-        if hasattr(item, 'last_risk_level'):
-            item.last_risk_level = report.risk_level
-        if hasattr(item, 'last_checked_at'):
-            item.last_checked_at = datetime.utcnow()
-        if hasattr(item, 'last_report_id'):
-            item.last_report_id = last_report.id if last_report else None
-        
-        db.add(item)
-        results.append(
-            {
-                "id": item.id,
-                "wallet_address": item.wallet_address,
-                "last_risk_score": getattr(item, 'last_risk_score', report.risk_score),
-                "last_risk_level": getattr(item, 'last_risk_level', report.risk_level),
-                "last_checked_at": getattr(item, 'last_checked_at', datetime.utcnow()).isoformat(),
-                "last_report_id": getattr(item, 'last_report_id', last_report.id if last_report else None),
-            }
-        )
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-    db.commit()
+    results = [result async for result in sweep]
+    results.sort(key=lambda result: result["id"])
     return {"count": len(results), "items": results}
-
@@ -0,0 +1,405 @@
+"""
+Account clusters over the transaction graph index.
+
+A union-find structure follows the graph as it loads: it is synced from
+every graph refresh, and each transaction appended to the index unions its
+two accounts. The connected component of an account (size, transactions,
+fraud density, most fraud-involved members) is then a find() and an O(top)
+read instead of a traversal of fraud_transactions. Small batches are
+unioned one edge at a time; large ones (the initial load) are merged with
+the vectorized kernel in graph_kernels.
+
+Members are kept per component as a circular linked list, spliced in O(1)
+on union, and components larger than TOP_MEMBERS also keep their best
+TOP_MEMBERS members ranked. Account counters only grow, so that ranking
+stays exact by re-placing the two accounts of each new edge.
+
+Components of a payments graph tend to be few and huge, so a Louvain pass
+over the whole graph refines them into communities. It runs in the
+background, at most every CLUSTER_REFINE_INTERVAL_SECONDS; accounts added
+since the last pass have no community until the next one.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import insort
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.audit_logging import emit_audit_log
+from app.core.config import settings
+from app.core.graph_kernels import louvain, merge_components
+from app.core.transaction_graph import TransactionGraph, get_transaction_graph
+
+# Batches of at least this many new edges are merged vectorized
+BULK_MERGE_MIN_EDGES = 1000
+
+# Members ranked per component and community (the most a query can list)
+TOP_MEMBERS = 100
+
+# (-fraud transactions, -transactions, node): ascending order ranks the most fraud-involved first
+MemberKey = Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class Communities:
+    """Result of one Louvain pass, replaced as a whole so readers never mix two passes."""
+    labels: np.ndarray  # Community per node id seen by the pass
+    size: np.ndarray
+    edges: np.ndarray  # Transactions between members
+    fraud: np.ndarray
+    refined_at: float  # time.time()
+    edge_count: int  # Graph edges the pass covered
+    # Members of community c are members[offsets[c]:offsets[c + 1]], most fraud-involved first
+    members: np.ndarray
+    offsets: np.ndarray
+    transactions: np.ndarray  # Per node, over the edges the pass covered
+    fraud_transactions: np.ndarray
+
+
+class AccountClusters:
+    """Connected components (union-find) and Louvain communities of the graph's accounts."""
+
+    def __init__(self, graph: TransactionGraph) -> None:
+        self.graph = graph
+        self._lock = threading.Lock()
+        self._refine_lock = threading.Lock()
+        self.synced_edges = 0  # Graph edges unioned so far
+
+        # Union-find over node ids; the per-root counters are only valid at roots
+        self.parent = np.empty(0, dtype=np.int64)
+        self.size = np.empty(0, dtype=np.int64)
+        self.edge_count = np.empty(0, dtype=np.int64)
+        self.fraud_count = np.empty(0, dtype=np.int64)
+        # Per-account counters, for ranking members
+        self.degree = np.empty(0, dtype=np.int64)
+        self.fraud_degree = np.empty(0, dtype=np.int64)
+        self.next_member = np.empty(0, dtype=np.int64)  # Circular list of each component's members
+        self._tops: Dict[int, List[MemberKey]] = {}  # Root -> ranked best members, for components > TOP_MEMBERS
+        self.components = 0
+
+        self.communities: Optional[Communities] = None  # Last Louvain pass
+
+    # ---- union-find -----------------------------------------------------
+
+    def _grow(self, n_nodes: int) -> None:
+        old = len(self.parent)
+        if n_nodes <= old:
+            return
+        extra = n_nodes - old
+        self.parent = np.concatenate([self.parent, np.arange(old, n_nodes, dtype=np.int64)])
+        self.size = np.concatenate([self.size, np.ones(extra, dtype=np.int64)])
+        self.next_member = np.concatenate([self.next_member, np.arange(old, n_nodes, dtype=np.int64)])
+        self.components += extra
+        for name in ("edge_count", "fraud_count", "degree", "fraud_degree"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(extra, dtype=np.int64)]))
+
+    def find(self, node: int) -> int:
+        """Root of a node's component (path halving)."""
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return int(node)
+
+    def _key(self, node: int) -> MemberKey:
+        return (-int(self.fraud_degree[node]), -int(self.degree[node]), node)
+
+    def _ranked(self, root: int) -> List[MemberKey]:
+        """Members of a component, best first (kept for large components, walked for small ones)."""
+        top = self._tops.get(root)
+        if top is not None:
+            return top
+        members = [root]
+        node = int(self.next_member[root])
+        while node != root:
+            members.append(node)
+            node = int(self.next_member[node])
+        return sorted(self._key(node) for node in members)
+
+    def _rerank(self, node: int, root: int) -> None:
+        """Re-place a member whose counters grew in its (large) component's ranking."""
+        top = self._tops.get(root)
+        if top is None:
+            return
+        for i, entry in enumerate(top):
+            if entry[2] == node:
+                del top[i]
+                break
+        insort(top, self._key(node))
+        if len(top) > TOP_MEMBERS:
+            top.pop()
+
+    def _union(self, a: int, b: int, fraud: int) -> None:
+        """Union an edge's accounts (their degree counters already include the edge)."""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            if self.size[root_a] < self.size[root_b]:
+                root_a, root_b = root_b, root_a
+            merged_size = int(self.size[root_a] + self.size[root_b])
+            if merged_size > TOP_MEMBERS:
+                ranked = self._ranked(root_a) + self._ranked(root_b)
+                self._tops.pop(root_b, None)
+                self._tops[root_a] = sorted(ranked)[:TOP_MEMBERS]
+            self.parent[root_b] = root_a
+            self.size[root_a] = merged_size
+            self.edge_count[root_a] += self.edge_count[root_b]
+            self.fraud_count[root_a] += self.fraud_count[root_b]
+            # Splice the two member lists into one
+            self.next_member[root_a], self.next_member[root_b] = self.next_member[root_b], self.next_member[root_a]
+            self.components -= 1
+        self.edge_count[root_a] += 1
+        self.fraud_count[root_a] += fraud
+        self._rerank(a, root_a)
+        if b != a:
+            self._rerank(b, root_a)
+
+    def _merge_bulk(self, src: np.ndarray, dst: np.ndarray, is_fraud: np.ndarray) -> None:
+        n_nodes = len(self.parent)
+        roots = merge_components(self.all_roots(), src, dst)
+        # Fold the old roots' counters into the new roots
+        old_roots = np.flatnonzero(self.parent == np.arange(n_nodes))
+        size = np.bincount(roots[old_roots], weights=self.size[old_roots], minlength=n_nodes)
+        edge_count = np.bincount(roots[old_roots], weights=self.edge_count[old_roots], minlength=n_nodes)
+        fraud_count = np.bincount(roots[old_roots], weights=self.fraud_count[old_roots], minlength=n_nodes)
+        edge_count += np.bincount(roots[src], minlength=n_nodes)
+        fraud_count += np.bincount(roots[src], weights=is_fraud, minlength=n_nodes)
+        self.parent = roots
+        self.size = size.astype(np.int64)
+        self.edge_count = edge_count.astype(np.int64)
+        self.fraud_count = fraud_count.astype(np.int64)
+        self._rebuild_members()
+
+    def _rebuild_members(self) -> None:
+        """Member lists and rankings from scratch (self.parent must map every node to its root)."""
+        roots = self.parent
+        n_nodes = len(roots)
+        order = np.lexsort((np.arange(n_nodes), -self.degree, -self.fraud_degree, roots))
+        grouped = roots[order]
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        ends = np.r_[starts[1:], n_nodes]
+        next_member = np.empty(n_nodes, dtype=np.int64)
+        next_member[order[:-1]] = order[1:]
+        next_member[order[ends - 1]] = order[starts]
+        tops = {}
+        for start in starts[ends - starts > TOP_MEMBERS].tolist():
+            best = order[start:start + TOP_MEMBERS]
+            tops[int(grouped[start])] = list(
+                zip((-self.fraud_degree[best]).tolist(), (-self.degree[best]).tolist(), best.tolist())
+            )
+        self.next_member = next_member
+        self._tops = tops
+        self.components = len(starts)
+
+    def sync(self) -> int:
+        """
+        Union the edges the graph has appended since the last sync.
+
+        Returns:
+            Number of edges added
+        """
+        with self._lock:
+            view = self.graph.snapshot()
+            start = self.synced_edges
+            end = len(view.src)
+            if end == start:
+                return 0
+            self._grow(view.n_nodes)
+            src, dst = view.src[start:end], view.dst[start:end]
+            is_fraud = view.is_fraud[start:end].astype(np.int64)
+            if end - start >= BULK_MERGE_MIN_EDGES:
+                np.add.at(self.degree, src, 1)
+                np.add.at(self.degree, dst, 1)
+                np.add.at(self.fraud_degree, src, is_fraud)
+                np.add.at(self.fraud_degree, dst, is_fraud)
+                self._merge_bulk(src, dst, is_fraud)
+            else:
+                for a, b, fraud in zip(src.tolist(), dst.tolist(), is_fraud.tolist()):
+                    self.degree[a] += 1
+                    self.degree[b] += 1
+                    self.fraud_degree[a] += fraud
+                    self.fraud_degree[b] += fraud
+                    self._union(a, b, fraud)
+            self.synced_edges = end
+            return end - start
+
+    def all_roots(self) -> np.ndarray:
+        """Root of every node (pointer jumping over the parent array; O(n), for bulk merges)."""
+        roots = self.parent
+        while True:
+            jumped = roots[roots]
+            if np.array_equal(jumped, roots):
+                return roots
+            roots = jumped
+
+    # ---- Louvain refinement ---------------------------------------------
+
+    def refine(self, time_budget: Optional[float] = None) -> Dict[str, Any]:
+        """Recompute Louvain communities over every edge synced so far."""
+        with self._refine_lock:
+            started = time.perf_counter()
+            view = self.graph.snapshot()
+            n_edges = min(self.synced_edges, len(view.src))
+            src, dst = view.src[:n_edges], view.dst[:n_edges]
+            # Only accounts seen in synced edges; later ones get a community on the next pass
+            n_nodes = int(max(src.max(), dst.max())) + 1 if n_edges else 0
+            community = louvain(
+                src,
+                dst,
+                n_nodes,
+                deadline=time.monotonic() + time_budget if time_budget is not None else None,
+            )
+            n_communities = int(community.max()) + 1 if n_nodes else 0
+            inside = community[src] == community[dst]
+            size = np.bincount(community, minlength=n_communities)
+            is_fraud = view.is_fraud[:n_edges].astype(np.int64)
+            transactions = np.bincount(src, minlength=n_nodes) + np.bincount(dst, minlength=n_nodes)
+            fraud_transactions = (
+                np.bincount(src, weights=is_fraud, minlength=n_nodes)
+                + np.bincount(dst, weights=is_fraud, minlength=n_nodes)
+            ).astype(np.int64)
+            offsets = np.zeros(n_communities + 1, dtype=np.int64)
+            np.cumsum(size, out=offsets[1:])
+            self.communities = Communities(
+                labels=community,
+                size=size,
+                edges=np.bincount(community[src[inside]], minlength=n_communities),
+                fraud=np.bincount(
+                    community[src[inside]], weights=view.is_fraud[:n_edges][inside], minlength=n_communities
+                ).astype(np.int64),
+                refined_at=time.time(),
+                edge_count=n_edges,
+                members=np.lexsort((np.arange(n_nodes), -transactions, -fraud_transactions, community)),
+                offsets=offsets,
+                transactions=transactions,
+                fraud_transactions=fraud_transactions,
+            )
+            return {
+                "communities": n_communities,
+                "edges": n_edges,
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+            }
+
+    def request_refine(self) -> bool:
+        """Start refine() in a background thread if the last pass is older than the interval."""
+        if self._refine_lock.locked() or not self.synced_edges:
+            return False
+        last = self.communities
+        if last is not None and (
+            last.edge_count == self.synced_edges
+            or time.time() - last.refined_at < settings.CLUSTER_REFINE_INTERVAL_SECONDS
+        ):
+            return False
+
+        def run():
+            try:
+                self.refine(time_budget=settings.CLUSTER_REFINE_BUDGET_SECONDS)
+            except Exception as exc:
+                emit_audit_log(
+                    action="account_clusters.refine",
+                    status="warning",
+                    message="Louvain refinement of account clusters failed.",
+                    details={"error": str(exc)},
+                )
+
+        threading.Thread(target=run, name="account-cluster-refine", daemon=True).start()
+        return True
+
+    # ---- queries --------------------------------------------------------
+
+    def _member_records(self, nodes: List[int], transactions: List[int], fraud: List[int]) -> List[Dict[str, Any]]:
+        accounts = self.graph.accounts
+        return [
+            {"id": accounts[node], "transactions": count, "fraud_transactions": fraud_count}
+            for node, count, fraud_count in zip(nodes, transactions, fraud)
+        ]
+
+    def cluster(self, account: str, top: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        Component and community of an account (a find() and O(top) reads; no scan of the graph).
+
+        Args:
+            top: Members to list, most fraud-involved first (at most TOP_MEMBERS)
+
+        Returns:
+            None if the account has no synced transactions, else a dict with
+            component and community (None before the first Louvain pass or
+            for accounts added since; its member counts are as of the pass)
+        """
+        top = min(top, TOP_MEMBERS)
+        node = self.graph.account_id(account)
+        if node is None:
+            return None
+        with self._lock:
+            if node >= len(self.parent):
+                return None
+            root = self.find(node)
+            best = self._ranked(root)[:top]
+            transactions = int(self.edge_count[root])
+            fraud = int(self.fraud_count[root])
+            component = {
+                "id": root,
+                "size": int(self.size[root]),
+                "transactions": transactions,
+                "fraud_transactions": fraud,
+                "fraud_density": round(fraud / transactions, 4) if transactions else 0.0,
+                "top_members": self._member_records(
+                    [member for _, _, member in best],
+                    [-count for _, count, _ in best],
+                    [-fraud_count for fraud_count, _, _ in best],
+                ),
+            }
+
+        community = None
+        communities = self.communities
+        if communities is not None and node < len(communities.labels):
+            label = int(communities.labels[node])
+            internal = int(communities.edges[label])
+            fraud = int(communities.fraud[label])
+            start = int(communities.offsets[label])
+            members = communities.members[start:min(start + top, int(communities.offsets[label + 1]))]
+            community = {
+                "id": label,
+                "size": int(communities.size[label]),
+                "transactions": internal,  # Between members
+                "fraud_transactions": fraud,
+                "fraud_density": round(fraud / internal, 4) if internal else 0.0,
+                "top_members": self._member_records(
+                    members.tolist(),
+                    communities.transactions[members].tolist(),
+                    communities.fraud_transactions[members].tolist(),
+                ),
+                "refined_at": datetime.utcfromtimestamp(communities.refined_at).isoformat(),
+            }
+        return {"component": component, "community": community}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "synced_edges": self.synced_edges,
+            "components": self.components,
+            "communities": len(self.communities.size) if self.communities is not None else None,
+            "refined_edges": self.communities.edge_count if self.communities is not None else 0,
+            "refine_running": self._refine_lock.locked(),
+        }
+
+
+_account_clusters: Optional[AccountClusters] = None
+_account_clusters_lock = threading.Lock()
+
+
+def get_account_clusters() -> AccountClusters:
+    """Get or create the global account clusters (synced by every refresh of the transaction graph)."""
+    global _account_clusters
+    if _account_clusters is None:
+        with _account_clusters_lock:
+            if _account_clusters is None:
+                graph = get_transaction_graph()
+                clusters = AccountClusters(graph)
+                graph.add_refresh_listener(clusters.sync)
+                _account_clusters = clusters
+    return _account_clusters
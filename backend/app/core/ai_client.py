@@ -2,9 +2,11 @@ import json
 import os
 from typing import Any, Dict
 
-import httpx
+from app.core.http_client import get_http_client
+from app.core.llm_cache import cache_key, get_llm_cache
 
 
+OPENROUTER_CHAT_URL = "https://openrouter.ai/api/v1/chat/completions"
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini")
 
@@ -15,27 +17,31 @@ async def call_openrouter_json(prompt: str) -> Dict[str, Any]:
     return parsed JSON from the model response.
 
     If OPENROUTER_API_KEY is not configured, this returns an empty dict so
-    the caller can fall back to heuristic logic.
+    the caller can fall back to heuristic logic. Parsed responses are cached
+    by prompt (see app.core.llm_cache).
     """
     if not OPENROUTER_API_KEY:
         return {}
 
-    validate_certs = os.getenv("VALIDATE_CERTS", "true").lower() == "true"
-
-    async with httpx.AsyncClient(timeout=15.0, verify=validate_certs) as client:
-        response = await client.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": OPENROUTER_MODEL,
-                "messages": [{"role": "user", "content": prompt}],
-                "response_format": {"type": "json_object"},
-                "temperature": 0.1,
-            },
-        )
+    key = cache_key(OPENROUTER_MODEL, prompt, 0.1, response_format="json_object")
+    cached = await get_llm_cache().aget(key)
+    if cached is not None:
+        return cached
+
+    response = await get_http_client(OPENROUTER_CHAT_URL).post(
+        OPENROUTER_CHAT_URL,
+        headers={
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": OPENROUTER_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.1,
+        },
+        timeout=15.0,
+    )
 
     response.raise_for_status()
     data = response.json()
@@ -43,8 +49,11 @@ async def call_openrouter_json(prompt: str) -> Dict[str, Any]:
     # Expect JSON response_format, so the content should be a JSON string
     content = data["choices"][0]["message"]["content"]
     try:
-        return json.loads(content)
+        result = json.loads(content)
     except Exception:
         # If parsing fails, return empty dict to avoid crashing the dashboard
         return {}
+    if result:
+        await get_llm_cache().aset(key, result)
+    return result
 
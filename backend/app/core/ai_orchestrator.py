@@ -9,13 +9,12 @@ of the orchestrator is defined on that side.
 
 from typing import Any, Dict, Optional
 
-import httpx
-
 from app.core.config import settings
 from app.core.audit_logging import emit_audit_log
+from app.core.http_client import get_http_client
 
 
-def call_incident_orchestrator(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+async def call_incident_orchestrator(payload: Dict[str, Any], timeout: float = 30.0) -> Optional[Dict[str, Any]]:
     """
     Call the external AI orchestrator for incident / wallet analysis.
 
@@ -30,7 +29,8 @@ def call_incident_orchestrator(payload: Dict[str, Any]) -> Optional[Dict[str, An
       - detected_patterns: list[str]  # optional, additional patterns
 
     If anything fails, this returns None so callers can fall back
-    to the existing OpenRouter/template logic.
+    to the existing OpenRouter/template logic. `timeout` bounds the HTTP
+    call in seconds.
     """
     url = settings.AI_ORCHESTRATOR_INCIDENT_URL
     if not url:
@@ -50,8 +50,7 @@ def call_incident_orchestrator(payload: Dict[str, Any]) -> Optional[Dict[str, An
             message="Calling incident orchestrator.",
             details={"url": url},
         )
-        with httpx.Client(timeout=30.0, verify=settings.VALIDATE_CERTS) as client:
-            response = client.post(url, headers=headers, json=payload)
+        response = await get_http_client(url).post(url, headers=headers, json=payload, timeout=timeout)
 
         if not (200 <= response.status_code < 300):
             emit_audit_log(
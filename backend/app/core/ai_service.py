@@ -3,41 +3,31 @@ AI Service for generating intelligent conclusions
 Uses OpenRouter API (free Qwen 2.5 model) for dynamic analysis
 """
 
-import requests
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from app.core.config import settings
 from app.core.audit_logging import emit_audit_log
+from app.core.http_client import get_http_client, get_sync_http_client
+from app.core.llm_cache import cache_key, get_llm_cache
 
 
-def generate_ai_conclusion(
+OPENROUTER_CHAT_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_MODELS_URL = "https://openrouter.ai/api/v1/models"
+
+
+def _build_conclusion_request(
     wallet: str,
     risk_score: float,
     risk_level: str,
     pattern_type: str,
     detected_patterns: List[str],
     summary: Dict,
-    user_description: str,
-    fallback_to_template: bool = True
-) -> str:
+    user_description: str
+) -> Tuple[Dict, Dict]:
     """
-    Generate AI-powered conclusion using OpenRouter API (Qwen 2.5)
-    
-    Args:
-        wallet: Wallet address
-        risk_score: Risk score (0.0-1.0)
-        risk_level: Risk level (VERY HIGH, HIGH, etc.)
-        pattern_type: Detected pattern type
-        detected_patterns: List of detected patterns
-        summary: Transaction summary dict
-        user_description: User's description of the incident
-        fallback_to_template: If True, fallback to template if AI fails
-    
-    Returns:
-        AI-generated conclusion text
+    Build the OpenRouter headers and JSON body for a conclusion request
     """
-    try:
-        # Prepare context for AI
-        context = f"""Wallet Address: {wallet}
+    # Prepare context for AI
+    context = f"""Wallet Address: {wallet}
 Risk Score: {risk_score:.0%}
 Risk Level: {risk_level}
 Pattern Type: {pattern_type}
@@ -51,9 +41,9 @@ Transaction Summary:
 
 User Report: {user_description}
 """
-        
-        # Create prompt for AI
-        prompt = f"""You are a cybercrime investigation analyst. Analyze this wallet transaction data and generate a professional, concise conclusion.
+    
+    # Create prompt for AI
+    prompt = f"""You are a cybercrime investigation analyst. Analyze this wallet transaction data and generate a professional, concise conclusion.
 
 {context}
 
@@ -65,52 +55,129 @@ Generate a 2-3 sentence professional conclusion that:
 
 Keep it concise, factual, and professional. Do not use markdown formatting."""
 
+    headers = {
+        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://cybercrime-investigation.local",  # Optional
+        "X-Title": "Cybercrime Investigation Dashboard"  # Optional
+    }
+    body = {
+        "model": settings.OPENROUTER_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a professional cybercrime investigation analyst. Provide concise, factual analysis suitable for law enforcement reports."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": 0.3,
+        "max_tokens": 200
+    }
+    return headers, body
+
+
+def _conclusion_cache_key(body: Dict) -> str:
+    return cache_key(
+        body["model"], body["messages"], body["temperature"], max_tokens=body["max_tokens"], kind="conclusion"
+    )
+
+
+def _parse_conclusion(result: Dict) -> str:
+    """
+    Extract the conclusion text from an OpenRouter response
+    """
+    conclusion = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+    
+    if conclusion and len(conclusion) > 50:
+        emit_audit_log(
+            action="ai.conclusion",
+            status="success",
+            message="AI conclusion generated.",
+            details={"model": settings.OPENROUTER_MODEL},
+        )
+        return conclusion
+    raise Exception("Empty or invalid response from AI")
+
+
+def _conclusion_failed(
+    error: Exception,
+    risk_score: float,
+    risk_level: str,
+    pattern_type: str,
+    detected_patterns: List[str],
+    fallback_to_template: bool
+) -> str:
+    """
+    Log a failed AI conclusion and return the template one (or re-raise)
+    """
+    emit_audit_log(
+        action="ai.conclusion",
+        status="error",
+        message="AI generation failed.",
+        details={"error": str(error)},
+    )
+    
+    if fallback_to_template:
+        emit_audit_log(
+            action="ai.conclusion",
+            status="warning",
+            message="Falling back to template-based conclusion.",
+        )
+        return _generate_template_conclusion(
+            risk_score, risk_level, pattern_type, detected_patterns
+        )
+    raise error
+
+
+def generate_ai_conclusion(
+    wallet: str,
+    risk_score: float,
+    risk_level: str,
+    pattern_type: str,
+    detected_patterns: List[str],
+    summary: Dict,
+    user_description: str,
+    fallback_to_template: bool = True
+) -> str:
+    """
+    Generate AI-powered conclusion using OpenRouter API (Qwen 2.5)
+    
+    Blocking; for scripts outside the event loop. Request handlers use
+    generate_ai_conclusion_async.
+    
+    Args:
+        wallet: Wallet address
+        risk_score: Risk score (0.0-1.0)
+        risk_level: Risk level (VERY HIGH, HIGH, etc.)
+        pattern_type: Detected pattern type
+        detected_patterns: List of detected patterns
+        summary: Transaction summary dict
+        user_description: User's description of the incident
+        fallback_to_template: If True, fallback to template if AI fails
+    
+    Returns:
+        AI-generated conclusion text
+    """
+    try:
         # Use OpenRouter API if API key is provided
         if settings.OPENROUTER_API_KEY:
+            headers, body = _build_conclusion_request(
+                wallet, risk_score, risk_level, pattern_type,
+                detected_patterns, summary, user_description
+            )
+            key = _conclusion_cache_key(body)
+            cached = get_llm_cache().get(key)
+            if cached is not None:
+                return cached
             try:
-                response = requests.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                        "Content-Type": "application/json",
-                        "HTTP-Referer": "https://cybercrime-investigation.local",  # Optional
-                        "X-Title": "Cybercrime Investigation Dashboard"  # Optional
-                    },
-                    json={
-                        "model": settings.OPENROUTER_MODEL,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "You are a professional cybercrime investigation analyst. Provide concise, factual analysis suitable for law enforcement reports."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "temperature": 0.3,
-                        "max_tokens": 200
-                    },
-                    timeout=30
-                )
-                
+                response = get_sync_http_client().post(OPENROUTER_CHAT_URL, headers=headers, json=body, timeout=30)
                 response.raise_for_status()
-                result = response.json()
-                
-                # Extract conclusion from OpenRouter response
-                conclusion = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-                
-                if conclusion and len(conclusion) > 50:
-                    emit_audit_log(
-                        action="ai.conclusion",
-                        status="success",
-                        message="AI conclusion generated.",
-                        details={"model": settings.OPENROUTER_MODEL},
-                    )
-                    return conclusion
-                else:
-                    raise Exception("Empty or invalid response from AI")
-                    
+                conclusion = _parse_conclusion(response.json())
+                get_llm_cache().set(key, conclusion)
+                return conclusion
             except Exception as e:
                 emit_audit_log(
                     action="ai.conclusion",
@@ -124,24 +191,65 @@ Keep it concise, factual, and professional. Do not use markdown formatting."""
         raise Exception("No OpenRouter API key configured")
         
     except Exception as e:
-        emit_audit_log(
-            action="ai.conclusion",
-            status="error",
-            message="AI generation failed.",
-            details={"error": str(e)},
+        return _conclusion_failed(
+            e, risk_score, risk_level, pattern_type, detected_patterns, fallback_to_template
         )
-        
-        if fallback_to_template:
-            emit_audit_log(
-                action="ai.conclusion",
-                status="warning",
-                message="Falling back to template-based conclusion.",
-            )
-            return _generate_template_conclusion(
-                risk_score, risk_level, pattern_type, detected_patterns
+
+
+async def generate_ai_conclusion_async(
+    wallet: str,
+    risk_score: float,
+    risk_level: str,
+    pattern_type: str,
+    detected_patterns: List[str],
+    summary: Dict,
+    user_description: str,
+    fallback_to_template: bool = True,
+    timeout: float = 30.0
+) -> str:
+    """
+    Async generate_ai_conclusion for the request path (shared keep-alive client)
+    
+    Args:
+        timeout: Seconds allowed for the OpenRouter call
+        (other arguments as generate_ai_conclusion)
+    
+    Returns:
+        AI-generated conclusion text
+    """
+    try:
+        if settings.OPENROUTER_API_KEY:
+            headers, body = _build_conclusion_request(
+                wallet, risk_score, risk_level, pattern_type,
+                detected_patterns, summary, user_description
             )
-        else:
-            raise
+            key = _conclusion_cache_key(body)
+            cached = await get_llm_cache().aget(key)
+            if cached is not None:
+                return cached
+            try:
+                response = await get_http_client(OPENROUTER_CHAT_URL).post(
+                    OPENROUTER_CHAT_URL, headers=headers, json=body, timeout=timeout
+                )
+                response.raise_for_status()
+                conclusion = _parse_conclusion(response.json())
+                await get_llm_cache().aset(key, conclusion)
+                return conclusion
+            except Exception as e:
+                emit_audit_log(
+                    action="ai.conclusion",
+                    status="warning",
+                    message="OpenRouter API failed.",
+                    details={"error": str(e)},
+                )
+                raise
+        
+        raise Exception("No OpenRouter API key configured")
+        
+    except Exception as e:
+        return _conclusion_failed(
+            e, risk_score, risk_level, pattern_type, detected_patterns, fallback_to_template
+        )
 
 
 def _generate_template_conclusion(
@@ -172,7 +280,7 @@ def _generate_template_conclusion(
     return f"{base_conclusion} {severity}"
 
 
-def check_ai_available() -> bool:
+async def check_ai_available() -> bool:
     """
     Check if OpenRouter API is available
     
@@ -181,8 +289,8 @@ def check_ai_available() -> bool:
     """
     try:
         if settings.OPENROUTER_API_KEY:
-            response = requests.get(
-                "https://openrouter.ai/api/v1/models",
+            response = await get_http_client(OPENROUTER_MODELS_URL).get(
+                OPENROUTER_MODELS_URL,
                 headers={"Authorization": f"Bearer {settings.OPENROUTER_API_KEY}"},
                 timeout=5
             )
@@ -109,15 +109,63 @@ class Settings(BaseSettings):
     TTS_DEVICE: str = "cpu"  # or "cuda"
     TTS_OUTPUT_DIR: str = "./tts_output"
     
+    # Fraud prediction store: score transactions above the watermark in the background at startup
+    PREDICTION_STORE_REFRESH_ON_STARTUP: bool = True
+    
+    # Transaction graph index (in-memory CSR over fraud_transactions)
+    TRANSACTION_GRAPH_LOAD_ON_STARTUP: bool = True
+    TRANSACTION_GRAPH_REFRESH_SECONDS: float = 5.0  # Min interval between watermark checks on query
+    TRANSACTION_GRAPH_MAX_EDGES: int = 5000  # Upper bound on transactions returned by a network query
+    TRANSACTION_GRAPH_SNAPSHOT_DIR: Optional[str] = "./graph_snapshot"  # Memory-mapped .npy snapshots; empty disables
+    TRANSACTION_GRAPH_SNAPSHOT_MIN_DELTA: int = 100000  # Rows loaded past the snapshot before a new one is written
+    CYCLE_SEARCH_BUDGET_SECONDS: float = 0.5  # Per /cycles query; partial results are marked incomplete
+    TRACE_SEARCH_BUDGET_SECONDS: float = 0.5  # Path search per /trace query; same
+    CLUSTER_REFINE_INTERVAL_SECONDS: float = 3600.0  # Min interval between Louvain passes (started by /cluster queries)
+    CLUSTER_REFINE_BUDGET_SECONDS: float = 120.0  # A pass past this keeps the communities found so far
+    
+    # Inference executor (model scoring off the event loop)
+    INFERENCE_PROCESS_WORKERS: int = 2  # 0 = score on the thread pool instead
+    INFERENCE_THREAD_WORKERS: int = 4
+    INFERENCE_MAX_QUEUE_DEPTH: int = 64  # Calls in flight per pool before returning 503
+    INFERENCE_START_METHOD: str = "spawn"
+    
     # AI (OpenRouter)
     OPENROUTER_API_KEY: Optional[str] = None
     OPENROUTER_MODEL: str = "qwen/qwen-2.5-72b-instruct"  # Free model
 
+    # LLM response cache (keyed by model, normalized prompt and sampling parameters)
+    LLM_CACHE_MAX_ENTRIES: int = 2048  # In memory (LRU) and on disk
+    LLM_CACHE_TTL_SECONDS: float = 3600.0  # 0 disables the cache
+    LLM_CACHE_PATH: Optional[str] = "./llm_cache.db"  # SQLite file shared across restarts/workers; empty = memory only
+
+    # Outbound HTTP (shared keep-alive clients for OpenRouter, orchestrator and BHIV calls)
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0  # Idle connections closed after this
+    HTTP2_ENABLED: bool = True  # Used when the h2 package is installed
+
     # External AI Orchestrator (e.g. Primary_Bucket_Owner)
     # If configured, certain AI flows can delegate to this orchestrator service.
     AI_ORCHESTRATOR_INCIDENT_URL: Optional[str] = None  # Full URL for incident-analysis basket endpoint
     AI_ORCHESTRATOR_API_KEY: Optional[str] = None       # Optional auth key/token for the orchestrator
-    
+
+    # Incident analysis pipeline (/incidents/analyze)
+    INCIDENT_ANALYSIS_DEADLINE_SECONDS: float = 10.0  # Overall budget; template conclusion once it runs out
+    INCIDENT_UPSTREAM_CONCURRENCY: int = 8             # Analyses calling orchestrator/LLM at once per worker
+
+    # Watchlist sweeps (/watchlist/batch-analyze and the background monitor)
+    WATCHLIST_SWEEP_CONCURRENCY: int = 8  # Wallets analyzed at once
+    WATCHLIST_SWEEP_WALLET_DEADLINE_SECONDS: float = 10.0  # Per wallet; cut off at twice this
+    WATCHLIST_MONITOR_INTERVAL_SECONDS: float = 300.0  # Re-analyze wallets with new transactions; 0 disables
+    WATCHLIST_BLOOM_MIN_ENTRIES: int = 1000000  # Hit detection index switches from a set to a Bloom filter
+    WATCHLIST_BLOOM_ERROR_RATE: float = 0.01  # Bloom false positives (confirmed with a DB lookup)
+
+    # Background job queue (background_jobs table; /incidents/analyze?mode=async)
+    JOB_WORKERS: int = 2  # Async workers per process; 0 = enqueue only
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0  # Idle poll and lease heartbeat interval
+    JOB_LEASE_SECONDS: float = 300.0  # A running job whose worker stops heartbeating is retried after this
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 5.0  # Doubles per attempt
+
     # Email Configuration (SMTP - Brevo)
     MAIL_SERVER: str = "smtp-relay.brevo.com"
     MAIL_PORT: int = 587
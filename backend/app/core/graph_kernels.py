@@ -0,0 +1,534 @@
+"""
+NumPy kernels for the transaction graph.
+
+Adjacency is kept in CSR form: for a key array (source or destination node
+of every edge), `order` lists edge ids grouped by node and `indptr[n]` ..
+`indptr[n + 1]` is node n's slice of it. All kernels work on whole
+frontiers at once so a hop costs a handful of vectorized calls no matter
+how many nodes it touches.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+def build_csr(keys: np.ndarray, n_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group edge ids by node.
+
+    Args:
+        keys: Node of every edge (int array, one entry per edge id)
+        n_nodes: Number of nodes (ids are 0 .. n_nodes - 1)
+
+    Returns:
+        (indptr, order): indptr has n_nodes + 1 entries, order holds edge ids
+    """
+    order = np.argsort(keys, kind="stable").astype(np.int64)
+    counts = np.bincount(keys, minlength=n_nodes)
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, order
+
+
+def expand_ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenate arange(start, end) for every pair, without a Python loop."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    # Each position is its range's start plus its offset within the range
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets
+
+
+def gather(indptr: np.ndarray, order: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """Edge ids of every node in `nodes` (nodes beyond the CSR contribute nothing)."""
+    nodes = nodes[nodes < len(indptr) - 1]
+    return order[expand_ranges(indptr[nodes], indptr[nodes + 1])]
+
+
+def degrees(indptr: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """Edge count per node in `nodes`."""
+    inside = nodes < len(indptr) - 1
+    result = np.zeros(len(nodes), dtype=np.int64)
+    result[inside] = indptr[nodes[inside] + 1] - indptr[nodes[inside]]
+    return result
+
+
+# Adjacency accessor: frontier nodes -> (edge ids, node at the far end of each edge)
+EdgeFn = Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def distances_to(
+    target: int,
+    in_edges: EdgeFn,
+    n_nodes: int,
+    max_depth: int,
+    max_frontier: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Hops from every node to `target` along edge direction (backward BFS).
+
+    Nodes further than max_depth (or unreachable) get max_depth + 1. Once a
+    frontier grows past max_frontier (hub accounts) the BFS stops and every
+    node not reached yet gets the next depth: a lower bound, so pruning on
+    it never drops a real path.
+    """
+    dist = np.full(n_nodes, max_depth + 1, dtype=np.int32)
+    dist[target] = 0
+    frontier = np.array([target], dtype=np.int64)
+    for depth in range(1, max_depth + 1):
+        if max_frontier is not None and len(frontier) > max_frontier:
+            np.minimum(dist, depth, out=dist)
+            break
+        _, previous = in_edges(frontier)
+        previous = np.unique(previous)
+        frontier = previous[dist[previous] > depth]
+        if not len(frontier):
+            break
+        dist[frontier] = depth
+    return dist
+
+
+class CycleSearch(NamedTuple):
+    cycles: List[Tuple[int, ...]]  # Edge ids in path order
+    complete: bool  # False if a limit cut the search short
+    expansions: int  # Paths expanded
+
+
+def find_cycles(
+    start: int,
+    out_edges: EdgeFn,
+    in_edges: EdgeFn,
+    n_nodes: int,
+    amounts: np.ndarray,
+    times: np.ndarray,
+    max_hops: int = 6,
+    min_hops: int = 2,
+    max_time_gap: Optional[float] = None,
+    amount_tolerance: Optional[float] = None,
+    max_cycles: int = 50,
+    max_expansions: Optional[int] = None,
+    deadline: Optional[float] = None,
+    max_frontier: Optional[int] = 20000,
+    prune_unreachable: bool = True,
+) -> CycleSearch:
+    """
+    Simple cycles through `start`, as tuples of edge ids in path order.
+
+    A cycle is time-respecting (each edge no earlier than the one before),
+    spans at most max_time_gap from its first to its last edge, and keeps
+    each hop's amount within amount_tolerance (a fraction) of the previous
+    hop's. The DFS only follows edges into nodes that can still get back to
+    `start` in the hops left, and filters a node's edges vectorized, so hub
+    accounts cost one masked gather rather than a loop over their edges.
+
+    Args:
+        max_expansions: Stop after expanding this many paths
+        deadline: time.monotonic() value at which to stop
+        max_frontier: Frontier size at which the reachability BFS gives up
+            exact distances (see distances_to)
+        prune_unreachable: Run the backward BFS used for pruning; worth it
+            for one search on a large graph, not for many short ones
+    """
+    if prune_unreachable:
+        dist = distances_to(start, in_edges, n_nodes, max_hops - 1, max_frontier)
+    else:
+        dist = np.zeros(n_nodes, dtype=np.int32)
+    cycles: List[Tuple[int, ...]] = []
+    stack: List[Tuple[int, Tuple[int, ...], Tuple[int, ...]]] = [(start, (), (start,))]
+    expansions = 0
+    while stack:
+        if (max_expansions is not None and expansions >= max_expansions) or (
+            deadline is not None and time.monotonic() >= deadline
+        ):
+            return CycleSearch(cycles, False, expansions)
+        node, path, path_nodes = stack.pop()
+        expansions += 1
+        depth = len(path)
+
+        edges, following = out_edges(np.array([node], dtype=np.int64))
+        edge_times = times[edges]
+        mask = ~np.isnan(edge_times)
+        if path:
+            last = path[-1]
+            mask &= edge_times >= times[last]
+            if max_time_gap is not None:
+                mask &= edge_times - times[path[0]] <= max_time_gap
+            if amount_tolerance is not None:
+                mask &= np.abs(amounts[edges] - amounts[last]) <= amount_tolerance * amounts[last]
+        mask &= dist[following] <= max_hops - depth - 1
+        edges, following = edges[mask], following[mask]
+        if not len(edges):
+            continue
+
+        closing = following == start
+        if depth + 1 >= min_hops:
+            for edge in edges[closing].tolist():
+                cycles.append(path + (edge,))
+                if len(cycles) >= max_cycles:
+                    return CycleSearch(cycles, False, expansions)
+        if depth + 1 < max_hops:
+            extend = ~closing & ~np.isin(following, path_nodes)
+            for edge, nxt in zip(edges[extend].tolist(), following[extend].tolist()):
+                stack.append((nxt, path + (edge,), path_nodes + (nxt,)))
+    return CycleSearch(cycles, True, expansions)
+
+
+class TraceLabels(NamedTuple):
+    forward_hops: np.ndarray  # Fewest hops from the source (max_hops + 1 if not reached)
+    earliest: np.ndarray  # Earliest time funds from the source can be at the node
+    forward_depth: int  # Hops the forward search went
+    backward_hops: np.ndarray  # Fewest hops to the target
+    latest: np.ndarray  # Latest time funds can leave the node and still reach the target
+    backward_depth: int
+    met: bool  # Some node is reached from both sides in time order within max_hops
+
+
+def _relax(
+    frontier: np.ndarray,
+    expand: EdgeFn,
+    near: np.ndarray,
+    times: np.ndarray,
+    hops: np.ndarray,
+    labels: np.ndarray,
+    depth: int,
+    forward: bool,
+) -> np.ndarray:
+    """One round of a time-respecting BFS; returns the nodes whose label improved."""
+    edges, far = expand(frontier)
+    edge_times = times[edges]
+    if forward:
+        usable = edge_times >= labels[near[edges]]
+    else:
+        usable = edge_times <= labels[near[edges]]
+    far, edge_times = far[usable], edge_times[usable]
+    if not len(far):
+        return far
+    # Best time per far node: first after sorting by time (descending when going backward)
+    order = np.argsort(edge_times if forward else -edge_times, kind="stable")
+    nodes, first = np.unique(far[order], return_index=True)
+    best = edge_times[order][first]
+    improved = best < labels[nodes] if forward else best > labels[nodes]
+    nodes, best = nodes[improved], best[improved]
+    labels[nodes] = best
+    hops[nodes] = np.minimum(hops[nodes], depth)
+    return nodes
+
+
+def trace_labels(
+    source: int,
+    target: int,
+    out_edges: EdgeFn,
+    in_edges: EdgeFn,
+    src: np.ndarray,
+    dst: np.ndarray,
+    times: np.ndarray,
+    n_nodes: int,
+    max_hops: int,
+) -> TraceLabels:
+    """
+    Bidirectional time-respecting BFS between two nodes.
+
+    The forward side tracks the earliest time funds from `source` can sit at
+    each node, the backward side the latest time funds can leave a node and
+    still reach `target`; a node's label is re-expanded whenever it improves,
+    so after d rounds it is exact for paths of at most d hops. Each round
+    grows the side with the smaller frontier, until the two depths add up to
+    max_hops or a side runs out of nodes.
+    """
+    unreached = max_hops + 1
+    forward_hops = np.full(n_nodes, unreached, dtype=np.int32)
+    backward_hops = np.full(n_nodes, unreached, dtype=np.int32)
+    earliest = np.full(n_nodes, np.inf)
+    latest = np.full(n_nodes, -np.inf)
+    forward_hops[source] = 0
+    backward_hops[target] = 0
+    earliest[source] = -np.inf
+    latest[target] = np.inf
+    forward_frontier = np.array([source], dtype=np.int64)
+    backward_frontier = np.array([target], dtype=np.int64)
+    forward_depth = backward_depth = 0
+
+    while forward_depth + backward_depth < max_hops and (len(forward_frontier) or len(backward_frontier)):
+        grow_forward = len(forward_frontier) and (
+            not len(backward_frontier) or len(forward_frontier) <= len(backward_frontier)
+        )
+        if grow_forward:
+            forward_depth += 1
+            forward_frontier = _relax(forward_frontier, out_edges, src, times, forward_hops, earliest, forward_depth, True)
+        else:
+            backward_depth += 1
+            backward_frontier = _relax(backward_frontier, in_edges, dst, times, backward_hops, latest, backward_depth, False)
+
+    met = bool(np.any((forward_hops + backward_hops <= max_hops) & (earliest <= latest)))
+    return TraceLabels(forward_hops, earliest, forward_depth, backward_hops, latest, backward_depth, met)
+
+
+class PathSearch(NamedTuple):
+    paths: List[Tuple[int, ...]]  # Edge ids in path order
+    complete: bool
+    expansions: int
+
+
+def find_paths(
+    source: int,
+    target: int,
+    out_edges: EdgeFn,
+    labels: TraceLabels,
+    times: np.ndarray,
+    max_hops: int,
+    max_time_gap: Optional[float] = None,
+    max_paths: int = 200,
+    max_expansions: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> PathSearch:
+    """
+    Simple time-respecting paths from `source` to `target`.
+
+    Uses the labels of trace_labels to prune: a path of at most max_hops
+    has every node either within the forward search depth of the source or
+    within the backward labels' reach of the target. Where the backward
+    labels cover the hops left, an edge is only followed into a node that
+    can still reach the target in time; closer to the source, being within
+    the forward search is enough.
+    """
+    paths: List[Tuple[int, ...]] = []
+    if not labels.met:
+        return PathSearch(paths, True, 0)
+    stack: List[Tuple[int, Tuple[int, ...], Tuple[int, ...]]] = [(source, (), (source,))]
+    expansions = 0
+    while stack:
+        if (max_expansions is not None and expansions >= max_expansions) or (
+            deadline is not None and time.monotonic() >= deadline
+        ):
+            return PathSearch(paths, False, expansions)
+        node, path, path_nodes = stack.pop()
+        expansions += 1
+        depth = len(path) + 1  # Hops after taking the next edge
+
+        edges, following = out_edges(np.array([node], dtype=np.int64))
+        edge_times = times[edges]
+        mask = np.ones(len(edges), dtype=bool)
+        if path:
+            mask &= edge_times >= times[path[-1]]
+            if max_time_gap is not None:
+                mask &= edge_times - times[path[0]] <= max_time_gap
+        behind = (labels.backward_hops[following] <= max_hops - depth) & (edge_times <= labels.latest[following])
+        if max_hops - depth > labels.backward_depth:
+            # Too far from the target for the backward labels to rule the node out
+            behind |= (labels.forward_hops[following] <= depth) & (depth <= labels.forward_depth)
+        mask &= behind
+        edges, following = edges[mask], following[mask]
+        if not len(edges):
+            continue
+
+        arriving = following == target
+        for edge in edges[arriving].tolist():
+            paths.append(path + (edge,))
+            if len(paths) >= max_paths:
+                return PathSearch(paths, False, expansions)
+        if depth < max_hops:
+            extend = ~arriving & ~np.isin(following, path_nodes)
+            for edge, nxt in zip(edges[extend].tolist(), following[extend].tolist()):
+                stack.append((nxt, path + (edge,), path_nodes + (nxt,)))
+    return PathSearch(paths, True, expansions)
+
+
+def max_flow(source: int, sink: int, tails: np.ndarray, heads: np.ndarray, capacities: np.ndarray) -> float:
+    """
+    Maximum flow from source to sink (Edmonds-Karp).
+
+    Parallel edges are merged by summing their capacities. Meant for small
+    subgraphs such as the union of traced paths.
+    """
+    residual: Dict[int, Dict[int, float]] = {}
+    for tail, head, capacity in zip(tails.tolist(), heads.tolist(), capacities.tolist()):
+        if tail == head:
+            continue
+        residual.setdefault(tail, {})
+        residual.setdefault(head, {})
+        residual[tail][head] = residual[tail].get(head, 0.0) + capacity
+        residual[head].setdefault(tail, 0.0)
+    if source not in residual or sink not in residual:
+        return 0.0
+
+    total = 0.0
+    while True:
+        parent = {source: None}
+        queue = [source]
+        for node in queue:
+            if sink in parent:
+                break
+            for nxt, capacity in residual[node].items():
+                if capacity > 0 and nxt not in parent:
+                    parent[nxt] = node
+                    queue.append(nxt)
+        if sink not in parent:
+            return total
+        bottleneck = np.inf
+        node = sink
+        while parent[node] is not None:
+            bottleneck = min(bottleneck, residual[parent[node]][node])
+            node = parent[node]
+        node = sink
+        while parent[node] is not None:
+            residual[parent[node]][node] -= bottleneck
+            residual[node][parent[node]] += bottleneck
+            node = parent[node]
+        total += bottleneck
+
+
+def merge_components(labels: np.ndarray, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Component labels after adding edges, by vectorized min-label hooking.
+
+    `labels` maps every node to a representative with labels[rep] == rep
+    (np.arange for a graph without edges). Each round hooks both ends of
+    every edge onto the smaller representative and then pointer-jumps until
+    every node points at a root, so the result again maps each node to the
+    smallest node id of its component.
+    """
+    labels = labels.copy()
+    a, b = labels[src], labels[dst]
+    while True:
+        smaller = np.minimum(labels[a], labels[b])
+        np.minimum.at(labels, a, smaller)
+        np.minimum.at(labels, b, smaller)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels[a], labels[b]):
+            return labels
+
+
+def _symmetric_adjacency(
+    src: np.ndarray, dst: np.ndarray, weights: np.ndarray, n_nodes: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Undirected CSR (indptr, neighbours, weights) with parallel edges merged."""
+    keys = np.concatenate([src * n_nodes + dst, dst * n_nodes + src])
+    keys, inverse = np.unique(keys, return_inverse=True)
+    merged = np.bincount(inverse, weights=np.concatenate([weights, weights]))
+    rows = keys // n_nodes
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+    return indptr, keys % n_nodes, merged
+
+
+def _local_moving(
+    indptr: np.ndarray,
+    neighbours: np.ndarray,
+    weights: np.ndarray,
+    resolution: float,
+    max_sweeps: int,
+    deadline: Optional[float],
+) -> np.ndarray:
+    """Louvain phase one: move nodes to the neighbouring community with the best modularity gain."""
+    n_nodes = len(indptr) - 1
+    strength = np.bincount(np.repeat(np.arange(n_nodes), np.diff(indptr)), weights=weights, minlength=n_nodes)
+    total = float(strength.sum())
+    if total == 0:
+        return np.arange(n_nodes)
+    # Plain lists: this loop is per node, where list indexing beats NumPy scalars
+    starts, cols, ws = indptr.tolist(), neighbours.tolist(), weights.tolist()
+    k = strength.tolist()
+    community = list(range(n_nodes))
+    community_total = list(k)
+    scale = resolution / total
+    for _ in range(max_sweeps):
+        moved = 0
+        for node in range(n_nodes):
+            links: Dict[int, float] = {}
+            for p in range(starts[node], starts[node + 1]):
+                other = cols[p]
+                if other != node:
+                    c = community[other]
+                    links[c] = links.get(c, 0.0) + ws[p]
+            current = community[node]
+            k_node = k[node]
+            community_total[current] -= k_node
+            best = current
+            best_gain = links.get(current, 0.0) - community_total[current] * k_node * scale
+            for c, w in links.items():
+                gain = w - community_total[c] * k_node * scale
+                if gain > best_gain + 1e-12:
+                    best, best_gain = c, gain
+            community_total[best] += k_node
+            if best != current:
+                community[node] = best
+                moved += 1
+        if not moved or (deadline is not None and time.monotonic() >= deadline):
+            break
+    return np.asarray(community, dtype=np.int64)
+
+
+def louvain(
+    src: np.ndarray,
+    dst: np.ndarray,
+    n_nodes: int,
+    weights: Optional[np.ndarray] = None,
+    resolution: float = 1.0,
+    max_levels: int = 10,
+    max_sweeps: int = 10,
+    deadline: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Community of every node by Louvain modularity optimisation.
+
+    The graph is taken as undirected, parallel edges adding up their weight
+    (one per edge by default). Accounts with a single counterparty, which
+    is most of a payments graph, are set aside before the per-node passes
+    and join their counterparty's community afterwards, where the passes
+    would almost always have put them.
+    Each level moves nodes between communities and then collapses every
+    community into one node, until a level changes nothing. Past `deadline`
+    the current partition is returned.
+
+    Returns:
+        int64 community ids 0 .. k - 1, one per node
+    """
+    if weights is None:
+        weights = np.ones(len(src), dtype=np.float64)
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+
+    indptr, neighbours, merged = _symmetric_adjacency(src, dst, weights, n_nodes)
+    rows = np.repeat(np.arange(n_nodes), np.diff(indptr))
+    distinct = np.bincount(rows[neighbours != rows], minlength=n_nodes)
+    leaf = distinct == 1
+    anchor = np.full(n_nodes, -1, dtype=np.int64)
+    anchor[rows[leaf[rows] & (neighbours != rows)]] = neighbours[leaf[rows] & (neighbours != rows)]
+    # A pair of leaves is a component of its own; keep the smaller id of the two in the graph
+    paired = leaf & leaf[np.maximum(anchor, 0)] & (anchor > np.arange(n_nodes))
+    leaf &= ~paired
+
+    core = np.flatnonzero(~leaf)
+    core_index = np.full(n_nodes, -1, dtype=np.int64)
+    core_index[core] = np.arange(len(core))
+    keep = ~leaf[src] & ~leaf[dst]
+    level_src, level_dst, level_weights = core_index[src[keep]], core_index[dst[keep]], weights[keep]
+    assignment = np.arange(len(core))
+    size = len(core)
+
+    for _ in range(max_levels):
+        level_indptr, level_neighbours, level_merged = _symmetric_adjacency(level_src, level_dst, level_weights, size)
+        community = _local_moving(level_indptr, level_neighbours, level_merged, resolution, max_sweeps, deadline)
+        _, community = np.unique(community, return_inverse=True)
+        assignment = community[assignment]
+        n_communities = int(community.max()) + 1 if size else 0
+        if n_communities == size or (deadline is not None and time.monotonic() >= deadline):
+            break
+        level_src, level_dst, size = community[level_src], community[level_dst], n_communities
+
+    result = np.empty(n_nodes, dtype=np.int64)
+    result[core] = assignment
+    result[leaf] = result[anchor[leaf]]
+    return result
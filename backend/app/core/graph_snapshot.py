@@ -0,0 +1,217 @@
+"""
+On-disk snapshots of the transaction graph index.
+
+A snapshot is a directory of .npy files (edge columns, CSR adjacency and
+the account names) plus a manifest, named after the format version and the
+watermark it covers. Workers np.load them memory-mapped, so every worker
+on a host shares the same pages through the OS cache and starts without
+reading fraud_transactions; rows above the snapshot's watermark (the delta)
+are then loaded from SQL as usual.
+
+Account names are stored twice: in id order for id -> name, and sorted
+with their ids for name -> id by binary search, so no per-worker dict of
+every account has to be built.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_KEEP = 2  # Versions kept on disk (workers may still have the previous one mapped)
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+EDGE_COLUMNS = ("tx_id", "src", "dst", "amount", "step", "is_fraud", "tx_type")
+CSR_ARRAYS = ("out_indptr", "out_order", "in_indptr", "in_order")
+ACCOUNT_ARRAYS = ("account_names", "account_sorted", "account_sorted_ids")
+
+
+class AccountIndex:
+    """
+    Account name <-> node id.
+
+    Ids below base_size come from a snapshot's name arrays (possibly
+    memory-mapped); accounts added later live in a dict and a list.
+    """
+
+    def __init__(
+        self,
+        names: Optional[np.ndarray] = None,
+        sorted_names: Optional[np.ndarray] = None,
+        sorted_ids: Optional[np.ndarray] = None,
+    ) -> None:
+        self._names = names
+        self._sorted = sorted_names
+        self._sorted_ids = sorted_ids
+        self.base_size = len(names) if names is not None else 0
+        self._added: List[str] = []
+        self._added_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.base_size + len(self._added)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < self.base_size:
+            return self._names[index].decode("utf-8")
+        return self._added[index - self.base_size]
+
+    def get(self, name: str) -> Optional[int]:
+        node = self._added_ids.get(name)
+        if node is not None or not self.base_size:
+            return node
+        key = name.encode("utf-8")
+        position = int(np.searchsorted(self._sorted, key))
+        if position < self.base_size and self._sorted[position] == key:
+            return int(self._sorted_ids[position])
+        return None
+
+    def intern(self, names: Iterable[str]) -> np.ndarray:
+        """Node id of every name, adding unknown names."""
+        result = []
+        for name in names:
+            node = self.get(name)
+            if node is None:
+                node = self._added_ids[name] = len(self)
+                self._added.append(name)
+            result.append(node)
+        return np.array(result, dtype=np.int64)
+
+    def arrays(self, size: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(names by id, sorted names, their ids) for the first `size` accounts (all by default)."""
+        size = len(self) if size is None else size
+        if size == self.base_size and self._names is not None:
+            return self._names, self._sorted, self._sorted_ids
+        added = self._added[:size - self.base_size]
+        encoded = np.array([name.encode("utf-8") for name in added], dtype=bytes) if added else np.empty(0, dtype="S1")
+        names = encoded if self._names is None else np.concatenate([np.asarray(self._names), encoded])
+        order = np.argsort(names, kind="stable")
+        return names, names[order], order.astype(np.int64)
+
+
+def _current_version(directory: Path) -> Optional[str]:
+    try:
+        return (directory / CURRENT_FILE).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def read_snapshot(directory) -> Optional[Tuple[Dict, Dict[str, np.ndarray], AccountIndex]]:
+    """
+    Map the current snapshot in `directory`.
+
+    Edge columns are mapped copy-on-write: they carry spare capacity past
+    n_edges, so the delta appended after loading only dirties its own
+    pages. Everything else is mapped read-only.
+
+    Returns:
+        (manifest, arrays, accounts), or None if there is no readable snapshot
+    """
+    directory = Path(directory)
+    version = _current_version(directory)
+    if version is None:
+        return None
+    path = directory / version
+    try:
+        manifest = json.loads((path / MANIFEST_FILE).read_text())
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            return None
+        arrays = {
+            name: np.load(path / f"{name}.npy", mmap_mode="c" if name in EDGE_COLUMNS else "r")
+            for name in EDGE_COLUMNS + CSR_ARRAYS + ACCOUNT_ARRAYS
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+    accounts = AccountIndex(arrays.pop("account_names"), arrays.pop("account_sorted"), arrays.pop("account_sorted_ids"))
+    return manifest, arrays, accounts
+
+
+def write_snapshot(
+    directory,
+    arrays: Dict[str, np.ndarray],
+    account_arrays: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    types: List[str],
+    n_edges: int,
+    watermark: int,
+    headroom: int = 0,
+) -> str:
+    """
+    Write a snapshot and make it current.
+
+    The files go to a temporary directory renamed into place, then the
+    CURRENT pointer is replaced, so readers only ever see complete
+    snapshots; if another process already wrote this version it is reused.
+
+    Args:
+        arrays: EDGE_COLUMNS (at least n_edges long) and CSR_ARRAYS
+        account_arrays: AccountIndex.arrays()
+        headroom: Spare edge capacity to write past n_edges
+
+    Returns:
+        Version name
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    version = f"v{SNAPSHOT_FORMAT}-{watermark}"
+    target = directory / version
+    if not (target / MANIFEST_FILE).exists():
+        staging = directory / f".tmp-{version}-{os.getpid()}-{threading.get_ident()}"
+        staging.mkdir()
+        try:
+            for name in EDGE_COLUMNS:
+                column = np.zeros(n_edges + headroom, dtype=arrays[name].dtype)
+                column[:n_edges] = arrays[name][:n_edges]
+                np.save(staging / f"{name}.npy", column)
+            for name in CSR_ARRAYS:
+                np.save(staging / f"{name}.npy", arrays[name])
+            for name, array in zip(ACCOUNT_ARRAYS, account_arrays):
+                np.save(staging / f"{name}.npy", array)
+            (staging / MANIFEST_FILE).write_text(json.dumps({
+                "format": SNAPSHOT_FORMAT,
+                "watermark": watermark,
+                "n_edges": n_edges,
+                "n_nodes": len(account_arrays[0]),
+                "types": list(types),
+                "created_at": datetime.utcnow().isoformat(),
+            }))
+            os.replace(staging, target)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not (target / MANIFEST_FILE).exists():
+                raise
+
+    pointer = directory / f".{CURRENT_FILE}-{os.getpid()}-{threading.get_ident()}"
+    pointer.write_text(version)
+    os.replace(pointer, directory / CURRENT_FILE)
+    _prune(directory, keep=version)
+    return version
+
+
+def _watermark(version: str) -> int:
+    try:
+        return int(version.rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return -1
+
+
+def _prune(directory: Path, keep: str) -> None:
+    """Remove all but the newest SNAPSHOT_KEEP versions (mapped files stay valid until unmapped)."""
+    versions = []
+    for entry in directory.iterdir():
+        name = entry.name
+        if entry.is_dir() and name.startswith(f"v{SNAPSHOT_FORMAT}-"):
+            versions.append((_watermark(name), name))
+    versions.sort(reverse=True)
+    for _, name in versions[SNAPSHOT_KEEP:]:
+        if name != keep:
+            shutil.rmtree(directory / name, ignore_errors=True)
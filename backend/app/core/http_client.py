@@ -0,0 +1,110 @@
+"""
+Shared HTTP clients for outbound calls (OpenRouter, AI orchestrator, BHIV).
+
+One httpx.AsyncClient per upstream origin, kept for the life of the
+process, so calls reuse keep-alive (and, with the h2 package installed,
+HTTP/2) connections instead of paying for TCP and TLS setup every time.
+Each origin's client has its own connection limit, so a slow upstream
+cannot take the connections another one needs.
+
+Async clients belong to the event loop that created them; clients are
+kept per loop and those of the serving loop are closed from the app
+lifespan. Sync callers (offline scripts) share one pooled httpx.Client.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+DEFAULT_TIMEOUT_SECONDS = 30.0  # Callers normally pass their own per-request timeout
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_async_clients: Dict[Tuple[int, str], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+_sync_client: Optional[httpx.Client] = None
+_clients_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """
+    Shared async client for the origin of `url` on the running event loop.
+
+    Pass a per-request timeout (client.post(..., timeout=...)) where the
+    default does not fit.
+    """
+    loop = asyncio.get_running_loop()
+    key = (id(loop), _origin(url))
+    entry = _async_clients.get(key)
+    if entry is not None and entry[0] is loop and not entry[1].is_closed:
+        return entry[1]
+    with _clients_lock:
+        # Forget clients of loops that have gone away (their ids can be reused)
+        for stale in [k for k, (owner, _) in _async_clients.items() if owner.is_closed()]:
+            del _async_clients[stale]
+        entry = _async_clients.get(key)
+        if entry is None or entry[0] is not loop or entry[1].is_closed:
+            client = httpx.AsyncClient(
+                timeout=DEFAULT_TIMEOUT_SECONDS,
+                limits=_limits(),
+                http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+                verify=settings.VALIDATE_CERTS,
+            )
+            entry = _async_clients[key] = (loop, client)
+        return entry[1]
+
+
+def get_sync_http_client() -> httpx.Client:
+    """Shared blocking client, for code that runs outside an event loop (scripts, CLIs)."""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        with _clients_lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(
+                    timeout=DEFAULT_TIMEOUT_SECONDS,
+                    limits=_limits(),
+                    http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+                    verify=settings.VALIDATE_CERTS,
+                )
+    return _sync_client
+
+
+async def close_http_clients() -> None:
+    """Close the running loop's async clients and the sync client (app shutdown)."""
+    global _sync_client
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        owned = [key for key, (owner, _) in _async_clients.items() if owner is loop]
+        clients = [_async_clients.pop(key)[1] for key in owned]
+        sync_client, _sync_client = _sync_client, None
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+    if sync_client is not None:
+        sync_client.close()
+
+
+def http_client_stats() -> Dict[str, object]:
+    return {
+        "origins": sorted({origin for (_, origin) in _async_clients}),
+        "http2": settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        "max_connections_per_host": settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+    }
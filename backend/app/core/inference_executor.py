@@ -0,0 +1,263 @@
+"""
+Managed executor for CPU-bound inference.
+
+Model scoring runs in a process pool whose workers preload the fraud model,
+so a large batch never blocks the asyncio event loop. Light calls that must
+share in-process state (e.g. the RL detector) go to a small thread pool.
+Both pools have a bounded queue depth and record queue wait and run time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from app.core.audit_logging import emit_audit_log
+from app.core.config import settings
+
+
+# Number of recent calls kept per pool for latency percentiles
+LATENCY_WINDOW = 1000
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when a pool already has max_queue_depth calls in flight."""
+
+
+def _init_process_worker() -> None:
+    """Load the fraud model once per worker process."""
+    try:
+        from ml_training.model_registry import get_model_registry
+
+        get_model_registry().get()
+    except FileNotFoundError:
+        # Not trained yet; the registry retries on first use
+        pass
+    except Exception as exc:
+        print(f"Warning: Inference worker could not preload fraud model: {exc}")
+
+
+def _timed_call(fn: Callable[..., Any]) -> Tuple[float, float, Any]:
+    """Run fn and return wall-clock start/end so the parent can split queue wait from run time."""
+    started = time.time()
+    result = fn()
+    return started, time.time(), result
+
+
+def _percentile(values: list[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+class _PoolStats:
+    """Counters and recent latencies for one pool."""
+
+    def __init__(self, max_queue_depth: int) -> None:
+        self.max_queue_depth = max_queue_depth
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_wait_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.run_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.in_flight >= self.max_queue_depth:
+                self.rejected += 1
+                raise InferenceQueueFull(
+                    f"Inference queue is full ({self.in_flight} calls in flight)"
+                )
+            self.in_flight += 1
+            self.submitted += 1
+
+    def release(self, ok: bool, queue_wait_ms: Optional[float] = None, run_ms: Optional[float] = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            if queue_wait_ms is not None:
+                self.queue_wait_ms.append(max(queue_wait_ms, 0.0))
+            if run_ms is not None:
+                self.run_ms.append(max(run_ms, 0.0))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            queue_wait = list(self.queue_wait_ms)
+            run = list(self.run_ms)
+            return {
+                "in_flight": self.in_flight,
+                "max_queue_depth": self.max_queue_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "queue_wait_ms": {
+                    "avg": round(sum(queue_wait) / len(queue_wait), 2) if queue_wait else None,
+                    "p50": _percentile(queue_wait, 50),
+                    "p95": _percentile(queue_wait, 95),
+                    "max": round(max(queue_wait), 2) if queue_wait else None,
+                },
+                "run_ms": {
+                    "avg": round(sum(run) / len(run), 2) if run else None,
+                    "p50": _percentile(run, 50),
+                    "p95": _percentile(run, 95),
+                    "max": round(max(run), 2) if run else None,
+                },
+            }
+
+
+class InferenceExecutor:
+    """
+    Process pool for model scoring plus a thread pool for light calls.
+
+    Functions sent to run_cpu must be picklable (module-level functions or
+    functools.partial of them) and take/return plain data. With
+    process_workers=0 everything runs on the thread pool instead.
+    """
+
+    def __init__(
+        self,
+        process_workers: int = 2,
+        thread_workers: int = 4,
+        max_queue_depth: int = 64,
+        start_method: str = "spawn",
+    ) -> None:
+        self.process_workers = max(process_workers, 0)
+        self.thread_workers = max(thread_workers, 1)
+        self.start_method = start_method
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_stats = _PoolStats(max_queue_depth)
+        self._thread_stats = _PoolStats(max_queue_depth)
+        self._lock = threading.Lock()
+        self.started_at: Optional[float] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.thread_workers, thread_name_prefix="inference"
+                )
+            if self.process_workers and self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_process_worker,
+                )
+            if self.started_at is None:
+                self.started_at = time.time()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
+            if self._thread_pool is not None:
+                self._thread_pool.shutdown(wait=False, cancel_futures=True)
+                self._thread_pool = None
+            self.started_at = None
+
+    def _restart_process_pool(self, broken: Executor) -> None:
+        with self._lock:
+            if self._process_pool is broken:
+                self._process_pool = None
+        emit_audit_log(
+            action="inference.process_pool",
+            status="warning",
+            message="Inference process pool broke; starting a new one.",
+        )
+        self.start()
+
+    @staticmethod
+    def _record(stats: _PoolStats, submitted: float, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            stats.release(ok=False)
+            return
+        started, finished, _ = future.result()
+        stats.release(
+            ok=True,
+            queue_wait_ms=(started - submitted) * 1000,
+            run_ms=(finished - started) * 1000,
+        )
+
+    async def _submit(self, pool: Executor, stats: _PoolStats, fn: Callable[..., Any]) -> Any:
+        stats.acquire()
+        submitted = time.time()
+        try:
+            future = pool.submit(_timed_call, fn)
+        except BaseException:
+            stats.release(ok=False)
+            raise
+        # Counted until the pool finishes the call, even if the awaiting request goes away
+        future.add_done_callback(partial(self._record, stats, submitted))
+        _, _, result = await asyncio.wrap_future(future)
+        return result
+
+    async def run_cpu(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a CPU-heavy, picklable call in the process pool."""
+        if self._thread_pool is None:
+            self.start()
+        call = partial(fn, *args, **kwargs)
+        pool = self._process_pool
+        if pool is None:
+            return await self._submit(self._thread_pool, self._thread_stats, call)
+        try:
+            return await self._submit(pool, self._process_stats, call)
+        except BrokenProcessPool:
+            self._restart_process_pool(pool)
+            raise
+
+    async def run_light(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a short call that needs this process's state in the thread pool."""
+        if self._thread_pool is None:
+            self.start()
+        return await self._submit(self._thread_pool, self._thread_stats, partial(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread_pool is not None,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else None,
+            "process_pool": {
+                "workers": self.process_workers if self._process_pool is not None else 0,
+                "start_method": self.start_method,
+                **self._process_stats.snapshot(),
+            },
+            "thread_pool": {
+                "workers": self.thread_workers,
+                **self._thread_stats.snapshot(),
+            },
+        }
+
+
+_inference_executor: Optional[InferenceExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Get or create the global inference executor (configured from settings)."""
+    global _inference_executor
+    if _inference_executor is None:
+        with _executor_lock:
+            if _inference_executor is None:
+                _inference_executor = InferenceExecutor(
+                    process_workers=settings.INFERENCE_PROCESS_WORKERS,
+                    thread_workers=settings.INFERENCE_THREAD_WORKERS,
+                    max_queue_depth=settings.INFERENCE_MAX_QUEUE_DEPTH,
+                    start_method=settings.INFERENCE_START_METHOD,
+                )
+    return _inference_executor
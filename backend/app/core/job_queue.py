@@ -0,0 +1,363 @@
+"""
+Persistent background job queue.
+
+Jobs are rows in the background_jobs table, so they survive restarts and
+every worker process can pick them up. Each process runs a small pool of
+asyncio workers (started from the app lifespan) that claim a job with a
+conditional UPDATE, hold a lease while it runs, retry failures with
+backoff and stop a job when cancellation is requested.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.audit_logging import emit_audit_log
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import BackgroundJob
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+TERMINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+# A handler gets the job payload and a session of its own, and returns a JSON-serializable dict
+JobHandler = Callable[[Dict[str, Any], Session], Awaitable[Dict[str, Any]]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(kind: str, handler: JobHandler) -> None:
+    """Register the coroutine that runs jobs of this kind."""
+    _handlers[kind] = handler
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: Dict[str, Any],
+    created_by: Optional[int] = None,
+    max_attempts: Optional[int] = None,
+) -> BackgroundJob:
+    """Store a queued job and wake this process's workers."""
+    job = BackgroundJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        status=JOB_QUEUED,
+        payload=json.dumps(payload),
+        attempts=0,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        cancel_requested=False,
+        created_by=created_by,
+        run_after=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    get_job_queue().wake()
+    return job
+
+
+def get_job(db: Session, job_id: str) -> Optional[BackgroundJob]:
+    return db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+
+
+def request_cancel(db: Session, job: BackgroundJob) -> BackgroundJob:
+    """
+    Cancel a job: queued jobs stop at once, running ones at the worker's next
+    lease heartbeat. Finished jobs are left as they are.
+    """
+    if job.status == JOB_QUEUED:
+        # Conditional so a worker that claimed it in the meantime wins
+        cancelled = db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job.id, BackgroundJob.status == JOB_QUEUED)
+            .values(status=JOB_CANCELLED, cancel_requested=True, finished_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if not cancelled:
+            return request_cancel(db, get_job(db, job.id))
+    elif job.status == JOB_RUNNING:
+        job.cancel_requested = True
+        db.add(job)
+        db.commit()
+    db.refresh(job)
+    return job
+
+
+class JobQueue:
+    """
+    Pool of asyncio workers draining background_jobs.
+
+    Several processes may run a pool against the same table: a job is only
+    claimed by the worker whose conditional UPDATE changes it, and a job
+    whose lease expires (its worker died) is claimed again.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 300.0,
+        retry_backoff_seconds: float = 5.0,
+    ) -> None:
+        self.workers = max(workers, 0)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.running_jobs: Dict[str, str] = {}  # job id -> kind
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self._tasks or not self.workers:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{n}") for n in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running go back to the queue."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def wake(self) -> None:
+        """Let an idle worker look for work now instead of at the next poll (thread-safe)."""
+        if self._loop is None or self._wakeup is None or self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception as exc:
+                emit_audit_log(
+                    action="job_queue.claim",
+                    status="error",
+                    message="Could not claim a background job.",
+                    details={"error": str(exc)},
+                )
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest runnable job (queued, or running with an expired lease)."""
+        now = datetime.utcnow()
+        runnable = or_(
+            and_(BackgroundJob.status == JOB_QUEUED, BackgroundJob.run_after <= now),
+            and_(BackgroundJob.status == JOB_RUNNING, BackgroundJob.lease_expires_at < now),
+        )
+        db = SessionLocal()
+        try:
+            candidates = (
+                db.query(BackgroundJob.id)
+                .filter(runnable)
+                .order_by(BackgroundJob.created_at)
+                .limit(5)
+                .all()
+            )
+            for (job_id,) in candidates:
+                claimed = db.execute(
+                    update(BackgroundJob)
+                    .where(BackgroundJob.id == job_id, runnable)
+                    .values(
+                        status=JOB_RUNNING,
+                        worker_id=self.worker_id,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        started_at=now,
+                        attempts=BackgroundJob.attempts + 1,
+                    )
+                ).rowcount
+                db.commit()
+                if claimed:
+                    job = get_job(db, job_id)
+                    return {
+                        "id": job.id,
+                        "kind": job.kind,
+                        "payload": json.loads(job.payload or "{}"),
+                        "attempts": job.attempts,
+                        "max_attempts": job.max_attempts,
+                        "cancel_requested": bool(job.cancel_requested),
+                    }
+            return None
+        finally:
+            db.close()
+
+    def _heartbeat(self, job_id: str) -> bool:
+        """Extend the lease; returns True if cancellation was requested."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id, BackgroundJob.worker_id == self.worker_id)
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+            )
+            db.commit()
+            cancel_requested = db.query(BackgroundJob.cancel_requested).filter(
+                BackgroundJob.id == job_id
+            ).scalar()
+            return bool(cancel_requested)
+        finally:
+            db.close()
+
+    def _finish(self, job_id: str, **values: Any) -> None:
+        """Write a job's outcome, unless another worker has taken it over."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id, BackgroundJob.worker_id == self.worker_id)
+                .values(**values)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        handler = _handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(
+                self._finish, job_id, status=JOB_FAILED, lease_expires_at=None,
+                error=f"No handler registered for job kind '{job['kind']}'",
+                finished_at=datetime.utcnow(),
+            )
+            return
+        if job["attempts"] > job["max_attempts"]:
+            # Only reachable through expired leases, i.e. the job keeps taking its worker down
+            await asyncio.to_thread(
+                self._finish, job_id, status=JOB_FAILED, lease_expires_at=None,
+                error="Worker lost the job on every attempt", finished_at=datetime.utcnow(),
+            )
+            return
+        if job["cancel_requested"]:
+            await asyncio.to_thread(
+                self._finish, job_id, status=JOB_CANCELLED, lease_expires_at=None,
+                finished_at=datetime.utcnow(),
+            )
+            return
+
+        self.running_jobs[job_id] = job["kind"]
+        db = SessionLocal()
+        task = asyncio.create_task(handler(job["payload"], db))
+        try:
+            cancelled = False
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.poll_interval)
+                if done:
+                    break
+                if await asyncio.to_thread(self._heartbeat, job_id):
+                    task.cancel()
+                    cancelled = True
+                    await asyncio.gather(task, return_exceptions=True)
+                    break
+
+            if cancelled:
+                await asyncio.to_thread(
+                    self._finish, job_id, status=JOB_CANCELLED, lease_expires_at=None,
+                    finished_at=datetime.utcnow(),
+                )
+            elif task.exception() is None:
+                await asyncio.to_thread(
+                    self._finish, job_id, status=JOB_SUCCEEDED, lease_expires_at=None,
+                    result=json.dumps(task.result(), default=str), error=None,
+                    finished_at=datetime.utcnow(),
+                )
+            else:
+                await asyncio.to_thread(self._record_failure, job, task.exception())
+        except asyncio.CancelledError:
+            # Queue stopping: put the job back for the next worker (this attempt is not counted)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            self._finish(
+                job_id, status=JOB_QUEUED, worker_id=None, lease_expires_at=None,
+                attempts=BackgroundJob.attempts - 1, run_after=datetime.utcnow(),
+            )
+            raise
+        finally:
+            self.running_jobs.pop(job_id, None)
+            db.close()
+
+    def _record_failure(self, job: Dict[str, Any], exc: BaseException) -> None:
+        error = f"{type(exc).__name__}: {exc}"
+        retry = job["attempts"] < job["max_attempts"]
+        emit_audit_log(
+            action="job_queue.job",
+            status="warning" if retry else "error",
+            message="Background job failed; retrying." if retry else "Background job failed.",
+            entity_type="background_job",
+            entity_id=job["id"],
+            details={"kind": job["kind"], "attempt": job["attempts"], "error": error},
+        )
+        if retry:
+            backoff = self.retry_backoff_seconds * (2 ** (job["attempts"] - 1))
+            self._finish(
+                job["id"], status=JOB_QUEUED, worker_id=None, lease_expires_at=None,
+                error=error, run_after=datetime.utcnow() + timedelta(seconds=backoff),
+            )
+        else:
+            self._finish(
+                job["id"], status=JOB_FAILED, lease_expires_at=None,
+                error=error, finished_at=datetime.utcnow(),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers if self.started else 0,
+            "worker_id": self.worker_id,
+            "running_jobs": len(self.running_jobs),
+        }
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Get or create the global job queue (configured from settings)."""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(
+                    workers=settings.JOB_WORKERS,
+                    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+                    lease_seconds=settings.JOB_LEASE_SECONDS,
+                    retry_backoff_seconds=settings.JOB_RETRY_BACKOFF_SECONDS,
+                )
+    return _job_queue
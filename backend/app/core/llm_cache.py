@@ -0,0 +1,265 @@
+"""
+Content-addressed cache of LLM responses.
+
+Responses are keyed by a SHA-256 of the model, the whitespace-normalized
+prompt and the sampling parameters, so re-analysing a wallet or refreshing
+the dashboard reuses the answer to an identical prompt instead of paying
+for it again. Entries live in an in-memory LRU (LLM_CACHE_MAX_ENTRIES)
+and expire after LLM_CACHE_TTL_SECONDS (0 disables the cache).
+
+With LLM_CACHE_PATH set, entries are also written through to a SQLite
+file, so they survive restarts and are shared by the workers on a host;
+a memory miss falls back to it before calling the model. Only successful
+responses are stored, never template fallbacks.
+
+Async callers use aget()/aset(): the in-memory LRU is consulted on the
+event loop and only the SQLite reads and writes go to a worker thread.
+The LRU and the SQLite connection have separate locks, so a memory lookup
+never waits on a disk commit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.audit_logging import emit_audit_log
+from app.core.config import settings
+
+PRUNE_EVERY_WRITES = 100  # Disk writes between removals of expired/excess rows
+
+_WHITESPACE = re.compile(r"\s+")
+_MISS = object()
+
+
+def cache_key(model: str, prompt: Any, temperature: float, **params: Any) -> str:
+    """
+    Key for a completion request.
+
+    Args:
+        prompt: Prompt text, or the chat messages (list of role/content dicts)
+        params: Other parameters that change the output (max_tokens, response_format, ...)
+    """
+    if isinstance(prompt, str):
+        normalized: Any = _WHITESPACE.sub(" ", prompt).strip()
+    else:
+        normalized = [
+            {**message, "content": _WHITESPACE.sub(" ", str(message.get("content", ""))).strip()}
+            for message in prompt
+        ]
+    material = json.dumps(
+        {"model": model, "prompt": normalized, "temperature": temperature, "params": params},
+        sort_keys=True,
+        ensure_ascii=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """LRU + TTL cache of JSON-serializable LLM responses, optionally backed by SQLite."""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600.0, path: Optional[str] = None) -> None:
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()  # Guards the LRU and the counters
+        self._db_lock = threading.Lock()  # Guards the SQLite connection
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self.path = path
+        if path:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False, timeout=1.0)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_expires_at ON llm_cache (expires_at)")
+                self._db.commit()
+            except sqlite3.Error as exc:
+                self._disk_failed("open", exc)
+
+    def _disk_failed(self, operation: str, exc: Exception) -> None:
+        """Carry on in memory only."""
+        emit_audit_log(
+            action="llm_cache.disk",
+            status="warning",
+            message="LLM cache file unavailable; caching in memory only.",
+            details={"operation": operation, "path": self.path, "error": str(exc)},
+        )
+        if self._db is not None:
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+        self._db = None
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _memory_get(self, key: str, now: float) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISS
+            if entry[0] <= now:
+                del self._entries[key]
+                return _MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _disk_get(self, key: str, now: float) -> Any:
+        with self._db_lock:
+            if self._db is None:
+                return _MISS
+            try:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            except sqlite3.Error as exc:
+                self._disk_failed("get", exc)
+                return _MISS
+        if row is None:
+            return _MISS
+        value = json.loads(row[0])
+        with self._lock:
+            self._remember(key, row[1], value)
+            self.hits += 1
+            self.disk_hits += 1
+        return value
+
+    def _miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def _disk_set(self, key: str, value: Any, expires_at: float) -> None:
+        payload = json.dumps(value, ensure_ascii=True)
+        with self._db_lock:
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, payload, expires_at),
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY_WRITES == 0:
+                    self._prune_disk()
+                self._db.commit()
+            except sqlite3.Error as exc:
+                self._disk_failed("set", exc)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None on a miss (expired entries count as misses)."""
+        if self.ttl_seconds <= 0:
+            return None
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is _MISS and self._db is not None:
+            value = self._disk_get(key, now)
+        if value is _MISS:
+            self._miss()
+            return None
+        return value
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for the event loop: the SQLite fallback runs in a worker thread."""
+        if self.ttl_seconds <= 0:
+            return None
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is _MISS and self._db is not None:
+            value = await asyncio.to_thread(self._disk_get, key, now)
+        if value is _MISS:
+            self._miss()
+            return None
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self._db is not None:
+            self._disk_set(key, value, expires_at)
+
+    async def aset(self, key: str, value: Any) -> None:
+        """set() for the event loop: the SQLite write runs in a worker thread."""
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    def _prune_disk(self) -> None:
+        """Drop expired rows and keep the file to max_entries (soonest to expire go first)."""
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key NOT IN (SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        with self._db_lock:
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM llm_cache")
+                    self._db.commit()
+                except sqlite3.Error as exc:
+                    self._disk_failed("clear", exc)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "disk": self._db is not None,
+        }
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Get or create the global LLM response cache (configured from settings)."""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache(
+                    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+                    path=settings.LLM_CACHE_PATH or None,
+                )
+    return _llm_cache
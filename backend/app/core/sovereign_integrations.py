@@ -7,6 +7,7 @@ expose internal Core/Bucket implementation details.
 
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
 from dataclasses import dataclass
@@ -14,10 +15,9 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-import httpx
-
 from app.core.audit_logging import emit_audit_log
 from app.core.config import settings
+from app.core.http_client import get_http_client
 
 
 @dataclass
@@ -75,10 +75,9 @@ def _rewrite_buffer(path: Path, items: list[Dict[str, Any]]) -> None:
             fp.write("\n")
 
 
-def _post_json(url: str, payload: Dict[str, Any], timeout_seconds: float) -> IntegrationResult:
+async def _post_json(url: str, payload: Dict[str, Any], timeout_seconds: float) -> IntegrationResult:
     try:
-        with httpx.Client(timeout=timeout_seconds, verify=settings.VALIDATE_CERTS) as client:
-            response = client.post(url, json=payload)
+        response = await get_http_client(url).post(url, json=payload, timeout=timeout_seconds)
         if 200 <= response.status_code < 300:
             return IntegrationResult(success=True, upstream_status=response.status_code)
         return IntegrationResult(
@@ -112,7 +111,7 @@ def _publish_kafka_best_effort(payload: Dict[str, Any]) -> IntegrationResult:
         return IntegrationResult(success=False, detail=f"kafka publish failed: {exc}")
 
 
-def store_evidence_in_bucket(
+async def store_evidence_in_bucket(
     *,
     evidence_id: str,
     sha256: str,
@@ -140,7 +139,7 @@ def store_evidence_in_bucket(
 
     result = IntegrationResult(success=False, detail="not attempted")
     for _ in range(settings.EVENT_RETRY_MAX_ATTEMPTS):
-        result = _post_json(
+        result = await _post_json(
             settings.BHIV_BUCKET_EVIDENCE_URL,
             payload,
             timeout_seconds=settings.BHIV_INTEGRATION_TIMEOUT_SECONDS,
@@ -167,7 +166,7 @@ def store_evidence_in_bucket(
     return result
 
 
-def emit_core_event(
+async def emit_core_event(
     *,
     action: str,
     evidence_id: str,
@@ -189,7 +188,7 @@ def emit_core_event(
     }
 
     if not settings.BHIV_CORE_EVENT_URL:
-        kafka_result = _publish_kafka_best_effort(event)
+        kafka_result = await asyncio.to_thread(_publish_kafka_best_effort, event)
         if kafka_result.success:
             emit_audit_log(
                 action="core.event.emit",
@@ -213,7 +212,7 @@ def emit_core_event(
 
     last_result = IntegrationResult(success=False, detail="not attempted")
     for attempt in range(settings.EVENT_RETRY_MAX_ATTEMPTS):
-        last_result = _post_json(
+        last_result = await _post_json(
             settings.BHIV_CORE_EVENT_URL,
             event,
             timeout_seconds=settings.BHIV_INTEGRATION_TIMEOUT_SECONDS,
@@ -243,7 +242,7 @@ def emit_core_event(
     return last_result
 
 
-def flush_event_buffer(max_items: int = 100) -> Dict[str, Any]:
+async def flush_event_buffer(max_items: int = 100) -> Dict[str, Any]:
     """
     Attempt to flush locally buffered events to BHIV Core.
     Safe to call from health checks/admin tooling.
@@ -258,7 +257,7 @@ def flush_event_buffer(max_items: int = 100) -> Dict[str, Any]:
     keep: list[Dict[str, Any]] = []
     flushed = 0
     for item in buffered[:max_items]:
-        result = _post_json(
+        result = await _post_json(
             settings.BHIV_CORE_EVENT_URL,
             item,
             timeout_seconds=settings.BHIV_INTEGRATION_TIMEOUT_SECONDS,
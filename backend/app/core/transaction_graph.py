@@ -0,0 +1,664 @@
+"""
+In-memory graph index over fraud_transactions.
+
+Accounts (name_orig / name_dest) are interned to integer ids and every
+transaction is an edge with amount, step, is_fraud and type columns. Out-
+and in-adjacency are CSR arrays (see graph_kernels), so a k-hop
+neighbourhood query is a few vectorized gathers instead of OR queries on
+the name columns.
+
+The index follows the table with a watermark (the highest transaction id
+loaded): refresh() appends rows above it. Appended edges are answered from
+a small pending tail until it is large enough to fold into the CSR arrays.
+
+At startup a worker maps the last on-disk snapshot (graph_snapshot) and
+only loads the rows added since from SQL.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from app.core.audit_logging import emit_audit_log
+from app.core.config import settings
+from app.core.graph_kernels import build_csr, degrees, find_cycles, find_paths, gather, max_flow, trace_labels
+from app.core.graph_snapshot import CSR_ARRAYS, EDGE_COLUMNS, AccountIndex, read_snapshot, write_snapshot
+from app.db.database import SessionLocal
+from app.db.models import FraudTransaction
+
+DIRECTIONS = ("out", "in", "both")
+
+# Pending edges are folded into the CSR arrays once there are this many
+# (or 10% of the graph, whichever is larger)
+CSR_MERGE_MIN_PENDING = 20000
+
+
+@dataclass(frozen=True)
+class GraphSnapshot:
+    """
+    Edge arrays and CSR adjacency as of one moment.
+
+    The graph only appends past n_edges and replaces (never mutates) its
+    CSR arrays, so these views stay valid while it keeps loading.
+    """
+    n_nodes: int
+    csr_edges: int
+    tx_id: np.ndarray
+    src: np.ndarray
+    dst: np.ndarray
+    amount: np.ndarray
+    step: np.ndarray
+    is_fraud: np.ndarray
+    tx_type: np.ndarray
+    out_indptr: np.ndarray
+    out_order: np.ndarray
+    in_indptr: np.ndarray
+    in_order: np.ndarray
+
+    @property
+    def pending(self) -> np.ndarray:
+        """Edges not yet folded into the CSR arrays."""
+        return np.arange(self.csr_edges, len(self.tx_id), dtype=np.int64)
+
+    def incident_edges(self, nodes: np.ndarray, direction: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Edge ids touching `nodes` in `direction` and the node at the far end of each."""
+        parts_edges = []
+        parts_next = []
+        pending = self.pending
+        if direction in ("out", "both"):
+            edges = gather(self.out_indptr, self.out_order, nodes)
+            if len(pending):
+                edges = np.concatenate([edges, pending[np.isin(self.src[pending], nodes)]])
+            parts_edges.append(edges)
+            parts_next.append(self.dst[edges])
+        if direction in ("in", "both"):
+            edges = gather(self.in_indptr, self.in_order, nodes)
+            if len(pending):
+                edges = np.concatenate([edges, pending[np.isin(self.dst[pending], nodes)]])
+            parts_edges.append(edges)
+            parts_next.append(self.src[edges])
+        return np.concatenate(parts_edges), np.concatenate(parts_next)
+
+    def edge_mask(
+        self,
+        edges: np.ndarray,
+        min_amount: Optional[float],
+        max_amount: Optional[float],
+        min_step: Optional[int],
+        max_step: Optional[int],
+        fraud_only: bool,
+    ) -> np.ndarray:
+        mask = np.ones(len(edges), dtype=bool)
+        if min_amount is not None:
+            mask &= self.amount[edges] >= min_amount
+        if max_amount is not None:
+            mask &= self.amount[edges] <= max_amount
+        if min_step is not None:
+            mask &= self.step[edges] >= min_step
+        if max_step is not None:
+            mask &= self.step[edges] <= max_step
+        if fraud_only:
+            mask &= self.is_fraud[edges] == 1
+        return mask
+
+    def degrees(self, nodes: np.ndarray) -> np.ndarray:
+        """In + out transaction count per node."""
+        degree = degrees(self.out_indptr, nodes) + degrees(self.in_indptr, nodes)
+        pending = self.pending
+        if len(pending):
+            counts = np.bincount(np.concatenate([self.src[pending], self.dst[pending]]), minlength=self.n_nodes)
+            degree = degree + counts[nodes]
+        return degree
+
+
+class TransactionGraph:
+    """
+    Account graph of fraud_transactions with CSR adjacency.
+
+    Queries run on a snapshot taken under the index lock, so a long search
+    never blocks loading or other readers.
+    """
+
+    def __init__(self, refresh_interval: float = 5.0, load_chunk_size: int = 50000) -> None:
+        self.refresh_interval = refresh_interval
+        self.load_chunk_size = load_chunk_size
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._refresh_listeners: List[Callable[[], Any]] = []  # Called after every refresh
+        self.loaded = False
+        self.watermark = 0  # Highest fraud_transactions.id in the index
+
+        self.accounts = AccountIndex()
+        self.snapshot_edges: Optional[int] = None  # Edges in the on-disk snapshot loaded or written
+        self.type_ids: Dict[str, int] = {}
+        self.types: List[str] = []
+
+        self.n_edges = 0
+        self._capacity = 0
+        self.tx_id = np.empty(0, dtype=np.int64)
+        self.src = np.empty(0, dtype=np.int64)
+        self.dst = np.empty(0, dtype=np.int64)
+        self.amount = np.empty(0, dtype=np.float64)
+        self.step = np.empty(0, dtype=np.int32)
+        self.is_fraud = np.empty(0, dtype=np.int8)
+        self.tx_type = np.empty(0, dtype=np.int16)
+
+        # CSR covers edges [0, _csr_edges); later edges are the pending tail
+        self._csr_edges = 0
+        self.out_indptr = np.zeros(1, dtype=np.int64)
+        self.out_order = np.empty(0, dtype=np.int64)
+        self.in_indptr = np.zeros(1, dtype=np.int64)
+        self.in_order = np.empty(0, dtype=np.int64)
+
+    # ---- building -------------------------------------------------------
+
+    def _intern(self, names: Iterable[str], ids: Dict[str, int], values: List[str]) -> np.ndarray:
+        result = []
+        for name in names:
+            key = ids.get(name)
+            if key is None:
+                key = ids[name] = len(values)
+                values.append(name)
+            result.append(key)
+        return np.array(result, dtype=np.int64)
+
+    def _reserve(self, extra: int) -> None:
+        needed = self.n_edges + extra
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 1024)
+        for name in EDGE_COLUMNS:
+            old = getattr(self, name)
+            grown = np.empty(capacity, dtype=old.dtype)
+            grown[:self.n_edges] = old[:self.n_edges]
+            setattr(self, name, grown)
+        self._capacity = capacity
+
+    def add_transactions(self, rows: Sequence[Tuple]) -> int:
+        """
+        Append transactions to the index.
+
+        Args:
+            rows: (id, name_orig, name_dest, amount, step, is_fraud, type)
+                tuples in ascending id order; ids at or below the watermark
+                are skipped
+
+        Returns:
+            Number of edges added
+        """
+        with self._lock:
+            rows = [row for row in rows if row[0] > self.watermark]
+            if not rows:
+                return 0
+            ids, origins, dests, amounts, steps, frauds, types = zip(*rows)
+            count = len(rows)
+            self._reserve(count)
+            start, end = self.n_edges, self.n_edges + count
+            self.tx_id[start:end] = ids
+            self.src[start:end] = self.accounts.intern(origins)
+            self.dst[start:end] = self.accounts.intern(dests)
+            self.amount[start:end] = amounts
+            self.step[start:end] = steps
+            self.is_fraud[start:end] = [1 if fraud == 1 else 0 for fraud in frauds]
+            self.tx_type[start:end] = self._intern(types, self.type_ids, self.types)
+            self.n_edges = end
+            self.watermark = max(self.watermark, max(ids))
+
+            if self.n_edges - self._csr_edges >= max(CSR_MERGE_MIN_PENDING, self.n_edges // 10):
+                self._rebuild_csr()
+            return count
+
+    def _rebuild_csr(self) -> None:
+        n = self.n_edges
+        n_nodes = len(self.accounts)
+        self.out_indptr, self.out_order = build_csr(self.src[:n], n_nodes)
+        self.in_indptr, self.in_order = build_csr(self.dst[:n], n_nodes)
+        self._csr_edges = n
+
+    def load_snapshot(self, directory: str, latest_id: Optional[int] = None) -> bool:
+        """
+        Map the current on-disk snapshot into an empty index.
+
+        Args:
+            latest_id: Highest fraud_transactions.id; a snapshot past it is
+                from a table that has since been reset and is skipped
+
+        Returns:
+            True if a snapshot was loaded; refresh() then loads the delta
+        """
+        snapshot = read_snapshot(directory)
+        if snapshot is None:
+            return False
+        manifest, arrays, accounts = snapshot
+        if latest_id is not None and manifest["watermark"] > latest_id:
+            return False
+        with self._lock:
+            if self.n_edges:
+                return False
+            for name in EDGE_COLUMNS + CSR_ARRAYS:
+                setattr(self, name, arrays[name])
+            self.accounts = accounts
+            self.types = list(manifest["types"])
+            self.type_ids = {name: index for index, name in enumerate(self.types)}
+            self.n_edges = self._csr_edges = manifest["n_edges"]
+            self._capacity = len(self.tx_id)
+            self.watermark = manifest["watermark"]
+            self.snapshot_edges = self.n_edges
+        return True
+
+    def save_snapshot(self, directory: str) -> str:
+        """Write the index to disk for other workers (folds the pending tail into the CSR first)."""
+        with self._lock:
+            if self._csr_edges < self.n_edges:
+                self._rebuild_csr()
+            n_edges, watermark = self.n_edges, self.watermark
+            arrays = {name: getattr(self, name) for name in EDGE_COLUMNS + CSR_ARRAYS}
+            accounts, n_nodes = self.accounts, len(self.accounts)
+            types = list(self.types)
+        # Written outside the lock: appends only touch edges past n_edges and accounts past n_nodes
+        version = write_snapshot(
+            directory,
+            arrays,
+            accounts.arrays(n_nodes),
+            types,
+            n_edges,
+            watermark,
+            headroom=max(CSR_MERGE_MIN_PENDING, n_edges // 10),
+        )
+        self.snapshot_edges = n_edges
+        return version
+
+    def add_refresh_listener(self, listener: Callable[[], Any]) -> None:
+        """Call `listener` (in the refreshing thread) after every refresh, e.g. to follow new edges."""
+        self._refresh_listeners.append(listener)
+
+    def refresh(self, db=None) -> int:
+        """
+        Load fraud_transactions rows above the watermark.
+
+        Returns:
+            Number of edges added
+        """
+        owns_session = db is None
+        if owns_session:
+            db = SessionLocal()
+        added = 0
+        try:
+            with self._refresh_lock:
+                while True:
+                    rows = (
+                        db.query(
+                            FraudTransaction.id,
+                            FraudTransaction.name_orig,
+                            FraudTransaction.name_dest,
+                            FraudTransaction.amount,
+                            FraudTransaction.step,
+                            FraudTransaction.is_fraud,
+                            FraudTransaction.type,
+                        )
+                        .filter(FraudTransaction.id > self.watermark)
+                        .order_by(FraudTransaction.id)
+                        .limit(self.load_chunk_size)
+                        .all()
+                    )
+                    if not rows:
+                        break
+                    added += self.add_transactions([tuple(row) for row in rows])
+                    if len(rows) < self.load_chunk_size:
+                        break
+                with self._lock:
+                    if self._csr_edges < self.n_edges and not self.loaded:
+                        self._rebuild_csr()
+                self.loaded = True
+                self._last_refresh = time.monotonic()
+                for listener in list(self._refresh_listeners):
+                    try:
+                        listener()
+                    except Exception as exc:
+                        emit_audit_log(
+                            action="transaction_graph.refresh",
+                            status="warning",
+                            message="Transaction graph refresh listener failed.",
+                            details={"listener": getattr(listener, "__qualname__", repr(listener)), "error": str(exc)},
+                        )
+        finally:
+            if owns_session:
+                db.close()
+        return added
+
+    def ensure_fresh(self, db=None) -> None:
+        """
+        Refresh if the last check is older than refresh_interval.
+
+        The first call loads the whole table; later ones skip the check if
+        another thread is already refreshing.
+        """
+        if not self.loaded:
+            self.refresh(db)
+            return
+        if time.monotonic() - self._last_refresh < self.refresh_interval or self._refresh_lock.locked():
+            return
+        try:
+            self.refresh(db)
+        except Exception as exc:
+            emit_audit_log(
+                action="transaction_graph.refresh",
+                status="warning",
+                message="Transaction graph refresh failed; serving the loaded index.",
+                details={"error": str(exc)},
+            )
+
+    # ---- queries --------------------------------------------------------
+
+    def account_id(self, account: str) -> Optional[int]:
+        return self.accounts.get(account)
+
+    def snapshot(self) -> "GraphSnapshot":
+        """Consistent read-only view of the edges loaded so far (queries run on it without the lock)."""
+        with self._lock:
+            n = self.n_edges
+            return GraphSnapshot(
+                n_nodes=len(self.accounts),
+                csr_edges=self._csr_edges,
+                tx_id=self.tx_id[:n],
+                src=self.src[:n],
+                dst=self.dst[:n],
+                amount=self.amount[:n],
+                step=self.step[:n],
+                is_fraud=self.is_fraud[:n],
+                tx_type=self.tx_type[:n],
+                out_indptr=self.out_indptr,
+                out_order=self.out_order,
+                in_indptr=self.in_indptr,
+                in_order=self.in_order,
+            )
+
+    def neighbourhood(
+        self,
+        account: str,
+        hops: int = 1,
+        direction: str = "both",
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        min_step: Optional[int] = None,
+        max_step: Optional[int] = None,
+        fraud_only: bool = False,
+        max_edges: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Accounts and transactions within `hops` of an account.
+
+        Only edges passing the filters are followed. Expansion stops once
+        max_edges transactions have been collected (the result is then
+        marked truncated).
+
+        Returns:
+            None if the account has no transactions, else a dict with
+            node_ids, node_hops, edge_ids and truncated
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        center = self.account_id(account)
+        if center is None:
+            return None
+        view = self.snapshot()
+        node_ids = [np.array([center], dtype=np.int64)]
+        node_hops = [np.zeros(1, dtype=np.int64)]
+        visited = np.array([center], dtype=np.int64)  # Kept sorted for isin
+        frontier = visited
+        collected: List[np.ndarray] = []
+        n_collected = 0
+        truncated = False
+
+        for hop in range(1, hops + 1):
+            if not len(frontier):
+                break
+            edges, neighbours = view.incident_edges(frontier, direction)
+            keep = view.edge_mask(edges, min_amount, max_amount, min_step, max_step, fraud_only)
+            edges, neighbours = edges[keep], neighbours[keep]
+            if max_edges is not None and n_collected + len(edges) > max_edges:
+                # Keep the largest transactions of the hop that crosses the cap
+                room = max(max_edges - n_collected, 0)
+                top = np.argsort(-view.amount[edges], kind="stable")[:room]
+                edges, neighbours = edges[top], neighbours[top]
+                truncated = True
+            collected.append(edges)
+            n_collected += len(edges)
+
+            new_nodes = np.unique(neighbours)
+            new_nodes = new_nodes[~np.isin(new_nodes, visited, assume_unique=True)]
+            node_ids.append(new_nodes)
+            node_hops.append(np.full(len(new_nodes), hop, dtype=np.int64))
+            visited = np.union1d(visited, new_nodes)
+            frontier = new_nodes
+            if truncated:
+                break
+
+        edge_ids = np.unique(np.concatenate(collected)) if collected else np.empty(0, dtype=np.int64)
+        return {
+            "node_ids": np.concatenate(node_ids),
+            "node_hops": np.concatenate(node_hops),
+            "edge_ids": edge_ids,
+            "truncated": truncated,
+        }
+
+    def cycles(
+        self,
+        account: str,
+        max_hops: int = 4,
+        max_step_gap: Optional[int] = 72,
+        amount_tolerance: Optional[float] = 0.2,
+        max_cycles: int = 50,
+        time_budget: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Circular flows that leave an account and come back to it.
+
+        See graph_kernels.find_cycles for the constraints; steps are hours,
+        so max_step_gap is the time window of a whole cycle.
+
+        Returns:
+            None if the account has no transactions, else a dict with
+            cycles (tuples of edge ids) and complete (False if the budget
+            or max_cycles cut the search short)
+        """
+        start = self.account_id(account)
+        if start is None:
+            return None
+        view = self.snapshot()
+        search = find_cycles(
+            start,
+            out_edges=lambda nodes: view.incident_edges(nodes, "out"),
+            in_edges=lambda nodes: view.incident_edges(nodes, "in"),
+            n_nodes=view.n_nodes,
+            amounts=view.amount,
+            times=view.step,
+            max_hops=max_hops,
+            max_time_gap=max_step_gap,
+            amount_tolerance=amount_tolerance,
+            max_cycles=max_cycles,
+            deadline=time.monotonic() + time_budget if time_budget is not None else None,
+        )
+        return {"cycles": search.cycles, "complete": search.complete}
+
+    def trace(
+        self,
+        source: str,
+        target: str,
+        max_hops: int = 4,
+        max_step_gap: Optional[int] = None,
+        max_paths: int = 200,
+        time_budget: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Time-respecting money flows from one account to another.
+
+        A bidirectional BFS (graph_kernels.trace_labels) settles whether the
+        target is reachable at all, then a DFS pruned by its labels collects
+        paths whose transactions run in step order within max_step_gap. The
+        max-flow over the collected paths' transactions (amounts as
+        capacities, order between paths ignored) bounds how much of the
+        source's money could have arrived.
+
+        Returns:
+            None if either account has no transactions, else a dict with
+            paths (tuples of edge ids), reachable (False if the BFS never
+            met), complete, max_flow and the two search depths
+        """
+        origin = self.account_id(source)
+        destination = self.account_id(target)
+        if origin is None or destination is None:
+            return None
+        view = self.snapshot()
+        out_edges = lambda nodes: view.incident_edges(nodes, "out")
+        labels = trace_labels(
+            origin,
+            destination,
+            out_edges=out_edges,
+            in_edges=lambda nodes: view.incident_edges(nodes, "in"),
+            src=view.src,
+            dst=view.dst,
+            times=view.step,
+            n_nodes=view.n_nodes,
+            max_hops=max_hops,
+        )
+        search = find_paths(
+            origin,
+            destination,
+            out_edges=out_edges,
+            labels=labels,
+            times=view.step,
+            max_hops=max_hops,
+            max_time_gap=max_step_gap,
+            max_paths=max_paths,
+            deadline=time.monotonic() + time_budget if time_budget is not None else None,
+        )
+        flow = 0.0
+        if search.paths:
+            edge_ids = np.unique(np.fromiter((edge for path in search.paths for edge in path), dtype=np.int64))
+            flow = max_flow(origin, destination, view.src[edge_ids], view.dst[edge_ids], view.amount[edge_ids])
+        return {
+            "paths": search.paths,
+            "reachable": labels.met,
+            "complete": search.complete,
+            "max_flow": flow,
+            "forward_depth": labels.forward_depth,
+            "backward_depth": labels.backward_depth,
+        }
+
+    def edge_records(self, edge_ids: np.ndarray) -> List[Dict[str, Any]]:
+        """Transactions as dicts, in step order."""
+        view = self.snapshot()
+        edge_ids = edge_ids[np.lexsort((view.tx_id[edge_ids], view.step[edge_ids]))]
+        return self.path_records(edge_ids)
+
+    def path_records(self, edge_ids: Sequence[int]) -> List[Dict[str, Any]]:
+        """Transactions as dicts, in the given order."""
+        view = self.snapshot()
+        edge_ids = np.asarray(edge_ids, dtype=np.int64)
+        return [
+            {
+                "transaction_id": tx_id,
+                "from": self.accounts[src],
+                "to": self.accounts[dst],
+                "amount": amount,
+                "step": step,
+                "type": self.types[tx_type],
+                "is_fraud": bool(fraud),
+            }
+            for tx_id, src, dst, amount, step, fraud, tx_type in zip(
+                view.tx_id[edge_ids].tolist(),
+                view.src[edge_ids].tolist(),
+                view.dst[edge_ids].tolist(),
+                view.amount[edge_ids].tolist(),
+                view.step[edge_ids].tolist(),
+                view.is_fraud[edge_ids].tolist(),
+                view.tx_type[edge_ids].tolist(),
+            )
+        ]
+
+    def node_records(self, node_ids: np.ndarray, node_hops: np.ndarray) -> List[Dict[str, Any]]:
+        """Accounts with their hop distance and total degree."""
+        view = self.snapshot()
+        degree = view.degrees(node_ids)
+        return [
+            {"id": self.accounts[node], "hop": hop, "degree": deg}
+            for node, hop, deg in zip(node_ids.tolist(), node_hops.tolist(), degree.tolist())
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "accounts": len(self.accounts),
+            "transactions": self.n_edges,
+            "pending_edges": self.n_edges - self._csr_edges,
+            "watermark": self.watermark,
+            "snapshot_edges": self.snapshot_edges,
+        }
+
+
+_transaction_graph: Optional[TransactionGraph] = None
+_transaction_graph_lock = threading.Lock()
+
+
+def get_transaction_graph() -> TransactionGraph:
+    """Get or create the global transaction graph index (call ensure_fresh() before querying)."""
+    global _transaction_graph
+    if _transaction_graph is None:
+        with _transaction_graph_lock:
+            if _transaction_graph is None:
+                _transaction_graph = TransactionGraph(
+                    refresh_interval=settings.TRANSACTION_GRAPH_REFRESH_SECONDS,
+                )
+    return _transaction_graph
+
+
+def request_load() -> bool:
+    """Load the graph index in a background thread (app startup)."""
+    graph = get_transaction_graph()
+    if graph.loaded or graph._refresh_lock.locked():
+        return False
+
+    def run():
+        directory = settings.TRANSACTION_GRAPH_SNAPSHOT_DIR
+        try:
+            if directory:
+                db = SessionLocal()
+                try:
+                    latest_id = db.query(func.max(FraudTransaction.id)).scalar() or 0
+                finally:
+                    db.close()
+                graph.load_snapshot(directory, latest_id=latest_id)
+            graph.refresh()
+        except Exception as exc:
+            emit_audit_log(
+                action="transaction_graph.load",
+                status="warning",
+                message="Could not load the transaction graph index.",
+                details={"error": str(exc)},
+            )
+            return
+        # Write a new snapshot when there was none or the delta since it has grown large
+        if directory and graph.n_edges and (
+            graph.snapshot_edges is None
+            or graph.n_edges - graph.snapshot_edges >= settings.TRANSACTION_GRAPH_SNAPSHOT_MIN_DELTA
+        ):
+            try:
+                graph.save_snapshot(directory)
+            except Exception as exc:
+                emit_audit_log(
+                    action="transaction_graph.snapshot",
+                    status="warning",
+                    message="Could not write the transaction graph snapshot.",
+                    details={"error": str(exc)},
+                )
+
+    threading.Thread(target=run, name="transaction-graph-load", daemon=True).start()
+    return True
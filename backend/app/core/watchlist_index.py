@@ -0,0 +1,276 @@
+"""
+Watchlist membership index and ingest-time hit detection.
+
+The active watchlist addresses are held in memory so every transaction
+written through the ORM (fraud_transactions and transactions) is checked
+against it by a mapper after_insert hook, with no query per row. Hits are
+collected on the session and alerted once it commits, so rolled-back rows
+never alert.
+
+Watchlists up to WATCHLIST_BLOOM_MIN_ENTRIES are kept as an exact hash
+set. Larger ones (e.g. an imported sanctions list) are kept as a Bloom
+filter: a fixed bit array of about 1.2 bytes per entry at a 1% false
+positive rate instead of ~100 bytes per string in a set. A Bloom
+negative is definitive; a positive is confirmed with one indexed lookup on
+watchlist_wallets. Removals cannot be cleared from a Bloom filter, so they
+are held in a small set until the next rebuild.
+
+Rows inserted with Core or bulk_insert_mappings bypass the mapper hooks
+and are not checked.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect as sa_inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.audit_logging import emit_audit_log
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import FraudTransaction, Transaction, WatchlistWallet
+
+RECENT_HITS = 1000  # Hits kept for /watchlist/hits
+SESSION_HITS_KEY = "watchlist_hits"
+
+# Address columns checked per table
+CHECKED_COLUMNS = {
+    FraudTransaction: ("name_orig", "name_dest"),
+    Transaction: ("from_address", "to_address"),
+}
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings (bytearray bits, double hashing of one blake2b digest).
+
+    No false negatives; false positives at about `error_rate` once
+    `capacity` items are added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        capacity = max(capacity, 1)
+        self.n_bits = max(int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)), 8)
+        self.n_hashes = max(int(round(self.n_bits / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class WatchlistIndex:
+    """Active watchlist addresses: an exact set, or a Bloom filter for very large lists."""
+
+    def __init__(self, bloom_min_entries: int = 1_000_000, bloom_error_rate: float = 0.01) -> None:
+        self.bloom_min_entries = bloom_min_entries
+        self.bloom_error_rate = bloom_error_rate
+        self._lock = threading.Lock()
+        self._members: Set[str] = set()
+        self._bloom: Optional[BloomFilter] = None
+        self._removed: Set[str] = set()  # Bloom mode: removed since the last rebuild
+        self.size = 0
+        self.built_at: Optional[float] = None
+        self.recent_hits: Deque[Dict[str, Any]] = deque(maxlen=RECENT_HITS)
+        self.total_hits = 0
+
+    def rebuild(self, addresses: Iterable[str]) -> None:
+        """Replace the index with `addresses` (the active watchlist)."""
+        members = set(addresses)
+        bloom = None
+        if len(members) >= self.bloom_min_entries:
+            bloom = BloomFilter(len(members), self.bloom_error_rate)
+            for address in members:
+                bloom.add(address)
+        with self._lock:
+            self._bloom = bloom
+            self._members = set() if bloom is not None else members
+            self._removed = set()
+            self.size = len(members)
+            self.built_at = time.time()
+
+    def load(self, db: Session) -> None:
+        """Rebuild from the active rows of watchlist_wallets."""
+        rows = db.query(WatchlistWallet.wallet_address).filter(WatchlistWallet.active.is_(True))
+        self.rebuild(address for (address,) in rows.yield_per(10000))
+
+    def add(self, address: str) -> None:
+        """
+        Add an address that has just become active on watchlist_wallets.
+
+        Call after the commit, only when the row went from inactive (or
+        missing) to active: a Bloom positive cannot tell an address already
+        counted from a false positive, so the DB change decides.
+        """
+        with self._lock:
+            if self._bloom is not None:
+                self._removed.discard(address)
+                self._bloom.add(address)
+            elif address not in self._members:
+                self._members.add(address)
+            else:
+                return
+            self.size += 1
+
+    def discard(self, address: str) -> None:
+        """Remove an address that is no longer active on watchlist_wallets (same contract as add)."""
+        with self._lock:
+            if self._bloom is not None:
+                if address not in self._removed:
+                    self._removed.add(address)
+                    self.size -= 1
+            elif address in self._members:
+                self._members.discard(address)
+                self.size -= 1
+
+    def might_contain(self, address: Optional[str]) -> bool:
+        """Exact in set mode; in Bloom mode False is definitive and True needs confirming."""
+        if not address:
+            return False
+        bloom = self._bloom
+        if bloom is None:
+            return address in self._members
+        return address not in self._removed and address in bloom
+
+    def contains(self, address: Optional[str], connection=None) -> bool:
+        """
+        Membership, confirming Bloom positives against watchlist_wallets.
+
+        Args:
+            connection: Connection to confirm on (e.g. the one flushing the
+                row); a new session is used otherwise
+        """
+        if not self.might_contain(address):
+            return False
+        if self._bloom is None:
+            return True
+        query = (
+            select(WatchlistWallet.id)
+            .where(WatchlistWallet.wallet_address == address, WatchlistWallet.active.is_(True))
+            .limit(1)
+        )
+        if connection is not None:
+            return connection.execute(query).first() is not None
+        db = SessionLocal()
+        try:
+            return db.execute(query).first() is not None
+        finally:
+            db.close()
+
+    def record_hits(self, hits: List[Dict[str, Any]]) -> None:
+        """Alert on committed hits and keep them for /watchlist/hits."""
+        for hit in hits:
+            self.recent_hits.append(hit)
+            self.total_hits += 1
+            emit_audit_log(
+                action="watchlist.hit",
+                status="warning",
+                message="Transaction involves a watchlisted wallet.",
+                entity_type=hit["table"],
+                entity_id=str(hit["transaction_id"]),
+                details=hit,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "mode": "bloom" if self._bloom is not None else "set",
+            "bloom_bytes": self._bloom.nbytes if self._bloom is not None else None,
+            "built_at": datetime.utcfromtimestamp(self.built_at).isoformat() if self.built_at else None,
+            "total_hits": self.total_hits,
+        }
+
+
+_watchlist_index: Optional[WatchlistIndex] = None
+_watchlist_index_lock = threading.Lock()
+
+
+def get_watchlist_index() -> WatchlistIndex:
+    """Get or create the global watchlist index (empty until load() or rebuild())."""
+    global _watchlist_index
+    if _watchlist_index is None:
+        with _watchlist_index_lock:
+            if _watchlist_index is None:
+                _watchlist_index = WatchlistIndex(
+                    bloom_min_entries=settings.WATCHLIST_BLOOM_MIN_ENTRIES,
+                    bloom_error_rate=settings.WATCHLIST_BLOOM_ERROR_RATE,
+                )
+    return _watchlist_index
+
+
+# ---- ingest hooks ---------------------------------------------------------
+
+
+def _check_inserted(mapper, connection, target) -> None:
+    index = get_watchlist_index()
+    if not index.size:
+        return
+    columns = CHECKED_COLUMNS[mapper.class_]
+    hits = []
+    for side, column in enumerate(columns):
+        address = getattr(target, column)
+        if index.contains(address, connection):
+            hits.append({
+                "table": mapper.class_.__tablename__,
+                "transaction_id": target.id,
+                "address": address,
+                "side": column,
+                "counterparty": getattr(target, columns[1 - side]),
+                "amount": getattr(target, "amount", None),
+                "detected_at": datetime.utcnow().isoformat(),
+            })
+    if hits:
+        session = sa_inspect(target).session
+        if session is not None:
+            session.info.setdefault(SESSION_HITS_KEY, []).extend(hits)
+        else:
+            index.record_hits(hits)
+
+
+def _after_commit(session: Session) -> None:
+    hits = session.info.pop(SESSION_HITS_KEY, None)
+    if hits:
+        get_watchlist_index().record_hits(hits)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(SESSION_HITS_KEY, None)
+
+
+_hooks_installed = False
+
+
+def install_hooks() -> None:
+    """Check ORM inserts into fraud_transactions and transactions against the index (idempotent)."""
+    global _hooks_installed
+    with _watchlist_index_lock:
+        if _hooks_installed:
+            return
+        for model in CHECKED_COLUMNS:
+            event.listen(model, "after_insert", _check_inserted)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+        _hooks_installed = True
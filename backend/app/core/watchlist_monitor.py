@@ -0,0 +1,221 @@
+"""
+Incremental watchlist monitoring.
+
+Every watchlist wallet keeps a high-water mark, last_seen_tx_id: the
+highest fraud_transactions.id involving the wallet when it was last
+analyzed. Each cycle the monitor looks up the newest transaction id of
+every active wallet (grouped queries on the indexed name_orig/name_dest
+columns) and re-analyzes only the wallets whose mark is behind, so a
+dormant wallet costs an index probe per cycle instead of a full analysis.
+
+A wallet is claimed by moving its mark forward with a conditional UPDATE,
+so monitors running in several worker processes never analyze the same
+activity twice; a failed analysis moves the mark back for the next cycle.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.core.audit_logging import emit_audit_log
+from app.core.config import settings
+from app.core.watchlist_index import get_watchlist_index
+from app.db.database import SessionLocal
+from app.db.models import FraudTransaction, WatchlistWallet
+
+LOOKUP_CHUNK_SIZE = 500  # Addresses per IN (...) lookup
+
+
+def latest_activity(db: Session, addresses: Iterable[str]) -> Dict[str, int]:
+    """
+    Highest fraud_transactions.id involving each address (either side).
+
+    Addresses without transactions are left out.
+    """
+    addresses = list(dict.fromkeys(addresses))
+    latest: Dict[str, int] = {}
+    for start in range(0, len(addresses), LOOKUP_CHUNK_SIZE):
+        chunk = addresses[start:start + LOOKUP_CHUNK_SIZE]
+        for column in (FraudTransaction.name_orig, FraudTransaction.name_dest):
+            rows = (
+                db.query(column, func.max(FraudTransaction.id))
+                .filter(column.in_(chunk))
+                .group_by(column)
+                .all()
+            )
+            for address, tx_id in rows:
+                if tx_id is not None and tx_id > latest.get(address, 0):
+                    latest[address] = int(tx_id)
+    return latest
+
+
+def _mark_is(previous: Optional[int]):
+    return WatchlistWallet.last_seen_tx_id.is_(None) if previous is None else WatchlistWallet.last_seen_tx_id == previous
+
+
+class WatchlistMonitor:
+    """Periodic re-analysis of watchlist wallets that have new transactions."""
+
+    def __init__(self, interval: float = 300.0, concurrency: int = 8, deadline_seconds: float = 10.0) -> None:
+        self.interval = interval
+        self.concurrency = concurrency
+        self.deadline_seconds = deadline_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._cycle_lock = asyncio.Lock()
+        self.cycles = 0
+        self.last_cycle: Optional[Dict[str, Any]] = None
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self._task is not None or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._loop(), name="watchlist-monitor")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_cycle()
+            except Exception as exc:
+                emit_audit_log(
+                    action="watchlist.monitor",
+                    status="error",
+                    message="Watchlist monitoring cycle failed.",
+                    details={"error": str(exc)},
+                )
+            await asyncio.sleep(self.interval)
+
+    def _claim_due(self) -> Tuple[int, List[Tuple[int, str, Optional[int], int]]]:
+        """
+        Claim the active wallets with transactions past their mark.
+
+        Wallets never analyzed (no mark) are due once even without
+        transactions.
+
+        Returns:
+            (active wallets, [(id, address, previous mark, new mark)] claimed)
+        """
+        db = SessionLocal()
+        try:
+            items = (
+                db.query(WatchlistWallet.id, WatchlistWallet.wallet_address, WatchlistWallet.last_seen_tx_id)
+                .filter(WatchlistWallet.active.is_(True))
+                .order_by(WatchlistWallet.id)
+                .all()
+            )
+            # Resync the hit detection index with changes made by other processes (Bloom-sized lists
+            # are only rebuilt at startup)
+            index = get_watchlist_index()
+            if len(items) < index.bloom_min_entries:
+                index.rebuild(address for _, address, _ in items)
+            latest = latest_activity(db, (address for _, address, _ in items))
+            claimed = []
+            for watch_id, address, previous in items:
+                mark = latest.get(address, 0)
+                if previous is not None and mark <= previous:
+                    continue
+                # Conditional so only one process takes this activity
+                taken = db.execute(
+                    update(WatchlistWallet)
+                    .where(WatchlistWallet.id == watch_id, _mark_is(previous))
+                    .values(last_seen_tx_id=mark)
+                ).rowcount
+                db.commit()
+                if taken:
+                    claimed.append((watch_id, address, previous, mark))
+            return len(items), claimed
+        finally:
+            db.close()
+
+    def _release(self, watch_id: int, previous: Optional[int], mark: int) -> None:
+        """Put a wallet's mark back after a failed analysis (unless it has moved on since)."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(WatchlistWallet)
+                .where(WatchlistWallet.id == watch_id, WatchlistWallet.last_seen_tx_id == mark)
+                .values(last_seen_tx_id=previous)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def run_cycle(self) -> Dict[str, Any]:
+        """Re-analyze the wallets with new activity once."""
+        from app.api.v1.endpoints.watchlist import sweep_watchlist
+
+        async with self._cycle_lock:
+            started = time.perf_counter()
+            active, claimed = await asyncio.to_thread(self._claim_due)
+            counts = {"ok": 0, "timeout": 0, "error": 0}
+            if claimed:
+                marks = {watch_id: (previous, mark) for watch_id, _, previous, mark in claimed}
+                sweep = sweep_watchlist(
+                    [(watch_id, address) for watch_id, address, _, _ in claimed],
+                    None,
+                    self.concurrency,
+                    self.deadline_seconds,
+                )
+                async for result in sweep:
+                    counts[result["status"]] += 1
+                    if result["status"] != "ok":
+                        await asyncio.to_thread(self._release, result["id"], *marks[result["id"]])
+
+            self.cycles += 1
+            self.last_cycle = {
+                "finished_at": datetime.utcnow().isoformat(),
+                "active": active,
+                "analyzed": len(claimed),
+                "skipped": active - len(claimed),
+                **counts,
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+            }
+            if claimed:
+                emit_audit_log(
+                    action="watchlist.monitor",
+                    status="success" if counts["ok"] == len(claimed) else "warning",
+                    message="Re-analyzed watchlist wallets with new activity.",
+                    details=self.last_cycle,
+                )
+            return self.last_cycle
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.started,
+            "interval_seconds": self.interval,
+            "cycles": self.cycles,
+            "last_cycle": self.last_cycle,
+        }
+
+
+_watchlist_monitor: Optional[WatchlistMonitor] = None
+_watchlist_monitor_lock = threading.Lock()
+
+
+def get_watchlist_monitor() -> WatchlistMonitor:
+    """Get or create the global watchlist monitor (configured from settings)."""
+    global _watchlist_monitor
+    if _watchlist_monitor is None:
+        with _watchlist_monitor_lock:
+            if _watchlist_monitor is None:
+                _watchlist_monitor = WatchlistMonitor(
+                    interval=settings.WATCHLIST_MONITOR_INTERVAL_SECONDS,
+                    concurrency=settings.WATCHLIST_SWEEP_CONCURRENCY,
+                    deadline_seconds=settings.WATCHLIST_SWEEP_WALLET_DEADLINE_SECONDS,
+                )
+    return _watchlist_monitor
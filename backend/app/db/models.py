@@ -2,7 +2,7 @@
 Database models
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -197,6 +197,33 @@ class FraudTransaction(Base):
         }
 
 
+class FraudPrediction(Base):
+    """Stored model output for a FraudTransaction, one row per model version"""
+    __tablename__ = "fraud_predictions"
+    __table_args__ = (
+        UniqueConstraint("transaction_id", "model_version", name="uq_fraud_prediction_tx_version"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(Integer, ForeignKey("fraud_transactions.id"), nullable=False, index=True)
+    model_version = Column(String, nullable=False, index=True)
+    is_fraud = Column(Integer, nullable=False)  # Predicted class
+    fraud_probability = Column(Float, nullable=False)
+    normal_probability = Column(Float, nullable=False)
+    confidence = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def to_prediction(self):
+        """Same shape as ml_training.predict_fraud prediction dicts"""
+        return {
+            "is_fraud": self.is_fraud,
+            "fraud_probability": self.fraud_probability,
+            "normal_probability": self.normal_probability,
+            "prediction": "FRAUD" if self.is_fraud == 1 else "NORMAL",
+            "confidence": self.confidence
+        }
+
+
 class Complaint(Base):
     """Complaint filed by investigators"""
     __tablename__ = "complaints"
@@ -325,6 +352,77 @@ class IncidentReport(Base):
         }
 
 
+class BackgroundJob(Base):
+    """Persistent job run by app/core/job_queue.py (queued -> running -> succeeded/failed/cancelled)"""
+    __tablename__ = "background_jobs"
+    
+    id = Column(String, primary_key=True, index=True)  # uuid4 hex
+    kind = Column(String, nullable=False, index=True)  # Handler name, e.g. "incident_analysis"
+    status = Column(String, nullable=False, default="queued", index=True)
+    payload = Column(Text, nullable=False, default="{}")  # JSON object passed to the handler
+    result = Column(Text, nullable=True)  # JSON object returned by the handler
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    worker_id = Column(String, nullable=True)  # host:pid of the worker holding the lease
+    lease_expires_at = Column(DateTime, nullable=True)  # Running jobs past this are picked up again
+    run_after = Column(DateTime, default=datetime.utcnow, index=True)  # Retry backoff
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self, include_result=True):
+        """Job status (and the handler's result once it has succeeded)"""
+        import json
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "cancel_requested": bool(self.cancel_requested),
+            "error": self.error,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if include_result:
+            try:
+                data["result"] = json.loads(self.result) if self.result else None
+            except Exception:
+                data["result"] = None
+        return data
+
+
+class WalletRisk(Base):
+    """Network risk per fraud_transactions account, propagated by ml_training/risk_propagation.py"""
+    __tablename__ = "wallet_risk"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    address = Column(String, nullable=False, unique=True, index=True)  # name_orig / name_dest
+    risk_score = Column(Float, nullable=False, default=0.0)  # 0-1, ppr_score relative to the highest
+    ppr_score = Column(Float, nullable=False, default=0.0)  # Personalized PageRank mass (sums to 1)
+    is_seed = Column(Boolean, nullable=False, default=False)  # Fraud-labelled or confirmed incident
+    degree = Column(Integer, nullable=False, default=0)  # Transactions involving the account
+    run_id = Column(String, nullable=True)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            "address": self.address,
+            "risk_score": self.risk_score,
+            "ppr_score": self.ppr_score,
+            "is_seed": bool(self.is_seed),
+            "degree": self.degree,
+            "run_id": self.run_id,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None,
+        }
+
+
 class WatchlistWallet(Base):
     """Wallets saved for ongoing monitoring / quick analysis"""
     __tablename__ = "watchlist_wallets"
@@ -336,13 +434,13 @@ class WatchlistWallet(Base):
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
-    # Monitoring status fields - TEMPORARILY COMMENTED OUT
-    # These will be added by migration, but commenting out prevents SQLAlchemy errors
-    # Uncomment after running migration or when columns exist in database
-    # last_risk_score = Column(Float, nullable=True)
-    # last_risk_level = Column(String, nullable=True)
-    # last_checked_at = Column(DateTime, nullable=True)
-    # last_report_id = Column(Integer, ForeignKey("incident_reports.id"), nullable=True)
+    # Monitoring status fields (added to existing databases by migrate_database)
+    last_risk_score = Column(Float, nullable=True)
+    last_risk_level = Column(String, nullable=True)
+    last_checked_at = Column(DateTime, nullable=True)
+    last_report_id = Column(Integer, ForeignKey("incident_reports.id"), nullable=True)
+    # High-water mark: highest fraud_transactions.id involving the wallet at its last analysis
+    last_seen_tx_id = Column(Integer, nullable=True)
     
     def to_dict(self):
         """Convert to dictionary for API response"""
@@ -353,11 +451,10 @@ class WatchlistWallet(Base):
             "active": self.active,
             "created_by": self.created_by,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-            # Return None for monitoring fields until columns are added
-            "last_risk_score": None,
-            "last_risk_level": None,
-            "last_checked_at": None,
-            "last_report_id": None,
+            "last_risk_score": self.last_risk_score,
+            "last_risk_level": self.last_risk_level,
+            "last_checked_at": self.last_checked_at.isoformat() if self.last_checked_at else None,
+            "last_report_id": self.last_report_id,
         }
 
 
@@ -11,6 +11,7 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from contextlib import asynccontextmanager
 from pathlib import Path
 from uuid import uuid4
+import asyncio
 import json
 import yaml
 
@@ -339,6 +340,60 @@ def migrate_database():
                     details={"error": str(e)},
                 )
         
+        # Create fraud_predictions table if it doesn't exist
+        if "fraud_predictions" not in inspector.get_table_names():
+            try:
+                from app.db.models import FraudPrediction
+                FraudPrediction.__table__.create(bind=engine, checkfirst=True)
+                emit_audit_log(
+                    action="migration.fraud_predictions.create_table",
+                    status="success",
+                    message="Created fraud_predictions table.",
+                )
+            except Exception as e:
+                emit_audit_log(
+                    action="migration.fraud_predictions.create_table",
+                    status="warning",
+                    message="Could not create fraud_predictions table.",
+                    details={"error": str(e)},
+                )
+        
+        # Create background_jobs table if it doesn't exist
+        if "background_jobs" not in inspector.get_table_names():
+            try:
+                from app.db.models import BackgroundJob
+                BackgroundJob.__table__.create(bind=engine, checkfirst=True)
+                emit_audit_log(
+                    action="migration.background_jobs.create_table",
+                    status="success",
+                    message="Created background_jobs table.",
+                )
+            except Exception as e:
+                emit_audit_log(
+                    action="migration.background_jobs.create_table",
+                    status="warning",
+                    message="Could not create background_jobs table.",
+                    details={"error": str(e)},
+                )
+        
+        # Create wallet_risk table if it doesn't exist
+        if "wallet_risk" not in inspector.get_table_names():
+            try:
+                from app.db.models import WalletRisk
+                WalletRisk.__table__.create(bind=engine, checkfirst=True)
+                emit_audit_log(
+                    action="migration.wallet_risk.create_table",
+                    status="success",
+                    message="Created wallet_risk table.",
+                )
+            except Exception as e:
+                emit_audit_log(
+                    action="migration.wallet_risk.create_table",
+                    status="warning",
+                    message="Could not create wallet_risk table.",
+                    details={"error": str(e)},
+                )
+        
         # Create investigator_access_requests table if it doesn't exist
         if "investigator_access_requests" not in inspector.get_table_names():
             try:
@@ -418,6 +473,39 @@ def migrate_database():
                                 details={"error": str(e)},
                             )
                             conn.rollback()
+
+        # Check if watchlist_wallets table exists and add monitoring status columns
+        if "watchlist_wallets" in inspector.get_table_names():
+            existing_watchlist_columns = [col["name"] for col in inspector.get_columns("watchlist_wallets")]
+
+            with engine.connect() as conn:
+                watchlist_columns_to_add = [
+                    ("last_risk_score", "FLOAT"),
+                    ("last_risk_level", "VARCHAR"),
+                    ("last_checked_at", "DATETIME"),
+                    ("last_report_id", "INTEGER"),
+                    ("last_seen_tx_id", "INTEGER"),
+                ]
+
+                for col_name, col_type in watchlist_columns_to_add:
+                    if col_name not in existing_watchlist_columns:
+                        try:
+                            sql_type = get_sql_type(col_type)
+                            conn.execute(text(f"ALTER TABLE watchlist_wallets ADD COLUMN {col_name} {sql_type}"))
+                            conn.commit()
+                            emit_audit_log(
+                                action="migration.watchlist_wallets.add_column",
+                                status="success",
+                                message=f"Added {col_name} column to watchlist_wallets table.",
+                            )
+                        except Exception as e:
+                            emit_audit_log(
+                                action="migration.watchlist_wallets.add_column",
+                                status="warning",
+                                message=f"Could not add {col_name} column to watchlist_wallets table.",
+                                details={"error": str(e)},
+                            )
+                            conn.rollback()
     except Exception as e:
         emit_audit_log(
             action="migration.run",
@@ -446,6 +534,58 @@ async def lifespan(app: FastAPI):
     # Initialize superadmin account
     init_superadmin()
 
+    # Start inference worker pools (process workers preload the fraud model)
+    from app.core.inference_executor import get_inference_executor
+    inference_executor = get_inference_executor()
+    inference_executor.start()
+    
+    # Catch the persisted prediction store up with transactions added since the last run
+    if settings.PREDICTION_STORE_REFRESH_ON_STARTUP:
+        try:
+            from ml_training.prediction_store import request_refresh
+            request_refresh()
+        except Exception as e:
+            emit_audit_log(
+                action="prediction_store.refresh",
+                status="warning",
+                message="Could not start fraud prediction store refresh.",
+                details={"error": str(e)},
+            )
+
+    # Load the transaction graph index in the background
+    if settings.TRANSACTION_GRAPH_LOAD_ON_STARTUP:
+        from app.core.account_clusters import get_account_clusters
+        from app.core.transaction_graph import request_load
+        get_account_clusters()  # Follows graph refreshes, so the initial load is clustered too
+        request_load()
+
+    # Build the typology signature library used by incident analysis (fixed seed, ~0.5s)
+    from synthetic_data_generator.pattern_signatures import get_signature_library
+    await asyncio.to_thread(get_signature_library)
+
+    # Start background job workers (persistent queue in background_jobs)
+    from app.core.job_queue import get_job_queue
+    job_queue = get_job_queue()
+    await job_queue.start()
+
+    # Check new transactions against the watchlist as they are inserted
+    from app.core.watchlist_index import get_watchlist_index, install_hooks
+
+    def load_watchlist_index():
+        db = SessionLocal()
+        try:
+            get_watchlist_index().load(db)
+        finally:
+            db.close()
+
+    await asyncio.to_thread(load_watchlist_index)
+    install_hooks()
+
+    # Re-analyze watchlist wallets as new transactions arrive
+    from app.core.watchlist_monitor import get_watchlist_monitor
+    watchlist_monitor = get_watchlist_monitor()
+    await watchlist_monitor.start()
+
     # Temporarily disable OpenAPI validation to allow deployment
     # TODO: Re-enable after ensuring openapi.yaml is up to date
     try:
@@ -461,6 +601,13 @@ async def lifespan(app: FastAPI):
         print("[WARNING] Continuing startup despite OpenAPI validation failure...")
     
     yield
+    
+    await watchlist_monitor.stop()
+    await job_queue.stop()
+    inference_executor.stop()
+
+    from app.core.http_client import close_http_clients
+    await close_http_clients()
 
 
 docs_url = "/api/docs" if settings.EXPOSE_API_DOCS else None
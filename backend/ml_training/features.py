@@ -0,0 +1,237 @@
+"""
+Shared feature engineering kernel for fraud detection
+Works on columnar NumPy arrays so training, batch inference and the RL
+detector all derive their inputs from the same code path
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Transaction type encoding (same order as the original training script)
+TYPE_MAPPING = {
+    "CASH_IN": 0,
+    "CASH_OUT": 1,
+    "DEBIT": 2,
+    "PAYMENT": 3,
+    "TRANSFER": 4
+}
+
+# Raw transaction fields (PaySim naming, as used by the API and training data)
+INPUT_FIELDS = [
+    "step", "type", "amount", "nameOrig", "oldbalanceOrg", "newbalanceOrig",
+    "nameDest", "oldbalanceDest", "newbalanceDest",
+]
+
+# FraudTransaction columns in INPUT_FIELDS order, for raw tuple queries
+DB_COLUMNS = [
+    "step", "type", "amount", "name_orig", "old_balance_orig", "new_balance_orig",
+    "name_dest", "old_balance_dest", "new_balance_dest",
+]
+
+FEATURE_COLUMNS = [
+    "step",
+    "type_encoded",
+    "amount",
+    "amount_log",
+    "oldbalanceOrg",
+    "newbalanceOrig",
+    "oldbalanceDest",
+    "newbalanceDest",
+    "balance_change_orig",
+    "balance_change_dest",
+    "balance_ratio_orig",
+    "balance_ratio_dest",
+    "amount_ratio_orig",
+    "orig_is_customer",
+    "dest_is_customer",
+    "dest_is_merchant",
+    "zero_balance_after",
+    "large_transaction"
+]
+
+# RL detector state layout: 15 numeric features followed by a one-hot of the type
+RL_STATE_COLUMNS = [
+    "amount",
+    "oldbalanceOrg",
+    "newbalanceOrig",
+    "oldbalanceDest",
+    "newbalanceDest",
+    "balance_change_orig",
+    "balance_change_dest",
+    "balance_orig_ratio",
+    "balance_dest_ratio",
+    "abs_balance_change_orig",
+    "abs_balance_change_dest",
+    "amount_to_orig_balance",
+    "amount_to_dest_balance",
+    "orig_balance_sum",
+    "dest_balance_sum",
+] + [f"type_{name}" for name in TYPE_MAPPING]
+
+_NUMERIC_FIELDS = ["step", "amount", "oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest"]
+
+
+def _float_column(values) -> np.ndarray:
+    """Convert a sequence to float64, mapping None to NaN"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in "fiub":
+        return values.astype(np.float64, copy=False)
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _prefix_column(values, prefix: str) -> np.ndarray:
+    """Boolean column: value is a string starting with prefix"""
+    names = np.asarray(values).astype(str)
+    return np.char.startswith(names, prefix)
+
+
+def _type_codes(values, default_type: Optional[str] = None) -> np.ndarray:
+    """Encode transaction types; unknown types become -1"""
+    types = np.asarray(values, dtype=object)
+    if default_type is not None:
+        types = np.where(types == None, default_type, types)  # noqa: E711 - elementwise None check
+    codes = np.full(len(types), -1, dtype=np.int8)
+    for name, code in TYPE_MAPPING.items():
+        codes[types == name] = code
+    return codes
+
+
+def columns_from_arrays(
+    step, type, amount, nameOrig, oldbalanceOrg, newbalanceOrig,
+    nameDest, oldbalanceDest, newbalanceDest, default_type: Optional[str] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Normalize raw per-field sequences into the columnar layout used by the kernels
+
+    Returns:
+        Dict with float64 numeric columns (None -> NaN), int8 `type_code`
+        and boolean name-prefix flags
+    """
+    columns = {
+        "step": _float_column(step),
+        "amount": _float_column(amount),
+        "oldbalanceOrg": _float_column(oldbalanceOrg),
+        "newbalanceOrig": _float_column(newbalanceOrig),
+        "oldbalanceDest": _float_column(oldbalanceDest),
+        "newbalanceDest": _float_column(newbalanceDest),
+        "type_code": _type_codes(type, default_type),
+        "orig_is_customer": _prefix_column(nameOrig, "C"),
+        "dest_is_customer": _prefix_column(nameDest, "C"),
+        "dest_is_merchant": _prefix_column(nameDest, "M"),
+    }
+    return columns
+
+
+def columns_from_records(records: Iterable[Dict], default_type: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Build columns from a list of transaction dicts (API / PaySim field names)"""
+    records = list(records)
+    fields = {name: [r.get(name) for r in records] for name in INPUT_FIELDS}
+    return columns_from_arrays(**fields, default_type=default_type)
+
+
+def columns_from_rows(rows: Sequence[Sequence]) -> Dict[str, np.ndarray]:
+    """Build columns from raw DB tuples ordered like DB_COLUMNS"""
+    if len(rows) == 0:
+        return columns_from_arrays(*([[]] * len(INPUT_FIELDS)))
+    transposed = list(zip(*rows))
+    return columns_from_arrays(*[transposed[i] for i in range(len(INPUT_FIELDS))])
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray, fallback) -> np.ndarray:
+    """numerator / denominator where denominator > 0, else fallback"""
+    out = np.array(np.broadcast_to(fallback, numerator.shape), dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def engineer_features(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Compute every model feature as a named float64 column"""
+    amount = columns["amount"]
+    old_orig = columns["oldbalanceOrg"]
+    new_orig = columns["newbalanceOrig"]
+    old_dest = columns["oldbalanceDest"]
+    new_dest = columns["newbalanceDest"]
+    type_code = columns["type_code"]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        features = {
+            "step": columns["step"],
+            # Unknown types collapse to 0, as the pandas map + fillna(0) did
+            "type_encoded": np.where(type_code < 0, 0, type_code).astype(np.float64),
+            "amount": amount,
+            "amount_log": np.log1p(amount),
+            "oldbalanceOrg": old_orig,
+            "newbalanceOrig": new_orig,
+            "oldbalanceDest": old_dest,
+            "newbalanceDest": new_dest,
+            "balance_change_orig": new_orig - old_orig,
+            "balance_change_dest": new_dest - old_dest,
+            "balance_ratio_orig": _safe_ratio(new_orig, old_orig, 0.0),
+            "balance_ratio_dest": _safe_ratio(new_dest, old_dest, 0.0),
+            "amount_ratio_orig": _safe_ratio(amount, old_orig, amount),
+            "orig_is_customer": columns["orig_is_customer"].astype(np.float64),
+            "dest_is_customer": columns["dest_is_customer"].astype(np.float64),
+            "dest_is_merchant": columns["dest_is_merchant"].astype(np.float64),
+            "zero_balance_after": (new_orig == 0).astype(np.float64),
+            "large_transaction": (amount > old_orig * 0.9).astype(np.float64),
+        }
+    return features
+
+
+def build_feature_matrix(columns: Dict[str, np.ndarray], feature_columns: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Build the model input matrix
+
+    Returns:
+        C-contiguous float32 array of shape (n, len(feature_columns)) with
+        missing values filled with 0
+    """
+    feature_columns = feature_columns or FEATURE_COLUMNS
+    features = engineer_features(columns)
+    n = len(columns["amount"])
+    X = np.empty((n, len(feature_columns)), dtype=np.float32)
+    for j, name in enumerate(feature_columns):
+        X[:, j] = features[name]
+    X[np.isnan(X)] = 0
+    return X
+
+
+def rl_state_matrix(columns: Dict[str, np.ndarray], state_size: Optional[int] = None) -> np.ndarray:
+    """
+    Build RL detector state vectors (see RL_STATE_COLUMNS)
+
+    Dest-side features are zeroed when the destination had no prior balance,
+    and non-finite values are mapped to 0.
+    """
+    amount = np.nan_to_num(columns["amount"])
+    old_orig = np.nan_to_num(columns["oldbalanceOrg"])
+    new_orig = np.nan_to_num(columns["newbalanceOrig"])
+    old_dest = np.nan_to_num(columns["oldbalanceDest"])
+    new_dest = np.nan_to_num(columns["newbalanceDest"])
+    has_dest = old_dest != 0
+
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        change_orig = new_orig - old_orig
+        change_dest = np.where(has_dest, new_dest - old_dest, 0.0)
+        state = np.column_stack([
+            amount,
+            old_orig,
+            new_orig,
+            old_dest,
+            new_dest,
+            change_orig,
+            change_dest,
+            change_orig / (old_orig + 1e-6),
+            np.where(has_dest, change_dest / (old_dest + 1e-6), 0.0),
+            np.abs(change_orig),
+            np.abs(change_dest),
+            amount / (old_orig + 1e-6),
+            np.where(has_dest, amount / (old_dest + 1e-6), 0.0),
+            old_orig + new_orig,
+            old_dest + new_dest,
+        ] + [(columns["type_code"] == code).astype(np.float64) for code in TYPE_MAPPING.values()])
+
+    state = np.nan_to_num(state, nan=0.0, posinf=0.0, neginf=0.0)
+    if state_size is not None:
+        state = state[:, :state_size]
+    return np.ascontiguousarray(state)
@@ -0,0 +1,147 @@
+"""
+Process-wide registry for the trained fraud model
+Loads fraud_model_latest.pkl once, shares it across requests and
+swaps it atomically when a newer artifact lands on disk
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ml_training.features import FEATURE_COLUMNS
+
+DEFAULT_MODEL_PATH = "backend/ml_models/fraud_model_latest.pkl"
+
+# Default feature columns (should match training)
+DEFAULT_FEATURE_COLUMNS = list(FEATURE_COLUMNS)
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """Immutable snapshot of a loaded model artifact"""
+    model: Any
+    metadata: Optional[Dict]
+    version: str
+    feature_columns: List[str]
+    model_path: str
+    file_mtime: float
+    file_size: int
+    loaded_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+
+class ModelRegistry:
+    """
+    Keeps the fraud model resident in memory
+
+    Readers get the current LoadedModel without locking. The artifact file is
+    re-checked at most every `check_interval` seconds; when its mtime or size
+    changes the new model is loaded off to the side and swapped in with a
+    single reference assignment, so in-flight predictions keep using the old one.
+    """
+
+    def __init__(self, model_path: Optional[str] = None, check_interval: float = 5.0):
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        self.check_interval = check_interval
+        self._current: Optional[LoadedModel] = None
+        self._last_check = 0.0
+        self._load_lock = threading.Lock()
+        self.reload_count = 0
+
+    def _artifact_signature(self):
+        stat = os.stat(self.model_path)
+        return stat.st_mtime, stat.st_size
+
+    def _load(self) -> LoadedModel:
+        # Imported lazily to avoid a circular import with predict_fraud
+        from ml_training.predict_fraud import load_model
+
+        mtime, size = self._artifact_signature()
+        model, metadata = load_model(self.model_path)
+        feature_columns = (metadata or {}).get("feature_columns") or DEFAULT_FEATURE_COLUMNS
+
+        # Models fitted on a DataFrame remember its column names and warn on every
+        # ndarray predict. Check the order once here, then serve plain float32 matrices.
+        fitted_names = getattr(model, "feature_names_in_", None)
+        if fitted_names is not None:
+            if list(fitted_names) != list(feature_columns):
+                raise ValueError("Model feature names do not match metadata feature_columns")
+            del model.feature_names_in_
+
+        version = (metadata or {}).get("timestamp") or datetime.fromtimestamp(mtime).strftime("%Y%m%d_%H%M%S")
+        return LoadedModel(
+            model=model,
+            metadata=metadata,
+            version=str(version),
+            feature_columns=list(feature_columns),
+            model_path=self.model_path,
+            file_mtime=mtime,
+            file_size=size,
+        )
+
+    def get(self) -> LoadedModel:
+        """
+        Return the resident model, loading or swapping it if needed
+
+        Raises:
+            FileNotFoundError: if no model has been trained yet
+        """
+        current = self._current
+        now = time.monotonic()
+        if current is not None and now - self._last_check < self.check_interval:
+            return current
+        return self._refresh(now)
+
+    def _refresh(self, now: float) -> LoadedModel:
+        with self._load_lock:
+            current = self._current
+            if current is not None and now - self._last_check < self.check_interval:
+                return current
+
+            if not os.path.exists(self.model_path):
+                if current is not None:
+                    # Artifact temporarily missing (e.g. mid-deploy): keep serving the resident model
+                    self._last_check = now
+                    return current
+                raise FileNotFoundError(f"Model not found: {self.model_path}. Please train the model first.")
+
+            if current is None or self._artifact_signature() != (current.file_mtime, current.file_size):
+                try:
+                    self._current = self._load()
+                    self.reload_count += 1
+                except Exception as e:
+                    if current is None:
+                        raise
+                    print(f"Warning: Could not reload fraud model, keeping version {current.version}: {e}")
+            self._last_check = now
+            return self._current
+
+    def reload(self) -> LoadedModel:
+        """Force the artifact to be re-checked on the next access and return it"""
+        self._last_check = 0.0
+        return self._refresh(time.monotonic())
+
+    def is_available(self) -> bool:
+        """True if a model is loaded or can be loaded"""
+        try:
+            self.get()
+            return True
+        except Exception:
+            return False
+
+
+# Global model registry instance
+_model_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get or create global model registry instance"""
+    global _model_registry
+    if _model_registry is None:
+        with _registry_lock:
+            if _model_registry is None:
+                _model_registry = ModelRegistry()
+    return _model_registry
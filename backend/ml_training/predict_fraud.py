@@ -11,22 +11,32 @@ if sys.platform == "win32":
     sys.stdout = codecs.getwriter("utf-8")(sys.stdout.buffer, "strict")
     sys.stderr = codecs.getwriter("utf-8")(sys.stderr.buffer, "strict")
 
-import pandas as pd
 import numpy as np
 import joblib
 import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import func
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.db.database import SessionLocal
 from app.db.models import FraudTransaction
+from ml_training.model_registry import DEFAULT_MODEL_PATH, get_model_registry
+from ml_training.features import DB_COLUMNS, build_feature_matrix, columns_from_arrays, columns_from_records
+
+DEFAULT_STREAM_CHUNK_SIZE = 10000
+DEFAULT_STREAM_OUTPUT = "backend/ml_models/predictions_stream.csv"
+STREAM_OUTPUT_HEADER = "transaction_id,actual_is_fraud,predicted_is_fraud,fraud_probability\n"
 
 
 def load_model(model_path=None):
     """Load the latest trained model"""
     if model_path is None:
-        model_path = "backend/ml_models/fraud_model_latest.pkl"
+        model_path = DEFAULT_MODEL_PATH
     
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model not found: {model_path}. Please train the model first.")
@@ -46,67 +56,123 @@ def load_model(model_path=None):
 
 def prepare_features(tx_data, feature_columns):
     """Prepare features for a single transaction"""
-    df = pd.DataFrame([tx_data])
-    
-    # Feature engineering (same as training)
-    type_mapping = {
-        "CASH_IN": 0,
-        "CASH_OUT": 1,
-        "DEBIT": 2,
-        "PAYMENT": 3,
-        "TRANSFER": 4
+    return prepare_features_batch([tx_data], feature_columns)
+
+
+def prepare_features_batch(transactions, feature_columns):
+    """Prepare one float32 feature matrix for a list of transactions"""
+    return build_feature_matrix(columns_from_records(transactions), feature_columns)
+
+
+def tx_to_data(tx):
+    """Convert a FraudTransaction row into the model's input dict"""
+    return {
+        "step": tx.step,
+        "type": tx.type,
+        "amount": tx.amount,
+        "nameOrig": tx.name_orig,
+        "oldbalanceOrg": tx.old_balance_orig,
+        "newbalanceOrig": tx.new_balance_orig,
+        "nameDest": tx.name_dest,
+        "oldbalanceDest": tx.old_balance_dest or 0,
+        "newbalanceDest": tx.new_balance_dest or 0,
     }
-    df["type_encoded"] = df["type"].map(type_mapping)
+
+
+def _build_prediction(probability, classes):
+    """Shape one predict_proba row into the prediction dict returned by the API"""
+    # The argmax of predict_proba is exactly what model.predict returns
+    prediction = classes[int(np.argmax(probability))]
+    return {
+        "is_fraud": int(prediction),
+        "fraud_probability": float(probability[1]),
+        "normal_probability": float(probability[0]),
+        "prediction": "FRAUD" if prediction == 1 else "NORMAL",
+        "confidence": float(max(probability))
+    }
+
+
+def score_transactions(transactions, loaded=None):
+    """
+    Score a list of transaction dicts with one predict_proba call
     
-    df["balance_change_orig"] = df["newbalanceOrig"] - df["oldbalanceOrg"]
-    df["balance_change_dest"] = df["newbalanceDest"] - df["oldbalanceDest"]
+    Returns:
+        List of prediction dicts in input order
+    """
+    transactions = list(transactions)
+    if not transactions:
+        return []
+    if loaded is None:
+        loaded = get_model_registry().get()
     
-    df["balance_ratio_orig"] = np.where(
-        df["oldbalanceOrg"] > 0,
-        df["newbalanceOrig"] / df["oldbalanceOrg"],
-        0
-    )
-    df["balance_ratio_dest"] = np.where(
-        df["oldbalanceDest"] > 0,
-        df["newbalanceDest"] / df["oldbalanceDest"],
-        0
-    )
+    X = prepare_features_batch(transactions, loaded.feature_columns)
+    probabilities = loaded.model.predict_proba(X)
+    classes = loaded.model.classes_
+    return [_build_prediction(row, classes) for row in probabilities]
+
+
+def predict_batch(transaction_ids=None, transactions=None, db=None):
+    """
+    Predict fraud for many transactions in one vectorized pass
+    
+    Args:
+        transaction_ids: FraudTransaction IDs to load and score
+        transactions: Raw transaction dicts to score (not saved to DB)
+        db: Optional session to reuse; a new one is opened otherwise
+    
+    Returns:
+        Dict with model_version, predictions (input order) and missing_ids
+    """
+    if transaction_ids is None and transactions is None:
+        raise ValueError("Either transaction_ids or transactions must be provided")
+    
+    loaded = get_model_registry().get()
+    
+    if transactions is not None:
+        predictions = score_transactions(transactions, loaded)
+        return {
+            "model_version": loaded.version,
+            "predictions": predictions,
+            "missing_ids": [],
+        }
     
-    df["amount_ratio_orig"] = np.where(
-        df["oldbalanceOrg"] > 0,
-        df["amount"] / df["oldbalanceOrg"],
-        df["amount"]
-    )
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+    try:
+        wanted = list(dict.fromkeys(transaction_ids))
+        rows = {}
+        # Chunk the IN clause to stay under SQLite's bound-parameter limit
+        for start in range(0, len(wanted), 900):
+            chunk = wanted[start:start + 900]
+            for tx in db.query(FraudTransaction).filter(FraudTransaction.id.in_(chunk)).all():
+                rows[tx.id] = tx
+    finally:
+        if owns_session:
+            db.close()
     
-    df["amount_log"] = np.log1p(df["amount"])
-    df["orig_is_customer"] = df["nameOrig"].str.startswith("C").astype(int)
-    df["dest_is_customer"] = df["nameDest"].str.startswith("C").astype(int)
-    df["dest_is_merchant"] = df["nameDest"].str.startswith("M").astype(int)
-    df["zero_balance_after"] = (df["newbalanceOrig"] == 0).astype(int)
-    df["large_transaction"] = (df["amount"] > df["oldbalanceOrg"] * 0.9).astype(int)
+    found = [rows[tx_id] for tx_id in wanted if tx_id in rows]
+    scored = score_transactions([tx_to_data(tx) for tx in found], loaded)
     
-    # Select features
-    X = df[feature_columns].fillna(0)
+    predictions = []
+    for tx, prediction in zip(found, scored):
+        predictions.append({
+            "transaction_id": tx.id,
+            "actual_is_fraud": tx.is_fraud,
+            "prediction": prediction,
+            "match": tx.is_fraud == prediction["is_fraud"]
+        })
     
-    return X
+    return {
+        "model_version": loaded.version,
+        "predictions": predictions,
+        "missing_ids": [tx_id for tx_id in wanted if tx_id not in rows],
+    }
 
 
 def predict_transaction(transaction_id=None, transaction_data=None):
-    """Predict fraud for a transaction"""
-    model, metadata = load_model()
-    
-    if metadata:
-        feature_columns = metadata["feature_columns"]
-    else:
-        # Default feature columns (should match training)
-        feature_columns = [
-            "step", "type_encoded", "amount", "amount_log",
-            "oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest",
-            "balance_change_orig", "balance_change_dest",
-            "balance_ratio_orig", "balance_ratio_dest", "amount_ratio_orig",
-            "orig_is_customer", "dest_is_customer", "dest_is_merchant",
-            "zero_balance_after", "large_transaction"
-        ]
+    """Predict fraud for a transaction using the resident model"""
+    loaded = get_model_registry().get()
     
     # Get transaction data
     if transaction_id:
@@ -116,17 +182,7 @@ def predict_transaction(transaction_id=None, transaction_data=None):
             if not tx:
                 raise ValueError(f"Transaction {transaction_id} not found")
             
-            tx_data = {
-                "step": tx.step,
-                "type": tx.type,
-                "amount": tx.amount,
-                "nameOrig": tx.name_orig,
-                "oldbalanceOrg": tx.old_balance_orig,
-                "newbalanceOrig": tx.new_balance_orig,
-                "nameDest": tx.name_dest,
-                "oldbalanceDest": tx.old_balance_dest or 0,
-                "newbalanceDest": tx.new_balance_dest or 0,
-            }
+            tx_data = tx_to_data(tx)
         finally:
             db.close()
     elif transaction_data:
@@ -134,65 +190,208 @@ def predict_transaction(transaction_id=None, transaction_data=None):
     else:
         raise ValueError("Either transaction_id or transaction_data must be provided")
     
-    # Prepare features
-    X = prepare_features(tx_data, feature_columns)
+    return score_transactions([tx_data], loaded)[0]
+
+
+def _stream_columns():
+    """Raw columns for streaming: id, is_fraud, then DB_COLUMNS"""
+    columns = []
+    for name in DB_COLUMNS:
+        column = getattr(FraudTransaction, name)
+        if name in ("old_balance_dest", "new_balance_dest"):
+            # Same as tx_to_data: missing destination balances count as 0
+            column = func.coalesce(column, 0)
+        columns.append(column)
+    return [FraudTransaction.id, FraudTransaction.is_fraud] + columns
+
+
+def iter_transaction_chunks(db, chunk_size=DEFAULT_STREAM_CHUNK_SIZE, after_id=0, limit=None):
+    """
+    Yield FraudTransaction rows as raw tuples, keyset-paginated by id
     
-    # Predict
-    prediction = model.predict(X)[0]
-    probability = model.predict_proba(X)[0]
+    Each chunk is a list of (id, is_fraud, *DB_COLUMNS) tuples. Only one chunk
+    is fetched at a time, so memory does not grow with the table.
+    """
+    columns = _stream_columns()
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        rows = (
+            db.query(*columns)
+            .filter(FraudTransaction.id > after_id)
+            .order_by(FraudTransaction.id)
+            .limit(size)
+            .all()
+        )
+        if not rows:
+            break
+        yield rows
+        after_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def score_rows(rows, loaded):
+    """
+    Score a chunk from iter_transaction_chunks with one predict_proba call
     
-    return {
-        "is_fraud": int(prediction),
-        "fraud_probability": float(probability[1]),
-        "normal_probability": float(probability[0]),
-        "prediction": "FRAUD" if prediction == 1 else "NORMAL",
-        "confidence": float(max(probability))
-    }
+    Returns:
+        Tuple of (ids, actual_is_fraud, predicted_is_fraud, probabilities) where
+        probabilities has the [normal, fraud] columns of predict_proba
+    """
+    transposed = list(zip(*rows))
+    X = build_feature_matrix(columns_from_arrays(*transposed[2:]), loaded.feature_columns)
+    probabilities = loaded.model.predict_proba(X)
+    predicted = loaded.model.classes_[np.argmax(probabilities, axis=1)].astype(int)
+    return transposed[0], transposed[1], predicted, probabilities
 
 
-def predict_all_transactions(limit=None):
+def predict_all_transactions(limit=None, chunk_size=DEFAULT_STREAM_CHUNK_SIZE):
     """Predict fraud for all transactions in database"""
+    loaded = get_model_registry().get()
     db = SessionLocal()
     try:
-        query = db.query(FraudTransaction)
-        if limit:
-            query = query.limit(limit)
-        transactions = query.all()
-        
-        model, metadata = load_model()
-        feature_columns = metadata["feature_columns"] if metadata else None
-        
         results = []
-        for tx in transactions:
-            try:
-                prediction = predict_transaction(transaction_data={
-                    "step": tx.step,
-                    "type": tx.type,
-                    "amount": tx.amount,
-                    "nameOrig": tx.name_orig,
-                    "oldbalanceOrg": tx.old_balance_orig,
-                    "newbalanceOrig": tx.new_balance_orig,
-                    "nameDest": tx.name_dest,
-                    "oldbalanceDest": tx.old_balance_dest or 0,
-                    "newbalanceDest": tx.new_balance_dest or 0,
-                })
-                
+        for rows in iter_transaction_chunks(db, chunk_size, limit=limit):
+            ids, actual, predicted, probabilities = score_rows(rows, loaded)
+            for tx_id, is_fraud, pred, prob in zip(ids, actual, predicted.tolist(), probabilities[:, 1].tolist()):
                 results.append({
-                    "transaction_id": tx.id,
-                    "actual_is_fraud": tx.is_fraud,
-                    "predicted_is_fraud": prediction["is_fraud"],
-                    "fraud_probability": prediction["fraud_probability"],
-                    "correct": tx.is_fraud == prediction["is_fraud"]
+                    "transaction_id": tx_id,
+                    "actual_is_fraud": is_fraud,
+                    "predicted_is_fraud": pred,
+                    "fraud_probability": prob,
+                    "correct": is_fraud == pred
                 })
-            except Exception as e:
-                print(f"Error predicting transaction {tx.id}: {e}")
-                continue
         
         return results
     finally:
         db.close()
 
 
+def _read_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Warning: Ignoring unreadable checkpoint {checkpoint_path}: {e}")
+        return None
+
+
+def _write_checkpoint(checkpoint_path, state):
+    """Write the checkpoint next to the old one, then swap it in"""
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+
+def stream_predictions(
+    output_path=DEFAULT_STREAM_OUTPUT,
+    checkpoint_path=None,
+    chunk_size=DEFAULT_STREAM_CHUNK_SIZE,
+    workers=1,
+    limit=None,
+    reset=False,
+):
+    """
+    Score the whole transaction table in constant memory
+    
+    Rows are read in keyset-paginated chunks, scored by a pool of `workers`
+    threads and appended to `output_path` as CSV in id order. After every
+    chunk the output is flushed and a checkpoint (last id, byte offset,
+    running counts) is written, so a rerun picks up where it stopped.
+    
+    Args:
+        output_path: CSV file to write predictions to
+        checkpoint_path: Checkpoint file (defaults to <output_path>.checkpoint.json)
+        chunk_size: Rows per chunk
+        workers: Number of scoring threads
+        limit: Maximum rows to score in total, counting resumed progress
+        reset: Ignore any existing checkpoint and start over
+    
+    Returns:
+        Final checkpoint state
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint.json"
+    loaded = get_model_registry().get()
+    
+    state = None if reset else _read_checkpoint(checkpoint_path)
+    if state is not None and (state.get("model_version") != loaded.version or not os.path.exists(output_path)):
+        print(f"⚠️  Checkpoint does not match model {loaded.version} or output file, starting over")
+        state = None
+    if state is None:
+        state = {
+            "model_version": loaded.version,
+            "output_path": output_path,
+            "last_id": 0,
+            "rows_scored": 0,
+            "correct": 0,
+            "predicted_fraud": 0,
+            "output_offset": 0,
+        }
+    state["completed"] = False
+    
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    remaining = None if limit is None else max(limit - state["rows_scored"], 0)
+    
+    mode = "r+b" if state["output_offset"] else "wb"
+    with open(output_path, mode) as out:
+        # Drop anything written after the last checkpoint (e.g. a chunk cut short by a crash)
+        out.seek(state["output_offset"])
+        out.truncate()
+        if state["output_offset"] == 0:
+            out.write(STREAM_OUTPUT_HEADER.encode("utf-8"))
+        
+        def write_chunk(result):
+            ids, actual, predicted, probabilities = result
+            lines = []
+            correct = 0
+            for tx_id, is_fraud, pred, prob in zip(ids, actual, predicted.tolist(), probabilities[:, 1].tolist()):
+                lines.append(f"{tx_id},{'' if is_fraud is None else is_fraud},{pred},{prob:.6f}\n")
+                correct += is_fraud == pred
+            out.write("".join(lines).encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+            
+            state["last_id"] = ids[-1]
+            state["rows_scored"] += len(ids)
+            state["correct"] += int(correct)
+            state["predicted_fraud"] += int(predicted.sum())
+            state["output_offset"] = out.tell()
+            state["updated_at"] = datetime.utcnow().isoformat()
+            _write_checkpoint(checkpoint_path, state)
+        
+        db = SessionLocal()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # Bounded, ordered pipeline: at most 2 chunks per worker in flight
+                pending = deque()
+                for rows in iter_transaction_chunks(db, chunk_size, after_id=state["last_id"], limit=remaining):
+                    pending.append(pool.submit(score_rows, rows, loaded))
+                    if len(pending) >= workers * 2:
+                        write_chunk(pending.popleft().result())
+                while pending:
+                    write_chunk(pending.popleft().result())
+        finally:
+            db.close()
+    
+    state["completed"] = True
+    state["updated_at"] = datetime.utcnow().isoformat()
+    _write_checkpoint(checkpoint_path, state)
+    return state
+
+
 if __name__ == "__main__":
     import argparse
     
@@ -200,6 +399,12 @@ if __name__ == "__main__":
     parser.add_argument("--transaction-id", type=int, help="Predict specific transaction by ID")
     parser.add_argument("--all", action="store_true", help="Predict all transactions")
     parser.add_argument("--limit", type=int, help="Limit number of transactions to predict")
+    parser.add_argument("--stream", action="store_true", help="Score the whole table in chunks to a CSV file, resuming from the checkpoint")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_STREAM_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Scoring threads for --stream")
+    parser.add_argument("--output", default=DEFAULT_STREAM_OUTPUT, help="CSV output for --stream")
+    parser.add_argument("--checkpoint", help="Checkpoint file for --stream (default: <output>.checkpoint.json)")
+    parser.add_argument("--reset-checkpoint", action="store_true", help="Ignore the existing checkpoint and start over")
     
     args = parser.parse_args()
     
@@ -211,9 +416,28 @@ if __name__ == "__main__":
         print(f"   Normal Probability: {result['normal_probability']:.2%}")
         print(f"   Confidence: {result['confidence']:.2%}")
     
+    elif args.stream:
+        print(f"🔍 Streaming predictions to {args.output} (chunk size {args.chunk_size}, {args.workers} worker(s))...")
+        state = stream_predictions(
+            output_path=args.output,
+            checkpoint_path=args.checkpoint,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            limit=args.limit,
+            reset=args.reset_checkpoint,
+        )
+        total = state["rows_scored"]
+        accuracy = state["correct"] / total if total > 0 else 0
+        
+        print(f"\n📊 Prediction Results (model {state['model_version']}):")
+        print(f"   Total: {total}")
+        print(f"   Predicted Fraud: {state['predicted_fraud']}")
+        print(f"   Accuracy: {accuracy:.2%}")
+        print(f"   Last Transaction ID: {state['last_id']}")
+    
     elif args.all:
         print("🔍 Predicting fraud for all transactions...")
-        results = predict_all_transactions(limit=args.limit)
+        results = predict_all_transactions(limit=args.limit, chunk_size=args.chunk_size)
         
         correct = sum(1 for r in results if r["correct"])
         total = len(results)
@@ -230,4 +454,4 @@ if __name__ == "__main__":
             status = "✅" if r["correct"] else "❌"
             print(f"   {status} TX {r['transaction_id']}: Actual={r['actual_is_fraud']}, Predicted={r['predicted_is_fraud']}, Prob={r['fraud_probability']:.2%}")
     else:
-        print("Please specify --transaction-id or --all")
+        print("Please specify --transaction-id, --all or --stream")
@@ -0,0 +1,211 @@
+"""
+Persisted fraud predictions
+Each FraudTransaction is scored once per model version and the result kept
+in the fraud_predictions table. A watermark (the highest transaction id
+stored for the version) marks how far the incremental scorer has got, so
+only rows added since then cost CPU.
+"""
+
+import sys
+import os
+import threading
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import SessionLocal
+from app.db.models import FraudTransaction, FraudPrediction
+from ml_training.model_registry import get_model_registry
+from ml_training.predict_fraud import (
+    DEFAULT_STREAM_CHUNK_SIZE,
+    iter_transaction_chunks,
+    score_rows,
+    score_transactions,
+    tx_to_data,
+)
+
+# Only one incremental scorer runs per process
+_refresh_lock = threading.Lock()
+
+
+def get_watermark(db, model_version):
+    """Highest transaction id stored for model_version (0 if none)"""
+    watermark = db.query(func.max(FraudPrediction.transaction_id)).filter(
+        FraudPrediction.model_version == model_version
+    ).scalar()
+    return watermark or 0
+
+
+def count_stored(db, model_version):
+    """Number of stored predictions for model_version"""
+    return db.query(func.count(FraudPrediction.id)).filter(
+        FraudPrediction.model_version == model_version
+    ).scalar() or 0
+
+
+def join_predictions(query, model_version):
+    """
+    Outer-join stored predictions onto a FraudTransaction query
+
+    Apply before limit(); the query then yields (FraudTransaction, FraudPrediction or None).
+    """
+    return query.add_entity(FraudPrediction).outerjoin(
+        FraudPrediction,
+        and_(
+            FraudPrediction.transaction_id == FraudTransaction.id,
+            FraudPrediction.model_version == model_version
+        )
+    )
+
+
+def resolve_predictions(rows, loaded=None, scored=None):
+    """
+    Turn (transaction, stored prediction) pairs into prediction dicts
+
+    Rows without a stored prediction (newer than the watermark) are scored in
+    one vectorized call, unless `scored` already holds their predictions in
+    order, and a background refresh is requested so the next read finds
+    them in the table.
+    """
+    missing = [tx for tx, stored in rows if stored is None]
+    if missing:
+        if scored is None:
+            if loaded is None:
+                loaded = get_model_registry().get()
+            scored = score_transactions([tx_to_data(tx) for tx in missing], loaded)
+        request_refresh()
+    scored = iter(scored or [])
+    return [stored.to_prediction() if stored is not None else next(scored) for tx, stored in rows]
+
+
+async def resolve_predictions_offloaded(rows):
+    """resolve_predictions with the missing rows scored in the inference executor"""
+    from app.core.inference_executor import get_inference_executor
+
+    missing = [tx_to_data(tx) for tx, stored in rows if stored is None]
+    scored = await get_inference_executor().run_cpu(score_transactions, missing) if missing else []
+    return resolve_predictions(rows, scored=scored)
+
+
+def _insert_predictions(db, mappings, model_version):
+    """Bulk insert prediction rows, skipping any another writer stored first"""
+    try:
+        db.bulk_insert_mappings(FraudPrediction, mappings)
+        db.commit()
+        return len(mappings)
+    except IntegrityError:
+        db.rollback()
+
+    ids = [m["transaction_id"] for m in mappings]
+    existing = set()
+    # Chunk the IN clause to stay under SQLite's bound-parameter limit
+    for start in range(0, len(ids), 900):
+        chunk = ids[start:start + 900]
+        existing.update(
+            tx_id for (tx_id,) in db.query(FraudPrediction.transaction_id).filter(
+                FraudPrediction.model_version == model_version,
+                FraudPrediction.transaction_id.in_(chunk)
+            )
+        )
+    remaining = [m for m in mappings if m["transaction_id"] not in existing]
+    if not remaining:
+        return 0
+    db.bulk_insert_mappings(FraudPrediction, remaining)
+    db.commit()
+    return len(remaining)
+
+
+def score_new_transactions(db=None, chunk_size=DEFAULT_STREAM_CHUNK_SIZE, limit=None):
+    """
+    Score and store every FraudTransaction above the watermark
+
+    Args:
+        db: Optional session to reuse; a new one is opened otherwise
+        chunk_size: Rows per scoring chunk
+        limit: Maximum rows to score in this call
+
+    Returns:
+        Dict with model_version, scored (rows inserted) and watermark
+    """
+    loaded = get_model_registry().get()
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+    try:
+        with _refresh_lock:
+            watermark = get_watermark(db, loaded.version)
+            scored = 0
+            for rows in iter_transaction_chunks(db, chunk_size, after_id=watermark, limit=limit):
+                ids, _, predicted, probabilities = score_rows(rows, loaded)
+                mappings = []
+                for tx_id, pred, probability in zip(ids, predicted.tolist(), probabilities.tolist()):
+                    mappings.append({
+                        "transaction_id": tx_id,
+                        "model_version": loaded.version,
+                        "is_fraud": pred,
+                        "fraud_probability": probability[1],
+                        "normal_probability": probability[0],
+                        "confidence": max(probability),
+                    })
+                scored += _insert_predictions(db, mappings, loaded.version)
+                watermark = ids[-1]
+        return {
+            "model_version": loaded.version,
+            "scored": scored,
+            "watermark": watermark,
+        }
+    finally:
+        if owns_session:
+            db.close()
+
+
+def request_refresh():
+    """Start score_new_transactions in a background thread unless one is already running"""
+    if _refresh_lock.locked():
+        return False
+
+    def run():
+        try:
+            result = score_new_transactions()
+            if result["scored"]:
+                print(f"✅ Stored {result['scored']} fraud predictions (model {result['model_version']}, watermark {result['watermark']})")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: Fraud prediction store refresh failed: {e}")
+
+    threading.Thread(target=run, name="fraud-prediction-store", daemon=True).start()
+    return True
+
+
+def get_store_status(db):
+    """Watermark and row counts for the resident model version"""
+    loaded = get_model_registry().get()
+    watermark = get_watermark(db, loaded.version)
+    latest_id = db.query(func.max(FraudTransaction.id)).scalar() or 0
+    return {
+        "model_version": loaded.version,
+        "watermark": watermark,
+        "stored": count_stored(db, loaded.version),
+        "pending": db.query(func.count(FraudTransaction.id)).filter(FraudTransaction.id > watermark).scalar() or 0,
+        "latest_transaction_id": latest_id,
+        "refresh_running": _refresh_lock.locked(),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Store fraud predictions for transactions above the watermark")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_STREAM_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--limit", type=int, help="Maximum rows to score")
+
+    args = parser.parse_args()
+
+    print("🔍 Scoring new transactions...")
+    result = score_new_transactions(chunk_size=args.chunk_size, limit=args.limit)
+    print(f"\n📊 Stored {result['scored']} predictions for model {result['model_version']}")
+    print(f"   Watermark: {result['watermark']}")
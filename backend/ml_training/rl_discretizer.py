@@ -0,0 +1,94 @@
+"""
+State discretizer for the RL fraud detector
+Maps continuous RL state vectors to integer states in a fixed-size space,
+so the Q-table can be a plain NumPy array
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_N_STATES = 65536
+
+# Default bin edges, applied to sign(x) * log1p(|x|) of every feature.
+# Amounts and balances (~20 .. 1e7) spread over 3..16, ratios and signed
+# changes fall on either side of 0, and the 0.35 edge splits one-hot flags.
+DEFAULT_EDGES = [-12.0, -9.0, -6.0, -3.0, -0.5, 0.35, 2.0, 4.0, 6.0, 8.0, 10.0, 12.0, 14.0]
+
+# Fixed per-feature odd multipliers for combining bin indices into one hash
+_HASH_SEED = 0x5EED
+
+
+def _feature_multipliers(state_size: int) -> np.ndarray:
+    rng = np.random.default_rng(_HASH_SEED)
+    return rng.integers(1, 2 ** 63, size=state_size, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def _signed_log(states: np.ndarray) -> np.ndarray:
+    return np.sign(states) * np.log1p(np.abs(states))
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, vectorized over uint64"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+class StateDiscretizer:
+    """
+    Per-feature bins hashed into `n_states` integer states
+
+    Bins start as DEFAULT_EDGES for every feature; `fit` replaces them with
+    per-feature quantiles once, from a sample of real states. Changing the
+    bins re-maps every state, so it should only happen on an empty Q-table.
+    """
+
+    def __init__(self, state_size: int, n_states: int = DEFAULT_N_STATES,
+                 edges: Optional[List[List[float]]] = None):
+        self.state_size = state_size
+        self.n_states = n_states
+        self.fitted = edges is not None
+        self._multipliers = _feature_multipliers(state_size)
+        self.set_edges(edges if edges is not None else [DEFAULT_EDGES] * state_size)
+
+    def set_edges(self, edges: List) -> None:
+        """Store per-feature edges, padded with +inf into one (state_size, k) matrix"""
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        width = max(len(e) for e in self.edges)
+        self._edge_matrix = np.full((self.state_size, width), np.inf)
+        for j, e in enumerate(self.edges):
+            self._edge_matrix[j, :len(e)] = e
+
+    def fit(self, states: np.ndarray, n_bins: int = 16) -> "StateDiscretizer":
+        """Set each feature's edges to the quantiles of `states`"""
+        transformed = _signed_log(np.asarray(states, dtype=np.float64))
+        quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+        self.set_edges([np.unique(np.quantile(transformed[:, j], quantiles)) for j in range(self.state_size)])
+        self.fitted = True
+        return self
+
+    def bins(self, states: np.ndarray) -> np.ndarray:
+        """Bin index per feature, shape (n, state_size)"""
+        transformed = _signed_log(np.atleast_2d(np.asarray(states, dtype=np.float64)))
+        # Number of edges <= value (same as searchsorted side="right"); +inf padding never counts
+        return (self._edge_matrix <= transformed[:, :, None]).sum(axis=2, dtype=np.uint64)
+
+    def transform(self, states: np.ndarray) -> np.ndarray:
+        """Integer state index per row, in [0, n_states)"""
+        bins = self.bins(states)
+        with np.errstate(over="ignore"):
+            # uint64 arithmetic wraps, which is what the hash wants
+            h = _mix64((bins + np.uint64(1)) @ self._multipliers)
+        return (h % np.uint64(self.n_states)).astype(np.int64)
+
+    def to_dict(self) -> Dict:
+        return {
+            "state_size": self.state_size,
+            "n_states": self.n_states,
+            "edges": [e.tolist() for e in self.edges] if self.fitted else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "StateDiscretizer":
+        return cls(data["state_size"], data.get("n_states", DEFAULT_N_STATES), data.get("edges"))
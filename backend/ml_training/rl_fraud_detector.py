@@ -6,17 +6,53 @@ Uses Q-Learning to improve fraud detection over time
 import numpy as np
 import json
 import os
+import threading
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 import pickle
 
+from ml_training.features import columns_from_records, rl_state_matrix
+from ml_training.rl_discretizer import DEFAULT_N_STATES, StateDiscretizer
+from ml_training.rl_shared_state import REWARD_WINDOW, SharedRLState
+from ml_training.rl_update_log import UpdateLog, apply_records
+
+# Smallest round _train_vectorized applies with NumPy; smaller rounds run as a scalar loop
+MIN_VECTOR_ROUND = 32
+
+
+def _shared_field(name: str, cast):
+    """Attribute kept in the shared meta record once attached, and locally before that"""
+    def getter(self):
+        if self._attached:
+            return cast(self.shared.get(name))
+        return self._local[name]
+    
+    def setter(self, value):
+        if self._attached:
+            self.shared.set(name, value)
+        else:
+            self._local[name] = cast(value)
+    
+    return property(getter, setter)
+
+
 class RLFraudDetector:
     """
     Q-Learning based fraud detector that learns from predictions and outcomes
+    
+    The Q-table, counters and exploration rate live in memory-mapped files
+    shared by every worker process (see rl_shared_state.py). Writes hold the
+    shared file lock, so feedback from all workers lands in one table and one
+    update log without lost updates.
     """
     
+    seq = _shared_field("seq", int)  # Sequence number of the last applied update
+    total_predictions = _shared_field("total_predictions", int)
+    correct_predictions = _shared_field("correct_predictions", int)
+    exploration_rate = _shared_field("exploration_rate", float)
+    
     def __init__(self, learning_rate: float = 0.1, discount_factor: float = 0.95, 
-                 exploration_rate: float = 0.1, state_size: int = 18):
+                 exploration_rate: float = 0.1, state_size: int = 18, n_states: int = DEFAULT_N_STATES):
         """
         Initialize RL Fraud Detector
         
@@ -25,94 +61,133 @@ class RLFraudDetector:
             discount_factor: Importance of future rewards (gamma)
             exploration_rate: Probability of exploring vs exploiting (epsilon)
             state_size: Number of features in state space
+            n_states: Size of the discretized state space (Q-table rows)
         """
+        self._attached = False
+        self._local = {
+            "seq": 0,
+            "total_predictions": 0,
+            "correct_predictions": 0,
+            "exploration_rate": exploration_rate,
+            "rewards_received": [],
+        }
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
-        self.exploration_rate = exploration_rate
         self.state_size = state_size
         
-        # Q-table: state -> action -> Q-value
+        # Q-table: float32[n_states, 2] indexed by discretized state
         # Actions: 0 = predict_normal, 1 = predict_fraud
-        self.q_table = {}
-        
-        # Statistics
-        self.total_predictions = 0
-        self.correct_predictions = 0
-        self.rewards_received = []
+        self.discretizer = StateDiscretizer(state_size, n_states)
+        self.q_table = np.zeros((n_states, 2), dtype=np.float32)
         self.episodes = []
         
-        # Load existing model if available
+        # Existing model (snapshot + update log) is loaded by the first worker
+        # to attach and copied into the shared state; later workers map it
         self.model_path = "backend/ml_models/rl_fraud_model.pkl"
         self.stats_path = "backend/ml_models/rl_fraud_stats.json"
+        self.log_path = "backend/ml_models/rl_fraud_updates.log"
+        self.shared_dir = "backend/ml_models/rl_shared"
+        self.snapshot_every = 5000  # Logged feedbacks before the log is compacted into a snapshot
+        self.update_log = UpdateLog(self.log_path)
+        self.shared = SharedRLState(self.shared_dir, n_states)
+        self._generation = 0  # Shared generation the local discretizer matches
+        self._attach_shared()
+    
+    @property
+    def rewards_received(self) -> List[float]:
+        """Most recent rewards, oldest first (read-only copy)"""
+        if self._attached:
+            return self.shared.recent_rewards()
+        return list(self._local["rewards_received"])
+    
+    @rewards_received.setter
+    def rewards_received(self, values: List[float]):
+        if self._attached:
+            self.shared.reset_rewards(values)
+        else:
+            self._local["rewards_received"] = list(values)[-REWARD_WINDOW:]
+    
+    def _append_rewards(self, values):
+        if self._attached:
+            self.shared.append_rewards(values)
+        else:
+            self._local["rewards_received"] = (self._local["rewards_received"] + list(values))[-REWARD_WINDOW:]
+    
+    def _locked(self):
+        """Exclusive lock over the shared state (re-entrant)"""
+        return self.shared.lock()
+    
+    def _attach_shared(self):
+        """Map the shared Q-table, falling back to a process-local one if that fails"""
+        try:
+            self.shared.attach(self._durable_state)
+        except Exception as e:
+            print(f"Warning: Could not attach shared RL state, learning stays in this process: {e}")
+            self.load_model()
+            return
+        self.q_table = self.shared.q_table
+        self._attached = True
+        self._sync(force=True)
+    
+    def _durable_state(self) -> Dict:
+        """State to seed the shared files with: the snapshot plus replayed log"""
         self.load_model()
+        return {
+            "q_table": self.q_table,
+            "seq": self.seq,
+            "total_predictions": self.total_predictions,
+            "correct_predictions": self.correct_predictions,
+            "exploration_rate": self.exploration_rate,
+            "rewards": self.rewards_received,
+            "discretizer": self.discretizer.to_dict(),
+        }
+    
+    def _sync(self, force: bool = False):
+        """Reload the discretizer if another worker refit or reset it"""
+        if not self._attached:
+            return
+        generation = self.shared.get("generation")
+        if force or generation != self._generation:
+            self.discretizer = StateDiscretizer.from_dict(self.shared.read_discretizer())
+            self._generation = generation
+    
+    def _publish_discretizer(self):
+        """Share the current bins with the other workers (call under lock)"""
+        if not self._attached:
+            return
+        self.shared.write_discretizer(self.discretizer.to_dict())
+        self._generation = self.shared.get("generation") + 1
+        self.shared.set("generation", self._generation)
+    
+    def _state_to_key(self, state: np.ndarray) -> int:
+        """Convert state array to its Q-table row"""
+        return int(self.discretizer.transform(state)[0])
     
-    def _state_to_key(self, state: np.ndarray) -> str:
-        """Convert state array to hashable key"""
-        # Discretize state for Q-table lookup
-        # Round to 2 decimal places and create string key
-        state_rounded = np.round(state, 2)
-        return str(state_rounded.tolist())
+    def state_count(self) -> int:
+        """Number of states with learned Q-values"""
+        return int(np.count_nonzero(self.q_table.any(axis=1)))
     
     def _get_state_features(self, transaction_data: Dict) -> np.ndarray:
         """
         Extract features from transaction data to create state vector
-        Same features as used in ML model
+        Uses the shared feature kernel (ml_training/features.py)
         """
         try:
-            # Feature engineering (matching train_fraud_model.py)
-            amount = float(transaction_data.get("amount", 0))
-            old_balance_orig = float(transaction_data.get("oldbalanceOrg", 0))
-            new_balance_orig = float(transaction_data.get("newbalanceOrig", 0))
-            old_balance_dest = float(transaction_data.get("oldbalanceDest", 0))
-            new_balance_dest = float(transaction_data.get("newbalanceDest", 0))
-            
-            # Calculate features
-            balance_change_orig = new_balance_orig - old_balance_orig
-            balance_change_dest = new_balance_dest - old_balance_dest if old_balance_dest else 0
-            
-            # Avoid division by zero
-            balance_orig_ratio = balance_change_orig / (old_balance_orig + 1e-6)
-            balance_dest_ratio = balance_change_dest / (old_balance_dest + 1e-6) if old_balance_dest else 0
-            
-            # Transaction type encoding
-            tx_type = transaction_data.get("type", "TRANSFER")
-            type_encoding = {
-                "CASH_IN": [1, 0, 0, 0, 0],
-                "CASH_OUT": [0, 1, 0, 0, 0],
-                "DEBIT": [0, 0, 1, 0, 0],
-                "PAYMENT": [0, 0, 0, 1, 0],
-                "TRANSFER": [0, 0, 0, 0, 1],
-            }
-            type_vec = type_encoding.get(tx_type, [0, 0, 0, 0, 0])
-            
-            # Combine all features
-            features = np.array([
-                amount,
-                old_balance_orig,
-                new_balance_orig,
-                old_balance_dest or 0,
-                new_balance_dest or 0,
-                balance_change_orig,
-                balance_change_dest,
-                balance_orig_ratio,
-                balance_dest_ratio,
-                abs(balance_change_orig),
-                abs(balance_change_dest),
-                amount / (old_balance_orig + 1e-6),
-                amount / (old_balance_dest + 1e-6) if old_balance_dest else 0,
-                old_balance_orig + new_balance_orig,
-                (old_balance_dest or 0) + (new_balance_dest or 0),
-            ] + type_vec)
-            
-            # Normalize features
-            features = np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0)
-            
-            return features[:self.state_size]  # Ensure correct size
-            
+            columns = columns_from_records([transaction_data], default_type="TRANSFER")
+            return rl_state_matrix(columns, self.state_size)[0]
         except Exception as e:
             # Return zero vector on error
             return np.zeros(self.state_size)
     
+    def _state_keys(self, transactions: List[Dict]) -> np.ndarray:
+        """Q-table rows for many transactions, computed in one vectorized pass"""
+        try:
+            columns = columns_from_records(transactions, default_type="TRANSFER")
+            return self.discretizer.transform(rl_state_matrix(columns, self.state_size))
+        except Exception:
+            # Fall back to per-transaction extraction (bad records map to the zero state)
+            return np.array([self._state_to_key(self._get_state_features(tx)) for tx in transactions], dtype=np.int64)
+    
     def predict(self, transaction_data: Dict, use_exploration: bool = True) -> Dict:
         """
         Predict fraud using Q-learning
@@ -124,28 +199,26 @@ class RLFraudDetector:
         Returns:
             Dict with prediction, confidence, and action taken
         """
+        self._sync()
         state = self._get_state_features(transaction_data)
-        state_key = self._state_to_key(state)
-        
-        # Initialize Q-values for new state
-        if state_key not in self.q_table:
-            self.q_table[state_key] = {0: 0.0, 1: 0.0}  # [normal, fraud]
+        return self._predict_state(self._state_to_key(state), use_exploration)
+    
+    def _predict_state(self, state_key: int, use_exploration: bool = True) -> Dict:
+        """Epsilon-greedy prediction for an already discretized state"""
+        q_normal, q_fraud = (float(q) for q in self.q_table[state_key])
         
-        # Epsilon-greedy action selection
-        if use_exploration and np.random.random() < self.exploration_rate:
+        # Epsilon-greedy action selection from a single uniform draw:
+        # explore if u < epsilon, and then pick fraud if u < epsilon / 2
+        u = np.random.random() if use_exploration else 1.0
+        if u < self.exploration_rate:
             # Explore: random action
-            action = np.random.randint(0, 2)
+            action = int(u < self.exploration_rate / 2)
             exploration = True
         else:
-            # Exploit: choose action with highest Q-value
-            q_values = self.q_table[state_key]
-            action = max(q_values.items(), key=lambda x: x[1])[0]
+            # Exploit: choose action with highest Q-value (ties go to normal)
+            action = 1 if q_fraud > q_normal else 0
             exploration = False
         
-        # Get Q-values for confidence calculation
-        q_normal = self.q_table[state_key][0]
-        q_fraud = self.q_table[state_key][1]
-        
         # Calculate confidence based on Q-value difference
         total_q = abs(q_normal) + abs(q_fraud)
         if total_q > 0:
@@ -153,10 +226,11 @@ class RLFraudDetector:
         else:
             confidence = 0.5
         
-        self.total_predictions += 1
+        with self._locked():
+            self.total_predictions += 1
         
         return {
-            "is_fraud": action,
+            "is_fraud": int(action),
             "prediction": "fraud" if action == 1 else "normal",
             "confidence": float(confidence),
             "q_values": {
@@ -167,7 +241,7 @@ class RLFraudDetector:
             "state_key": state_key
         }
     
-    def update(self, state_key: str, action: int, reward: float, next_state_key: Optional[str] = None):
+    def update(self, state_key: int, action: int, reward: float, next_state_key: Optional[int] = None):
         """
         Update Q-table using Q-learning algorithm
         
@@ -177,27 +251,23 @@ class RLFraudDetector:
             reward: Reward received
             next_state_key: Next state (for Q-learning update)
         """
-        if state_key not in self.q_table:
-            self.q_table[state_key] = {0: 0.0, 1: 0.0}
-        
-        # Q-learning update: Q(s,a) = Q(s,a) + α[r + γ*max(Q(s',a')) - Q(s,a)]
-        current_q = self.q_table[state_key][action]
-        
-        if next_state_key and next_state_key in self.q_table:
-            # Use next state's max Q-value
-            next_max_q = max(self.q_table[next_state_key].values())
-        else:
-            # Terminal state or unknown next state
-            next_max_q = 0
-        
-        # Q-value update
-        new_q = current_q + self.learning_rate * (reward + self.discount_factor * next_max_q - current_q)
-        self.q_table[state_key][action] = new_q
-        
-        # Track rewards
-        self.rewards_received.append(reward)
-        if len(self.rewards_received) > 10000:  # Keep last 10k rewards
-            self.rewards_received = self.rewards_received[-10000:]
+        with self._locked():
+            # Q-learning update: Q(s,a) = Q(s,a) + α[r + γ*max(Q(s',a')) - Q(s,a)]
+            current_q = float(self.q_table[state_key, action])
+            
+            if next_state_key is not None:
+                # Use next state's max Q-value
+                next_max_q = float(self.q_table[next_state_key].max())
+            else:
+                # Terminal state
+                next_max_q = 0
+            
+            # Q-value update
+            new_q = current_q + self.learning_rate * (reward + self.discount_factor * next_max_q - current_q)
+            self.q_table[state_key, action] = new_q
+            
+            # Track rewards (last 10k are kept)
+            self._append_rewards([reward])
     
     def learn_from_feedback(self, transaction_data: Dict, predicted_action: int, 
                            actual_is_fraud: int, reward: Optional[float] = None):
@@ -210,9 +280,32 @@ class RLFraudDetector:
             actual_is_fraud: Actual label (0=normal, 1=fraud)
             reward: Optional custom reward, otherwise calculated automatically
         """
+        self._sync()
         state = self._get_state_features(transaction_data)
         state_key = self._state_to_key(state)
+        correct = reward is None and predicted_action == actual_is_fraud
+        
+        with self._locked():
+            # Bins may have changed while waiting for the lock
+            if self._attached and self.shared.get("generation") != self._generation:
+                self._sync()
+                state_key = self._state_to_key(state)
+            reward = self._learn_state(state_key, predicted_action, actual_is_fraud, reward)
+            
+            # Persist just this update; the full Q-table is only rewritten on compaction
+            self.seq += 1
+            self.update_log.append(
+                self.seq, state_key, predicted_action, correct, reward,
+                float(self.q_table[state_key, predicted_action]), self.total_predictions
+            )
+            if self.update_log.size() >= self.snapshot_every:
+                self.save_model()
         
+        return reward
+    
+    def _learn_state(self, state_key: int, predicted_action: int,
+                     actual_is_fraud: int, reward: Optional[float] = None):
+        """learn_from_feedback for an already discretized state"""
         # Calculate reward if not provided
         if reward is None:
             if predicted_action == actual_is_fraud:
@@ -235,58 +328,116 @@ class RLFraudDetector:
     
     def get_statistics(self) -> Dict:
         """Get RL model statistics"""
+        self._sync()
+        rewards_received = self.rewards_received
         accuracy = (self.correct_predictions / self.total_predictions * 100) if self.total_predictions > 0 else 0
-        avg_reward = np.mean(self.rewards_received) if self.rewards_received else 0
+        avg_reward = np.mean(rewards_received) if rewards_received else 0
         
         return {
             "total_predictions": self.total_predictions,
             "correct_predictions": self.correct_predictions,
             "accuracy": round(accuracy, 2),
             "average_reward": round(float(avg_reward), 4),
-            "total_states": len(self.q_table),
+            "total_states": self.state_count(),
+            "state_space_size": int(self.q_table.shape[0]),
             "exploration_rate": self.exploration_rate,
             "learning_rate": self.learning_rate,
             "discount_factor": self.discount_factor,
-            "total_rewards": len(self.rewards_received),
+            "total_rewards": len(rewards_received),
         }
     
+    def _write_atomic(self, path: str, write, mode: str = 'wb'):
+        """Write to a temp file next to path, fsync, then rename over it"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
     def save_model(self):
-        """Save Q-table and statistics"""
+        """Write a Q-table snapshot and statistics, then compact the update log"""
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
         
-        # Save Q-table
-        with open(self.model_path, 'wb') as f:
-            pickle.dump({
-                'q_table': self.q_table,
+        with self._locked():
+            # Save Q-table (the snapshot covers every update up to self.seq)
+            snapshot = {
+                'q_table': np.array(self.q_table),
+                'discretizer': self.discretizer.to_dict(),
+                'seq': self.seq,
                 'total_predictions': self.total_predictions,
                 'correct_predictions': self.correct_predictions,
                 'rewards_received': self.rewards_received[-1000:],  # Save last 1000 rewards
-            }, f)
-        
-        # Save statistics
-        stats = self.get_statistics()
-        stats['last_updated'] = datetime.now().isoformat()
-        with open(self.stats_path, 'w') as f:
-            json.dump(stats, f, indent=2)
+            }
+            self._write_atomic(self.model_path, lambda f: pickle.dump(snapshot, f))
+            
+            # Save statistics
+            stats = self.get_statistics()
+            stats['last_updated'] = datetime.now().isoformat()
+            self._write_atomic(self.stats_path, lambda f: json.dump(stats, f, indent=2), mode='w')
+            
+            # Records up to self.seq are in the snapshot now
+            self.update_log.truncate()
     
     def load_model(self):
-        """Load Q-table and statistics"""
+        """Load the Q-table snapshot and replay newer updates from the log"""
         try:
             if os.path.exists(self.model_path):
                 with open(self.model_path, 'rb') as f:
                     data = pickle.load(f)
-                    self.q_table = data.get('q_table', {})
-                    self.total_predictions = data.get('total_predictions', 0)
-                    self.correct_predictions = data.get('correct_predictions', 0)
-                    self.rewards_received = data.get('rewards_received', [])
+                q_table = data.get('q_table')
+                if isinstance(q_table, np.ndarray):
+                    self.discretizer = StateDiscretizer.from_dict(data['discretizer'])
+                    self.q_table[:] = q_table
+                elif q_table:
+                    self._load_legacy_q_table(q_table)
+                self.seq = data.get('seq', 0)
+                self.total_predictions = data.get('total_predictions', 0)
+                self.correct_predictions = data.get('correct_predictions', 0)
+                self.rewards_received = data.get('rewards_received', [])
+            
+            records = self.update_log.read(after_seq=self.seq)
+            if len(records):
+                apply_records(self.q_table, records)
+                self.seq = int(records["seq"][-1])
+                self.total_predictions = int(records["total_predictions"][-1])
+                self.correct_predictions += int(records["correct"].sum())
+                self._append_rewards(records["reward"].tolist())
         except Exception as e:
             print(f"Warning: Could not load RL model: {e}")
-            self.q_table = {}
+            self.reset(save=False)
+    
+    def _load_legacy_q_table(self, q_table: Dict):
+        """
+        Convert an old dict Q-table (str(rounded state list) -> {action: q})
+        by discretizing each stored state; colliding states are averaged
+        """
+        states = np.array([json.loads(key) for key in q_table], dtype=np.float64)
+        values = np.array([[q[0], q[1]] for q in q_table.values()], dtype=np.float64)
+        rows = self.discretizer.transform(states)
+        
+        sums = np.zeros((self.q_table.shape[0], 2), dtype=np.float64)
+        counts = np.zeros(self.q_table.shape[0], dtype=np.int64)
+        np.add.at(sums, rows, values)
+        np.add.at(counts, rows, 1)
+        seen = counts > 0
+        self.q_table[seen] = (sums[seen] / counts[seen, None]).astype(np.float32)
+        print(f"Converted legacy RL Q-table: {len(q_table)} states -> {int(seen.sum())} discretized states")
+    
+    def reset(self, save: bool = True):
+        """Clear the Q-table, statistics and fitted bins (for every worker)"""
+        with self._locked():
+            self.discretizer = StateDiscretizer(self.state_size, self.q_table.shape[0])
+            self.q_table[:] = 0
             self.total_predictions = 0
             self.correct_predictions = 0
             self.rewards_received = []
+            self._publish_discretizer()
+            if save:
+                self.save_model()
     
-    def train_on_batch(self, transactions: List[Dict], labels: List[int], epochs: int = 1):
+    def train_on_batch(self, transactions: List[Dict], labels: List[int], epochs: int = 1,
+                       vectorized: bool = True):
         """
         Train RL agent on a batch of transactions
         
@@ -294,34 +445,165 @@ class RLFraudDetector:
             transactions: List of transaction data dicts
             labels: List of actual fraud labels (0 or 1)
             epochs: Number of training epochs
+            vectorized: Apply updates with NumPy (same results as the
+                per-transaction loop for the same np.random seed)
         """
+        # Other workers wait for the whole batch, so none of their feedback is overwritten
+        with self._locked():
+            self._sync()
+            if not self.discretizer.fitted and self.state_count() == 0 and len(transactions) >= 100:
+                # Fresh agent: fit quantile bins once on the first real batch
+                try:
+                    columns = columns_from_records(transactions, default_type="TRANSFER")
+                    self.discretizer.fit(rl_state_matrix(columns, self.state_size))
+                    self._publish_discretizer()
+                except Exception as e:
+                    print(f"Warning: Could not fit RL state bins, keeping defaults: {e}")
+            
+            # States do not depend on the Q-table, so discretize the batch once
+            state_keys = self._state_keys(transactions)
+            labels = np.asarray(labels, dtype=np.int64)
+            
+            if vectorized:
+                self._train_vectorized(state_keys, labels, epochs)
+            else:
+                self._train_sequential(state_keys.tolist(), labels.tolist(), epochs)
+            
+            # Save after training
+            self.save_model()
+            
+            return self.get_statistics()
+    
+    def _train_sequential(self, state_keys: List[int], labels: List[int], epochs: int):
+        """Reference training loop: one predict + learn per transaction"""
         for epoch in range(epochs):
-            for tx_data, label in zip(transactions, labels):
+            for state_key, label in zip(state_keys, labels):
                 # Make prediction
-                prediction = self.predict(tx_data, use_exploration=True)
+                prediction = self._predict_state(state_key, use_exploration=True)
                 
                 # Learn from feedback
-                self.learn_from_feedback(
-                    tx_data,
+                self._learn_state(
+                    state_key,
                     prediction['is_fraud'],
                     label
                 )
             
             # Decay exploration rate
             self.exploration_rate = max(0.01, self.exploration_rate * 0.99)
+    
+    def _train_vectorized(self, state_keys: np.ndarray, labels: np.ndarray, epochs: int):
+        """
+        Batched equivalent of _train_sequential
+        
+        An update only touches its own state, so the batch is split into
+        rounds: round k holds the k-th occurrence of every state. States in a
+        round are distinct and each sees exactly the updates made to it in
+        earlier rounds, so a round can be applied with one NumPy step. The
+        exploration uniforms come from one np.random.random(n) call, which
+        yields the same numbers as n scalar draws.
+        """
+        n = len(state_keys)
+        if n == 0:
+            return
         
-        # Save after training
-        self.save_model()
+        # Occurrence rank of every position within its state (0 for the first time it appears)
+        order = np.argsort(state_keys, kind="stable")
+        sorted_keys = state_keys[order]
+        group_starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, n])
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n) - np.repeat(group_starts, group_sizes)
+        
+        # Positions grouped by round; batch order is kept inside a round
+        round_order = np.argsort(rank, kind="stable")
+        round_sizes = np.bincount(rank)
+        round_bounds = np.r_[0, np.cumsum(round_sizes)]
+        
+        # Rounds only shrink. Once they are small the per-round NumPy overhead
+        # outweighs the work, so the remaining occurrences of the few hot states
+        # run as a scalar loop, state by state, in batch order.
+        split = int(np.count_nonzero(round_sizes >= MIN_VECTOR_ROUND))
+        rounds = [round_order[round_bounds[k]:round_bounds[k + 1]] for k in range(split)]
+        tail = round_order[round_bounds[split]:]
+        tail = tail[np.lexsort((tail, state_keys[tail]))].tolist()
+        tail_states = state_keys[tail].tolist()
+        labels_list = labels.tolist()
+        
+        for epoch in range(epochs):
+            u = np.random.random(n)
+            explore = u < self.exploration_rate
+            explore_action = (u < self.exploration_rate / 2).astype(np.int64)
+            actions = np.empty(n, dtype=np.int64)
+            rewards = np.empty(n, dtype=np.float64)
+            
+            for positions in rounds:
+                states = state_keys[positions]
+                y = labels[positions]
+                q = self.q_table[states]
+                greedy = (q[:, 1] > q[:, 0]).astype(np.int64)
+                a = np.where(explore[positions], explore_action[positions], greedy)
+                
+                # Same rewards as _learn_state: +1 correct, -2 missed fraud, -0.5 false positive
+                r = np.where(a == y, 1.0, np.where(y == 1, -2.0, -0.5))
+                
+                # Same float64 expression as update(), with a terminal next state
+                current_q = q[np.arange(len(states)), a].astype(np.float64)
+                self.q_table[states, a] = current_q + self.learning_rate * (r + self.discount_factor * 0 - current_q)
+                
+                actions[positions] = a
+                rewards[positions] = r
+            
+            if tail:
+                self._train_scalar_tail(tail, tail_states, labels_list, u.tolist(), actions, rewards)
+            
+            self.total_predictions += n
+            self.correct_predictions += int(np.count_nonzero(actions == labels))
+            self._append_rewards(rewards)
+            
+            # Decay exploration rate
+            self.exploration_rate = max(0.01, self.exploration_rate * 0.99)
+    
+    def _train_scalar_tail(self, positions: List[int], states: List[int], labels: List[int],
+                           u: List[float], actions: np.ndarray, rewards: np.ndarray):
+        """Sequential updates for positions grouped by state (same arithmetic as update())"""
+        epsilon = self.exploration_rate
+        tail_actions = []
+        tail_rewards = []
+        current_state = None
+        q = None
+        for position, state in zip(positions, states):
+            if state != current_state:
+                if current_state is not None:
+                    self.q_table[current_state] = q
+                current_state = state
+                q = [float(v) for v in self.q_table[state]]
+            
+            if u[position] < epsilon:
+                action = int(u[position] < epsilon / 2)
+            else:
+                action = 1 if q[1] > q[0] else 0
+            label = labels[position]
+            reward = 1.0 if action == label else (-2.0 if label == 1 else -0.5)
+            
+            current_q = q[action]
+            q[action] = float(np.float32(current_q + self.learning_rate * (reward + self.discount_factor * 0 - current_q)))
+            tail_actions.append(action)
+            tail_rewards.append(reward)
+        self.q_table[current_state] = q
         
-        return self.get_statistics()
+        actions[positions] = tail_actions
+        rewards[positions] = tail_rewards
 
 
-# Global RL detector instance
+# Global RL detector instance (one per process; the Q-table itself is shared)
 _rl_detector: Optional[RLFraudDetector] = None
+_rl_detector_lock = threading.Lock()
 
 def get_rl_detector() -> RLFraudDetector:
     """Get or create global RL detector instance"""
     global _rl_detector
     if _rl_detector is None:
-        _rl_detector = RLFraudDetector()
+        with _rl_detector_lock:
+            if _rl_detector is None:
+                _rl_detector = RLFraudDetector()
     return _rl_detector
@@ -0,0 +1,193 @@
+"""
+Cross-process state for the RL fraud detector
+The Q-table, counters and recent rewards live in memory-mapped .npy files
+that every uvicorn/gunicorn worker maps, so all workers read the same
+table. Writers serialize on an exclusive file lock, which also guards the
+update log and snapshots.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only, thread lock below still applies
+    fcntl = None
+
+META_DTYPE = np.dtype([
+    ("seq", "<i8"),                 # Last update written to the log
+    ("generation", "<i8"),          # Bumped when bins change or the table is reset
+    ("total_predictions", "<i8"),
+    ("correct_predictions", "<i8"),
+    ("rewards_count", "<i8"),       # Rewards ever appended (ring position)
+    ("exploration_rate", "<f8"),
+])
+
+REWARD_WINDOW = 10000
+
+
+class SharedRLState:
+    """
+    Memory-mapped RL state shared by every worker process
+
+    The first process to attach (no other live worker holds the owner lock)
+    rebuilds the mapped files from the durable snapshot + update log, so a
+    stale or half-written mapping from a previous run is never trusted.
+    """
+
+    def __init__(self, directory: str, n_states: int):
+        self.directory = directory
+        self.n_states = n_states
+        self.q_table: Optional[np.ndarray] = None
+        self.meta: Optional[np.ndarray] = None
+        self.rewards: Optional[np.ndarray] = None
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._lock_file = None
+        self._owner_file = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def lock(self):
+        """Exclusive across processes and threads; re-entrant within a thread"""
+        with self._thread_lock:
+            if self._depth == 0 and self._lock_file is not None and fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and self._lock_file is not None and fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _claim_owner(self) -> bool:
+        """Hold a shared owner lock for the life of the process; True if no other worker is alive"""
+        self._owner_file = open(self._path("owners.lock"), "a+")
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(self._owner_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            first = True
+        except OSError:
+            first = False
+        fcntl.flock(self._owner_file.fileno(), fcntl.LOCK_SH)
+        return first
+
+    def attach(self, initialize: Callable[[], Dict]) -> bool:
+        """
+        Map the shared files, rebuilding them first if this is the only live worker
+
+        Args:
+            initialize: Returns the durable state as a dict with q_table,
+                seq, total_predictions, correct_predictions, rewards,
+                exploration_rate and discretizer
+
+        Returns:
+            True if this process rebuilt the shared state
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(self._path("state.lock"), "a+")
+        with self.lock():
+            rebuild = self._claim_owner() or not self._files_valid()
+            if rebuild:
+                self._rebuild(initialize())
+            self._map()
+        return rebuild
+
+    def _files_valid(self) -> bool:
+        try:
+            q_table = np.load(self._path("q_table.npy"), mmap_mode="r")
+            meta = np.load(self._path("meta.npy"), mmap_mode="r")
+            rewards = np.load(self._path("rewards.npy"), mmap_mode="r")
+            return (q_table.shape == (self.n_states, 2) and q_table.dtype == np.float32
+                    and meta.dtype == META_DTYPE and rewards.shape == (REWARD_WINDOW,)
+                    and os.path.exists(self._path("discretizer.json")))
+        except (OSError, ValueError):
+            return False
+
+    def _create(self, name: str, dtype, shape) -> np.ndarray:
+        """Map a fresh .npy next to the target; _rebuild renames it into place"""
+        return np.lib.format.open_memmap(self._path(f"{name}.tmp.npy"), mode="w+", dtype=dtype, shape=shape)
+
+    def _rebuild(self, state: Dict) -> None:
+        self.close_maps()
+        arrays = {
+            "q_table": self._create("q_table", np.float32, (self.n_states, 2)),
+            "meta": self._create("meta", META_DTYPE, (1,)),
+            "rewards": self._create("rewards", np.float32, (REWARD_WINDOW,)),
+        }
+        arrays["q_table"][:] = state["q_table"]
+        meta = arrays["meta"][0]
+        meta["seq"] = state["seq"]
+        meta["generation"] = 0
+        meta["total_predictions"] = state["total_predictions"]
+        meta["correct_predictions"] = state["correct_predictions"]
+        meta["exploration_rate"] = state["exploration_rate"]
+        rewards = list(state["rewards"])[-REWARD_WINDOW:]
+        arrays["rewards"][:len(rewards)] = rewards
+        meta["rewards_count"] = len(rewards)
+
+        for name, array in arrays.items():
+            array.flush()
+            del array
+            os.replace(self._path(f"{name}.tmp.npy"), self._path(f"{name}.npy"))
+        self.write_discretizer(state["discretizer"])
+
+    def _map(self) -> None:
+        self.q_table = np.load(self._path("q_table.npy"), mmap_mode="r+")
+        self.meta = np.load(self._path("meta.npy"), mmap_mode="r+")
+        self.rewards = np.load(self._path("rewards.npy"), mmap_mode="r+")
+
+    def write_discretizer(self, data: Dict) -> None:
+        tmp_path = self._path("discretizer.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path("discretizer.json"))
+
+    def read_discretizer(self) -> Dict:
+        with open(self._path("discretizer.json"), "r") as f:
+            return json.load(f)
+
+    def get(self, field: str):
+        return self.meta[0][field].item()
+
+    def set(self, field: str, value) -> None:
+        self.meta[0][field] = value
+
+    def append_rewards(self, values) -> None:
+        """Append rewards to the ring buffer (call under lock)"""
+        values = np.asarray(values, dtype=np.float32)[-REWARD_WINDOW:]
+        count = self.get("rewards_count")
+        positions = (count + np.arange(len(values))) % REWARD_WINDOW
+        self.rewards[positions] = values
+        self.set("rewards_count", count + len(values))
+
+    def reset_rewards(self, values) -> None:
+        self.set("rewards_count", 0)
+        self.append_rewards(list(values))
+
+    def recent_rewards(self) -> List[float]:
+        """Rewards in append order, oldest first (at most REWARD_WINDOW)"""
+        count = self.get("rewards_count")
+        if count <= REWARD_WINDOW:
+            return self.rewards[:count].tolist()
+        start = count % REWARD_WINDOW
+        return np.concatenate([self.rewards[start:], self.rewards[:start]]).tolist()
+
+    def flush(self) -> None:
+        for array in (self.q_table, self.meta, self.rewards):
+            if array is not None:
+                array.flush()
+
+    def close_maps(self) -> None:
+        self.q_table = self.meta = self.rewards = None
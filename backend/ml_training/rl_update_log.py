@@ -0,0 +1,107 @@
+"""
+Append-only update log for the RL fraud detector
+Each feedback writes one fixed-size binary record; snapshots of the full
+Q-table are taken periodically and the log is replayed on top of the
+latest snapshot at load time
+"""
+
+import os
+
+import numpy as np
+
+# One record per Q-table update. `q` is the value written, so replay is a
+# plain assignment and does not depend on learning parameters.
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("state", "<i8"),
+    ("action", "u1"),
+    ("correct", "u1"),
+    ("reward", "<f4"),
+    ("q", "<f4"),
+    ("total_predictions", "<u8"),
+])
+
+
+class UpdateLog:
+    """
+    Fixed-size binary records appended to a single file
+
+    A record cut short by a crash is dropped when the log is next opened.
+    Appends are flushed to the OS (survives a process crash); pass
+    fsync=True to also survive power loss, at a higher cost per append.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "ab")
+            size = self._file.tell()
+            torn = size % RECORD_DTYPE.itemsize
+            if torn:
+                self._file.truncate(size - torn)
+                self._file.seek(0, os.SEEK_END)
+        return self._file
+
+    def append(self, seq: int, state: int, action: int, correct: bool, reward: float,
+               q: float, total_predictions: int) -> None:
+        record = np.array(
+            [(seq, state, action, int(correct), reward, q, total_predictions)],
+            dtype=RECORD_DTYPE,
+        )
+        f = self._open()
+        f.write(record.tobytes())
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def read(self, after_seq: int = 0) -> np.ndarray:
+        """Complete records with seq > after_seq, in log order"""
+        if not os.path.exists(self.path):
+            return np.empty(0, dtype=RECORD_DTYPE)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % RECORD_DTYPE.itemsize
+        records = np.frombuffer(data[:usable], dtype=RECORD_DTYPE)
+        return records[records["seq"] > after_seq]
+
+    def truncate(self) -> None:
+        """Drop every record (call only after a snapshot covering them is on disk)"""
+        self.close()
+        if os.path.exists(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(0)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def size(self) -> int:
+        """Number of records currently in the log"""
+        if self._file is not None:
+            # fstat, not tell(): another process may have compacted the log
+            return os.fstat(self._file.fileno()).st_size // RECORD_DTYPE.itemsize
+        if os.path.exists(self.path):
+            return os.path.getsize(self.path) // RECORD_DTYPE.itemsize
+        return 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def apply_records(q_table: np.ndarray, records: np.ndarray) -> None:
+    """Write logged Q-values into q_table; the last record per (state, action) wins"""
+    if len(records) == 0:
+        return
+    cells = records["state"] * 2 + records["action"]
+    # np.unique on the reversed array keeps the first index = last occurrence
+    _, last = np.unique(cells[::-1], return_index=True)
+    latest = records[::-1][last]
+    q_table[latest["state"], latest["action"]] = latest["q"]
+
@@ -11,8 +11,6 @@ if sys.platform == "win32":
     sys.stdout = codecs.getwriter("utf-8")(sys.stdout.buffer, "strict")
     sys.stderr = codecs.getwriter("utf-8")(sys.stderr.buffer, "strict")
 
-import pandas as pd
-import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, roc_auc_score, roc_curve
@@ -25,118 +23,58 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.db.database import SessionLocal
 from app.db.models import FraudTransaction
+from ml_training.features import FEATURE_COLUMNS, INPUT_FIELDS, build_feature_matrix, columns_from_arrays
 
 def load_transaction_data():
-    """Load transactions from database"""
+    """
+    Load transactions from database
+
+    Returns:
+        Dict of per-field lists: INPUT_FIELDS plus "isFraud"
+    """
     db = SessionLocal()
     try:
-        transactions = db.query(FraudTransaction).all()
+        # INPUT_FIELDS order, then the label
+        rows = db.query(
+            FraudTransaction.step,
+            FraudTransaction.type,
+            FraudTransaction.amount,
+            FraudTransaction.name_orig,
+            FraudTransaction.old_balance_orig,
+            FraudTransaction.new_balance_orig,
+            FraudTransaction.name_dest,
+            FraudTransaction.old_balance_dest,
+            FraudTransaction.new_balance_dest,
+            FraudTransaction.is_fraud,
+        ).all()
         
-        data = []
-        for tx in transactions:
-            data.append({
-                "step": tx.step,
-                "type": tx.type,
-                "amount": tx.amount,
-                "nameOrig": tx.name_orig,
-                "oldbalanceOrg": tx.old_balance_orig,
-                "newbalanceOrig": tx.new_balance_orig,
-                "nameDest": tx.name_dest,
-                "oldbalanceDest": tx.old_balance_dest or 0,
-                "newbalanceDest": tx.new_balance_dest or 0,
-                "isFraud": tx.is_fraud
-            })
+        fields = list(INPUT_FIELDS) + ["isFraud"]
+        data = {name: list(values) for name, values in zip(fields, zip(*rows))} if rows else {name: [] for name in fields}
+        # Missing destination balances count as 0
+        for name in ("oldbalanceDest", "newbalanceDest"):
+            data[name] = [value or 0 for value in data[name]]
         
-        df = pd.DataFrame(data)
-        print(f"✅ Loaded {len(df)} transactions from database")
-        print(f"   Normal: {len(df[df['isFraud'] == 0])}")
-        print(f"   Fraud: {len(df[df['isFraud'] == 1])}")
+        print(f"✅ Loaded {len(rows)} transactions from database")
+        print(f"   Normal: {data['isFraud'].count(0)}")
+        print(f"   Fraud: {data['isFraud'].count(1)}")
         
-        return df
+        return data
     finally:
         db.close()
 
 
-def feature_engineering(df):
-    """Create features for machine learning"""
-    df = df.copy()
-    
-    # Encode transaction type
-    type_mapping = {
-        "CASH_IN": 0,
-        "CASH_OUT": 1,
-        "DEBIT": 2,
-        "PAYMENT": 3,
-        "TRANSFER": 4
-    }
-    df["type_encoded"] = df["type"].map(type_mapping)
-    
-    # Balance change features
-    df["balance_change_orig"] = df["newbalanceOrig"] - df["oldbalanceOrg"]
-    df["balance_change_dest"] = df["newbalanceDest"] - df["oldbalanceDest"]
+def feature_engineering(data):
+    """Create features for machine learning (shared NumPy kernel, see features.py)"""
+    columns = columns_from_arrays(**{name: data[name] for name in INPUT_FIELDS})
+    feature_columns = list(FEATURE_COLUMNS)
     
-    # Balance ratio features
-    df["balance_ratio_orig"] = np.where(
-        df["oldbalanceOrg"] > 0,
-        df["newbalanceOrig"] / df["oldbalanceOrg"],
-        0
-    )
-    df["balance_ratio_dest"] = np.where(
-        df["oldbalanceDest"] > 0,
-        df["newbalanceDest"] / df["oldbalanceDest"],
-        0
-    )
-    
-    # Amount relative to balance
-    df["amount_ratio_orig"] = np.where(
-        df["oldbalanceOrg"] > 0,
-        df["amount"] / df["oldbalanceOrg"],
-        df["amount"]
-    )
-    
-    # Transaction size category
-    df["amount_log"] = np.log1p(df["amount"])
-    
-    # Customer type (C or M)
-    df["orig_is_customer"] = df["nameOrig"].str.startswith("C").astype(int)
-    df["dest_is_customer"] = df["nameDest"].str.startswith("C").astype(int)
-    df["dest_is_merchant"] = df["nameDest"].str.startswith("M").astype(int)
-    
-    # Zero balance after transaction (common in fraud)
-    df["zero_balance_after"] = (df["newbalanceOrig"] == 0).astype(int)
-    
-    # Large transaction relative to balance
-    df["large_transaction"] = (df["amount"] > df["oldbalanceOrg"] * 0.9).astype(int)
-    
-    # Select features for training
-    feature_columns = [
-        "step",
-        "type_encoded",
-        "amount",
-        "amount_log",
-        "oldbalanceOrg",
-        "newbalanceOrig",
-        "oldbalanceDest",
-        "newbalanceDest",
-        "balance_change_orig",
-        "balance_change_dest",
-        "balance_ratio_orig",
-        "balance_ratio_dest",
-        "amount_ratio_orig",
-        "orig_is_customer",
-        "dest_is_customer",
-        "dest_is_merchant",
-        "zero_balance_after",
-        "large_transaction"
-    ]
-    
-    X = df[feature_columns].fillna(0)
-    y = df["isFraud"]
+    X = build_feature_matrix(columns, feature_columns)
+    y = data["isFraud"]
     
     return X, y, feature_columns
 
 
-def train_model(X, y, model_type="random_forest"):
+def train_model(X, y, model_type="random_forest", feature_columns=None):
     """Train fraud detection model"""
     print(f"\n🔧 Training {model_type} model...")
     
@@ -194,14 +132,15 @@ def train_model(X, y, model_type="random_forest"):
     
     # Feature importance
     if hasattr(model, "feature_importances_"):
-        feature_importance = pd.DataFrame({
-            "feature": X.columns,
-            "importance": model.feature_importances_
-        }).sort_values("importance", ascending=False)
+        feature_importance = sorted(
+            zip(feature_columns or FEATURE_COLUMNS, model.feature_importances_.tolist()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
         
         print(f"\n🔍 Top 10 Most Important Features:")
-        for idx, row in feature_importance.head(10).iterrows():
-            print(f"   {row['feature']}: {row['importance']:.4f}")
+        for feature, importance in feature_importance[:10]:
+            print(f"   {feature}: {importance:.4f}")
     
     return model, {
         "accuracy": float(accuracy),
@@ -241,9 +180,13 @@ def save_model(model, metrics, feature_columns, model_dir="backend/ml_models"):
     latest_path = os.path.join(model_dir, "fraud_model_latest.pkl")
     latest_metadata_path = os.path.join(model_dir, "fraud_model_latest_metadata.json")
     
+    # Copy to a temp file and rename so a running ModelRegistry never sees a
+    # half-written artifact. Metadata lands first; the registry keys on the .pkl.
     import shutil
-    shutil.copy(model_path, latest_path)
-    shutil.copy(metadata_path, latest_metadata_path)
+    for src, dst in ((metadata_path, latest_metadata_path), (model_path, latest_path)):
+        tmp_path = dst + ".tmp"
+        shutil.copy(src, tmp_path)
+        os.replace(tmp_path, dst)
     
     print(f"💾 Latest model reference updated")
     
@@ -257,24 +200,24 @@ def main():
     print("=" * 70)
     
     # Load data
-    df = load_transaction_data()
+    data = load_transaction_data()
     
-    if len(df) == 0:
+    if len(data["isFraud"]) == 0:
         print("❌ No transactions found in database!")
         print("   Please run: python scripts/generate_transactions.py")
         return
     
-    if len(df[df["isFraud"] == 1]) == 0:
+    if data["isFraud"].count(1) == 0:
         print("❌ No fraud transactions found in database!")
         print("   Please generate transactions with fraud data")
         return
     
     # Feature engineering
     print("\n🔧 Engineering features...")
-    X, y, feature_columns = feature_engineering(df)
+    X, y, feature_columns = feature_engineering(data)
     
     # Train model
-    model, metrics = train_model(X, y, model_type="random_forest")
+    model, metrics = train_model(X, y, model_type="random_forest", feature_columns=feature_columns)
     
     # Save model
     model_path, metadata_path = save_model(model, metrics, feature_columns)
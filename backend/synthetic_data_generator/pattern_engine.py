@@ -0,0 +1,298 @@
+"""
+Columnar suspicious pattern detection
+Converts a wallet's transactions once into arrays (epoch timestamps, amounts,
+interned counterparty IDs) and evaluates every detector from them in one pass
+"""
+
+import os
+import sys
+import warnings
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from app.core.graph_kernels import build_csr, find_cycles, gather
+except ImportError:  # Run from this directory (example.py)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.core.graph_kernels import build_csr, find_cycles, gather
+
+# Detector thresholds (same as the original per-detector helpers)
+CONSOLIDATION_MINUTES = 30
+LAYERING_MIN_HOPS = 3
+CYCLE_MAX_HOPS = 8
+CYCLE_WINDOW_HOURS = 72  # First to last transaction of a cycle
+CYCLE_AMOUNT_TOLERANCE = 0.2  # Each hop keeps the previous hop's amount within 20%
+CYCLE_MAX_EXPANSIONS = 5000  # Search budget across all starting wallets
+LARGE_AMOUNT = 10000
+LARGE_SHARE = 0.3
+STRUCTURING_RANGE = (9000, 10000)
+STRUCTURING_MIN_COUNT = 3
+HIGH_FREQUENCY_COUNT = 15
+
+# Detector names accepted by detect_patterns(detectors=...)
+DETECTORS = ("rapid_consolidation", "layering", "circular", "structuring", "high_frequency", "large_amounts")
+
+# Risk score weights
+RISK_WEIGHTS = {
+    "rapid_consolidation": 0.4,
+    "layering": 0.3,
+    "circular": 0.2,
+    "large_amounts": 0.1,
+}
+
+
+def _parse_timestamp(value) -> float:
+    """ISO string or datetime -> epoch seconds (naive values are taken as UTC, bad ones as NaN)"""
+    try:
+        if not isinstance(value, datetime):
+            value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_timestamps(values: Sequence) -> np.ndarray:
+    """
+    Epoch seconds for many timestamps
+
+    Naive ISO strings (what the generator and the DB fetch produce) are
+    parsed by NumPy in one call; anything else falls back to a per-value parse.
+    """
+    if len(values) == 0:
+        return np.empty(0, dtype=np.float64)
+    try:
+        with warnings.catch_warnings():
+            # NumPy only warns on timezone offsets; take the exact path for those instead
+            warnings.simplefilter("error")
+            parsed = np.array(values, dtype="datetime64[us]")
+    except (TypeError, ValueError, DeprecationWarning, UserWarning):
+        return np.array([_parse_timestamp(v) for v in values], dtype=np.float64)
+    seconds = parsed.astype(np.int64) / 1e6
+    seconds[np.isnat(parsed)] = np.nan
+    return seconds
+
+
+@dataclass
+class TransactionColumns:
+    """
+    Transactions as parallel arrays
+
+    senders / receivers are indices into `wallets`; a missing address is
+    interned like any other value, so set-based counts match the dict code.
+    """
+    timestamps: np.ndarray  # float64 epoch seconds, NaN if missing
+    amounts: np.ndarray  # float64
+    senders: np.ndarray  # int64 ids into wallets
+    receivers: np.ndarray  # int64 ids into wallets
+    incoming: np.ndarray  # bool: has a receiver and a "from" key (consolidation candidates)
+    wallets: List[Optional[str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def wallet_id(self, wallet: str) -> int:
+        """Interned id of a wallet, -1 if it never appears"""
+        try:
+            return self.wallets.index(wallet)
+        except ValueError:
+            return -1
+
+    @classmethod
+    def from_records(cls, txns: List[Dict]) -> "TransactionColumns":
+        """Build the columns from transaction dicts (comprehensions; no per-row NumPy writes)"""
+        ids: Dict[Optional[str], int] = {}
+        intern = ids.setdefault
+        # Interned sender, receiver, sender, ... so ids follow first appearance
+        pair_ids = np.array(
+            [intern(address, len(ids)) for t in txns for address in (t.get("from"), t.get("to"))],
+            dtype=np.int64,
+        )
+        return cls(
+            timestamps=parse_timestamps([t.get("timestamp") for t in txns]),
+            amounts=np.array([t.get("amount", 0) or 0 for t in txns], dtype=np.float64),
+            senders=pair_ids[0::2],
+            receivers=pair_ids[1::2],
+            incoming=np.array([bool(t.get("to")) and "from" in t for t in txns], dtype=bool),
+            wallets=list(ids),
+        )
+
+
+@dataclass(frozen=True)
+class PatternResult:
+    """Every detector's outcome for one set of transactions"""
+    tx_count: int
+    rapid_consolidation: bool
+    layering: bool
+    circular: bool
+    structuring: bool
+    high_frequency: bool
+    large_amounts: bool
+    consolidation_span_minutes: Optional[float]
+    unique_wallets: int
+    # Flow metrics relative to the analyzed wallet (zero when no wallet was given)
+    total_in: float = 0.0
+    total_out: float = 0.0
+    unique_senders: int = 0
+    unique_receivers: int = 0
+
+    @property
+    def risk_score(self) -> float:
+        """Weighted detector score from 0.0 to 1.0"""
+        score = 0.0
+        if self.rapid_consolidation:
+            score += RISK_WEIGHTS["rapid_consolidation"]
+        if self.layering:
+            score += RISK_WEIGHTS["layering"]
+        if self.circular:
+            score += RISK_WEIGHTS["circular"]
+        if self.large_amounts:
+            score += RISK_WEIGHTS["large_amounts"]
+        return min(score, 1.0)
+
+    @property
+    def detected_patterns(self) -> List[str]:
+        """Human-readable pattern labels, as shown in incident reports"""
+        patterns = []
+        if self.rapid_consolidation:
+            patterns.append("Rapid Consolidation")
+        if self.layering:
+            patterns.append("Money Laundering (Layering)")
+            patterns.append("Multiple Hop Transfers")
+        if self.circular:
+            patterns.append("Circular Movement")
+        if self.structuring:
+            patterns.append("Structuring Detected")
+        if self.high_frequency:
+            patterns.append("High Transaction Frequency")
+        return patterns if patterns else ["No obvious patterns detected"]
+
+
+def has_cycle(columns: TransactionColumns) -> bool:
+    """
+    True if funds go round a loop of wallets and come back
+
+    A loop has 2 to CYCLE_MAX_HOPS transactions in time order, completes
+    within CYCLE_WINDOW_HOURS and roughly conserves the amount hop to hop
+    (see graph_kernels.find_cycles). Very large inputs may stop at the
+    search budget without finding one.
+    """
+    if len(columns) < 2:
+        return False
+    n_wallets = len(columns.wallets)
+    out_indptr, out_order = build_csr(columns.senders, n_wallets)
+    in_indptr, in_order = build_csr(columns.receivers, n_wallets)
+
+    def out_edges(nodes):
+        edges = gather(out_indptr, out_order, nodes)
+        return edges, columns.receivers[edges]
+
+    def in_edges(nodes):
+        edges = gather(in_indptr, in_order, nodes)
+        return edges, columns.senders[edges]
+
+    # Only wallets that both send and receive can be on a loop
+    starts = np.flatnonzero((np.diff(out_indptr) > 0) & (np.diff(in_indptr) > 0))
+    budget = CYCLE_MAX_EXPANSIONS
+    for start in starts.tolist():
+        if budget <= 0:
+            break
+        search = find_cycles(
+            start, out_edges, in_edges, n_wallets, columns.amounts, columns.timestamps,
+            max_hops=CYCLE_MAX_HOPS,
+            max_time_gap=CYCLE_WINDOW_HOURS * 3600,
+            amount_tolerance=CYCLE_AMOUNT_TOLERANCE,
+            max_cycles=1,
+            max_expansions=budget,
+            prune_unreachable=False,
+        )
+        if search.cycles:
+            return True
+        budget -= search.expansions
+    return False
+
+
+def _total(values: np.ndarray):
+    """Sum as int when whole, so totals of integer amounts format like the dict-based sums did"""
+    total = float(values.sum())
+    return int(total) if total.is_integer() else total
+
+
+def detect_patterns(
+    txns,
+    wallet: Optional[str] = None,
+    threshold_minutes: float = CONSOLIDATION_MINUTES,
+    min_hops: int = LAYERING_MIN_HOPS,
+    detectors: Optional[Iterable[str]] = None,
+) -> PatternResult:
+    """
+    Run the detectors over a wallet's transactions
+
+    Args:
+        txns: List of transaction dicts, or TransactionColumns already built
+        wallet: Analyzed wallet, for the in/out flow metrics
+        threshold_minutes: Rapid consolidation time window
+        min_hops: Minimum hops for layering
+        detectors: Names from DETECTORS to run (all by default); the others
+            are reported as False. Leaving out "circular" skips the cycle
+            search, by far the most expensive detector.
+
+    Returns:
+        PatternResult
+    """
+    selected = set(DETECTORS if detectors is None else detectors)
+    unknown = selected.difference(DETECTORS)
+    if unknown:
+        raise ValueError(f"Unknown detectors: {sorted(unknown)}")
+    columns = txns if isinstance(txns, TransactionColumns) else TransactionColumns.from_records(txns)
+    n = len(columns)
+    amounts = columns.amounts
+
+    # Rapid consolidation: 3+ incoming transactions within the time window
+    span_minutes = None
+    if "rapid_consolidation" in selected:
+        incoming_times = columns.timestamps[columns.incoming]
+        incoming_times = incoming_times[~np.isnan(incoming_times)]
+        if len(incoming_times) >= 3:
+            span_minutes = float(incoming_times.max() - incoming_times.min()) / 60
+    rapid = span_minutes is not None and span_minutes < threshold_minutes
+
+    # Layering: number of distinct addresses involved
+    occurrences = np.bincount(
+        np.concatenate([columns.senders, columns.receivers]), minlength=len(columns.wallets)
+    )
+    unique_wallets = int(np.count_nonzero(occurrences))
+
+    structuring = "structuring" in selected and int(
+        np.count_nonzero((amounts > STRUCTURING_RANGE[0]) & (amounts < STRUCTURING_RANGE[1]))
+    ) >= STRUCTURING_MIN_COUNT
+    large_amounts = "large_amounts" in selected and int(np.count_nonzero(amounts > LARGE_AMOUNT)) > n * LARGE_SHARE
+
+    flows = {}
+    if wallet is not None:
+        wid = columns.wallet_id(wallet)
+        to_wallet = columns.receivers == wid
+        from_wallet = columns.senders == wid
+        flows = {
+            "total_in": _total(amounts[to_wallet]),
+            "total_out": _total(amounts[from_wallet]),
+            "unique_senders": int(np.unique(columns.senders[columns.senders != wid]).size),
+            "unique_receivers": int(np.unique(columns.receivers[columns.receivers != wid]).size),
+        }
+
+    return PatternResult(
+        tx_count=n,
+        rapid_consolidation=rapid,
+        layering="layering" in selected and unique_wallets >= min_hops + 2,
+        circular="circular" in selected and has_cycle(columns),
+        structuring=structuring,
+        high_frequency="high_frequency" in selected and n > HIGH_FREQUENCY_COUNT,
+        large_amounts=large_amounts,
+        consolidation_span_minutes=span_minutes,
+        unique_wallets=unique_wallets,
+        **flows,
+    )
@@ -0,0 +1,213 @@
+"""
+Pattern signature library
+Reference feature vectors per fraud typology, derived once from the synthetic
+generators with a fixed seed. Wallets are classified by cosine similarity
+against every signature in a single matrix product, so the result is
+deterministic and no data is generated per request.
+"""
+
+import random
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from .generator import generate_wallet_transactions
+    from .pattern_engine import PatternResult, TransactionColumns, detect_patterns
+except ImportError:  # Imported as a top-level module (example.py)
+    from generator import generate_wallet_transactions
+    from pattern_engine import PatternResult, TransactionColumns, detect_patterns
+
+# Typologies the incident pipeline reports; "normal" is a reference class only
+TYPOLOGIES = ("fraud", "money_laundering", "ponzi", "ransomware")
+REFERENCE_MODES = TYPOLOGIES + ("normal",)
+
+SIGNATURE_SEED = 1337
+SIGNATURE_SAMPLES = 200  # Generated wallets per mode
+MIN_SIMILARITY = 0.2  # Below this no typology is a convincing match
+SIGNATURE_WALLET = "SIGNATURE_WALLET"
+
+FEATURE_NAMES = (
+    "in_share",  # Transactions into the wallet / all transactions
+    "out_share",
+    "hop_share",  # Transactions between other wallets (onward hops)
+    "fan_in",  # Distinct senders per incoming transaction
+    "fan_out",
+    "out_flow_ratio",  # Outgoing amount / (incoming + outgoing)
+    "payback_share",  # Outgoing transactions that go back to a sender
+    "round_share",  # Amounts that are multiples of 500
+    "large_share",  # Amounts above 10000
+    "amount_cv",  # Coefficient of variation of amounts (capped at 3)
+    "log_tx_count",
+    "log_span_hours",
+    "rapid_consolidation",
+    "layering",
+    "circular",
+    "structuring",
+    "high_frequency",
+)
+
+
+def extract_features(
+    columns: TransactionColumns,
+    wallet: str,
+    patterns: Optional[PatternResult] = None,
+) -> np.ndarray:
+    """
+    Scale-free feature vector for one wallet's transactions
+
+    Args:
+        columns: Columnar transactions (pattern_engine.TransactionColumns)
+        wallet: Analyzed wallet
+        patterns: detect_patterns() result for these columns, if the caller
+            already has it (the detectors are not run again)
+
+    Returns:
+        float64 array aligned with FEATURE_NAMES
+    """
+    n = len(columns)
+    features = np.zeros(len(FEATURE_NAMES), dtype=np.float64)
+    if n == 0:
+        return features
+
+    if patterns is None:
+        patterns = detect_patterns(columns)
+    amounts = columns.amounts
+    wid = columns.wallet_id(wallet)
+    to_wallet = columns.receivers == wid
+    from_wallet = columns.senders == wid
+    n_in = int(np.count_nonzero(to_wallet))
+    n_out = int(np.count_nonzero(from_wallet))
+    in_amount = float(amounts[to_wallet].sum())
+    out_amount = float(amounts[from_wallet].sum())
+    senders_in = np.unique(columns.senders[to_wallet])
+    receivers_out = columns.receivers[from_wallet]
+
+    timestamps = columns.timestamps[~np.isnan(columns.timestamps)]
+    span_hours = float(timestamps.max() - timestamps.min()) / 3600 if len(timestamps) else 0.0
+    mean_amount = float(amounts.mean())
+
+    features[:] = (
+        n_in / n,
+        n_out / n,
+        1.0 - (n_in + n_out) / n,
+        senders_in.size / n_in if n_in else 0.0,
+        np.unique(receivers_out).size / n_out if n_out else 0.0,
+        out_amount / (in_amount + out_amount) if in_amount + out_amount else 0.0,
+        np.count_nonzero(np.isin(receivers_out, senders_in)) / n_out if n_out else 0.0,
+        np.count_nonzero(amounts % 500 == 0) / n,
+        np.count_nonzero(amounts > 10000) / n,
+        min(float(amounts.std()) / mean_amount, 3.0) if mean_amount > 0 else 0.0,
+        np.log1p(n),
+        np.log1p(max(span_hours, 0.0)),
+        patterns.rapid_consolidation,
+        patterns.layering,
+        patterns.circular,
+        patterns.structuring,
+        patterns.high_frequency,
+    )
+    return features
+
+
+class SignatureLibrary:
+    """
+    Unit-length signature per reference mode in a standardized feature space
+
+    Features are z-scored with the library's own mean/std so no single
+    feature dominates the cosine similarity.
+    """
+
+    def __init__(self, modes: Sequence[str], signatures: np.ndarray, mean: np.ndarray, scale: np.ndarray):
+        self.modes = list(modes)
+        self.signatures = signatures  # (modes, features), rows unit length
+        self.mean = mean
+        self.scale = scale
+
+    @classmethod
+    def build(cls, seed: int = SIGNATURE_SEED, samples: int = SIGNATURE_SAMPLES) -> "SignatureLibrary":
+        """
+        Generate reference wallets for every mode with a fixed seed
+
+        The generators use the module-level `random`, so its state is saved
+        and restored around the build to leave other callers unaffected.
+        """
+        state = random.getstate()
+        try:
+            random.seed(seed)
+            vectors = {
+                mode: np.array([
+                    extract_features(
+                        TransactionColumns.from_records(generate_wallet_transactions(SIGNATURE_WALLET, mode=mode)),
+                        SIGNATURE_WALLET,
+                    )
+                    for _ in range(samples)
+                ])
+                for mode in REFERENCE_MODES
+            }
+        finally:
+            random.setstate(state)
+
+        stacked = np.vstack(list(vectors.values()))
+        mean = stacked.mean(axis=0)
+        scale = stacked.std(axis=0)
+        scale[scale == 0] = 1.0
+        signatures = np.array([((vectors[mode] - mean) / scale).mean(axis=0) for mode in REFERENCE_MODES])
+        return cls(REFERENCE_MODES, _unit_rows(signatures), mean, scale)
+
+    def similarities(self, features: np.ndarray) -> np.ndarray:
+        """Cosine similarity of feature vectors (n, features) against every signature -> (n, modes)"""
+        standardized = (np.atleast_2d(features) - self.mean) / self.scale
+        return _unit_rows(standardized) @ self.signatures.T
+
+    def classify(
+        self,
+        txns,
+        wallet: str,
+        description_weights: Optional[Dict[str, float]] = None,
+        patterns: Optional[PatternResult] = None,
+    ) -> str:
+        """
+        Most similar typology, boosted by keyword weights from the user's description
+
+        Args:
+            txns: List of transaction dicts, or TransactionColumns already built
+            wallet: Analyzed wallet
+            description_weights: Typology -> boost (see analyze_wallet_description)
+            patterns: detect_patterns() result for these transactions, if already computed
+
+        Returns:
+            "fraud", "money_laundering", "ponzi", "ransomware" or "Unknown"
+        """
+        columns = txns if isinstance(txns, TransactionColumns) else TransactionColumns.from_records(txns)
+        if len(columns) == 0:
+            return "Unknown"
+        scores = dict(zip(self.modes, self.similarities(extract_features(columns, wallet, patterns))[0]))
+        if max(scores.values()) < MIN_SIMILARITY:
+            return "Unknown"
+        weights = description_weights or {}
+        typology_scores = {mode: scores[mode] + weights.get(mode, 0) for mode in TYPOLOGIES}
+        best = max(typology_scores, key=typology_scores.get)
+        if scores["normal"] > typology_scores[best]:
+            return "Unknown"
+        return best
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+_signature_library: Optional[SignatureLibrary] = None
+_signature_library_lock = threading.Lock()
+
+
+def get_signature_library() -> SignatureLibrary:
+    """Get or build the global signature library"""
+    global _signature_library
+    if _signature_library is None:
+        with _signature_library_lock:
+            if _signature_library is None:
+                _signature_library = SignatureLibrary.build()
+    return _signature_library
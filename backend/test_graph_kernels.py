@@ -0,0 +1,304 @@
+"""Checks for the NumPy graph kernels against plain-Python versions on small random graphs"""
+
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from itertools import combinations
+
+from app.core.graph_kernels import (
+    build_csr,
+    degrees,
+    expand_ranges,
+    find_cycles,
+    find_paths,
+    gather,
+    louvain,
+    max_flow,
+    merge_components,
+    trace_labels,
+)
+
+
+def random_edges(n_nodes, n_edges, seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, n_nodes, n_edges), rng.integers(0, n_nodes, n_edges)
+
+
+def test_expand_ranges():
+    starts = np.array([3, 0, 7, 7, 2])
+    ends = np.array([6, 0, 9, 7, 3])
+    assert expand_ranges(starts, ends).tolist() == [3, 4, 5, 7, 8, 2]
+    assert len(expand_ranges(np.array([4]), np.array([4]))) == 0
+
+
+def test_csr_groups_every_edge_by_node():
+    src, _ = random_edges(40, 300, seed=1)
+    indptr, order = build_csr(src, 45)  # Five ids past the last edge stay empty
+    assert len(indptr) == 46 and sorted(order.tolist()) == list(range(300))
+    for node in range(45):
+        expected = [e for e in range(300) if src[e] == node]
+        assert order[indptr[node]:indptr[node + 1]].tolist() == expected
+
+    nodes = np.array([5, 0, 44, 5, 99])  # Repeats are kept; 99 is not in the CSR
+    assert gather(indptr, order, nodes).tolist() == [
+        e for node in [5, 0, 44, 5] for e in range(300) if src[e] == node
+    ]
+    assert degrees(indptr, nodes).tolist() == [int((src == node).sum()) for node in nodes]
+
+
+def adjacency(src, dst, n_nodes):
+    """out_edges / in_edges accessors over CSR arrays, as TransactionGraph builds them"""
+    out_indptr, out_order = build_csr(src, n_nodes)
+    in_indptr, in_order = build_csr(dst, n_nodes)
+
+    def out_edges(nodes):
+        edges = gather(out_indptr, out_order, nodes)
+        return edges, dst[edges]
+
+    def in_edges(nodes):
+        edges = gather(in_indptr, in_order, nodes)
+        return edges, src[edges]
+
+    return out_edges, in_edges
+
+
+def brute_cycles(start, src, dst, amounts, times, max_hops, min_hops, max_time_gap, amount_tolerance):
+    """Every simple cycle through start as a set of edge-id tuples, by exhaustive DFS"""
+    found = set()
+
+    def extend(path, visited):
+        node = dst[path[-1]] if path else start
+        for edge in range(len(src)):
+            if src[edge] != node or np.isnan(times[edge]):
+                continue
+            if path:
+                last = path[-1]
+                if times[edge] < times[last]:
+                    continue
+                if max_time_gap is not None and times[edge] - times[path[0]] > max_time_gap:
+                    continue
+                if amount_tolerance is not None and abs(amounts[edge] - amounts[last]) > amount_tolerance * amounts[last]:
+                    continue
+            hops = len(path) + 1
+            if dst[edge] == start:
+                if hops >= min_hops:
+                    found.add(tuple(path) + (edge,))
+            elif dst[edge] not in visited and hops < max_hops:
+                extend(path + [edge], visited | {dst[edge]})
+
+    extend([], {start})
+    return found
+
+
+def test_find_cycles_matches_brute_force():
+    n_nodes = 9
+    src, dst = random_edges(n_nodes, 45, seed=4)
+    rng = np.random.default_rng(5)
+    times = rng.integers(0, 30, len(src)).astype(np.float64)
+    times[::11] = np.nan  # Missing steps are never followed
+    amounts = rng.choice([90.0, 100.0, 110.0, 150.0], len(src))
+    out_edges, in_edges = adjacency(src, dst, n_nodes)
+
+    cases = [
+        dict(max_hops=4, min_hops=2, max_time_gap=None, amount_tolerance=None),
+        dict(max_hops=5, min_hops=3, max_time_gap=12.0, amount_tolerance=None),
+        dict(max_hops=6, min_hops=2, max_time_gap=None, amount_tolerance=0.15),
+    ]
+    total = 0
+    for start in range(n_nodes):
+        for case in cases:
+            expected = brute_cycles(start, src, dst, amounts, times, **case)
+            total += len(expected)
+            for prune in (True, False):
+                search = find_cycles(
+                    start, out_edges, in_edges, n_nodes, amounts, times,
+                    max_cycles=10000, prune_unreachable=prune, **case
+                )
+                assert search.complete
+                assert len(search.cycles) == len(set(search.cycles))
+                assert set(search.cycles) == expected
+    assert total > 0
+
+
+def test_find_cycles_stops_at_limits():
+    # Complete digraph on five nodes: plenty of cycles through node 0
+    pairs = [(a, b) for a in range(5) for b in range(5) if a != b]
+    src = np.array([a for a, _ in pairs])
+    dst = np.array([b for _, b in pairs])
+    out_edges, in_edges = adjacency(src, dst, 5)
+    amounts = np.ones(len(src))
+    times = np.zeros(len(src))
+
+    capped = find_cycles(0, out_edges, in_edges, 5, amounts, times, max_cycles=3)
+    assert len(capped.cycles) == 3 and not capped.complete
+    budget = find_cycles(0, out_edges, in_edges, 5, amounts, times, max_expansions=2)
+    assert budget.expansions == 2 and not budget.complete
+    # Every cycle through 0 of 2..5 hops: sum over k of (4 permute k-1)
+    assert len(find_cycles(0, out_edges, in_edges, 5, amounts, times, max_cycles=1000).cycles) == 4 + 12 + 24 + 24
+
+
+def brute_paths(source, target, src, dst, times, max_hops, max_time_gap):
+    """Every simple time-respecting path from source to target, by exhaustive DFS"""
+    found = set()
+
+    def extend(path, visited):
+        node = dst[path[-1]] if path else source
+        for edge in range(len(src)):
+            if src[edge] != node:
+                continue
+            if path and times[edge] < times[path[-1]]:
+                continue
+            if path and max_time_gap is not None and times[edge] - times[path[0]] > max_time_gap:
+                continue
+            if dst[edge] == target:
+                found.add(tuple(path) + (edge,))
+            elif dst[edge] not in visited and len(path) + 1 < max_hops:
+                extend(path + [edge], visited | {dst[edge]})
+
+    extend([], {source})
+    return found
+
+
+def test_find_paths_matches_brute_force():
+    n_nodes = 10
+    src, dst = random_edges(n_nodes, 40, seed=6)
+    times = np.random.default_rng(7).integers(0, 20, len(src)).astype(np.int32)
+    out_edges, in_edges = adjacency(src, dst, n_nodes)
+
+    reachable_pairs = 0
+    for source in range(n_nodes):
+        for target in range(n_nodes):
+            if source == target:
+                continue
+            for max_hops, gap in [(3, None), (5, None), (5, 6)]:
+                expected = brute_paths(source, target, src, dst, times, max_hops, gap)
+                labels = trace_labels(source, target, out_edges, in_edges, src, dst, times, n_nodes, max_hops)
+                search = find_paths(source, target, out_edges, labels, times, max_hops, gap, max_paths=100000)
+                assert search.complete
+                assert set(search.paths) == expected
+                if gap is None:
+                    # Without a gap limit the BFS meeting is exact
+                    assert labels.met == bool(expected)
+                reachable_pairs += bool(expected)
+    assert reachable_pairs > 0
+
+
+def brute_min_cut(source, sink, tails, heads, capacities, n_nodes):
+    """Smallest total capacity leaving a node set that holds source but not sink"""
+    others = [node for node in range(n_nodes) if node not in (source, sink)]
+    best = np.inf
+    for size in range(len(others) + 1):
+        for chosen in combinations(others, size):
+            side = np.zeros(n_nodes, dtype=bool)
+            side[[source, *chosen]] = True
+            best = min(best, capacities[side[tails] & ~side[heads]].sum())
+    return best
+
+
+def test_max_flow_equals_min_cut():
+    rng = np.random.default_rng(12)
+    for trial in range(25):
+        n_nodes = 7
+        tails, heads = random_edges(n_nodes, int(rng.integers(5, 25)), seed=100 + trial)
+        capacities = rng.integers(1, 20, len(tails)).astype(np.float64)
+        flow = max_flow(0, n_nodes - 1, tails, heads, capacities)
+        assert flow == brute_min_cut(0, n_nodes - 1, tails, heads, capacities, n_nodes)
+
+    # Parallel edges add up; an unknown sink carries nothing
+    assert max_flow(1, 2, np.array([1, 1, 2]), np.array([2, 2, 1]), np.array([3.0, 4.5, 9.0])) == 7.5
+    assert max_flow(1, 5, np.array([1]), np.array([2]), np.array([3.0])) == 0.0
+
+
+def union_find_labels(n_nodes, src, dst):
+    """Smallest node id of every node's component"""
+    parent = list(range(n_nodes))
+
+    def find(node):
+        while parent[node] != node:
+            node = parent[node]
+        return node
+
+    for a, b in zip(src.tolist(), dst.tolist()):
+        root_a, root_b = find(a), find(b)
+        parent[max(root_a, root_b)] = min(root_a, root_b)
+    return np.array([find(node) for node in range(n_nodes)])
+
+
+def test_merge_components_matches_union_find():
+    n_nodes = 300
+    src, dst = random_edges(n_nodes, 260, seed=21)
+    labels = np.arange(n_nodes)
+    # Merge in uneven batches, each on top of the previous labels
+    for start, end in [(0, 1), (1, 40), (40, 41), (41, 200), (200, 260)]:
+        labels = merge_components(labels, src[start:end], dst[start:end])
+        assert np.array_equal(labels, union_find_labels(n_nodes, src[:end], dst[:end]))
+    # A long chain needs many rounds of hooking
+    chain = np.arange(1, 500)[::-1]
+    assert np.array_equal(merge_components(np.arange(500), chain, chain - 1), np.zeros(500, dtype=np.int64))
+
+
+def modularity(labels, src, dst):
+    """Newman modularity of a partition of the undirected multigraph"""
+    m = len(src)
+    strength = np.bincount(np.concatenate([src, dst]), minlength=len(labels))
+    internal = np.bincount(labels[src][labels[src] == labels[dst]], minlength=labels.max() + 1)
+    totals = np.bincount(labels, weights=strength)
+    return float((internal / m - (totals / (2 * m)) ** 2).sum())
+
+
+def test_louvain_recovers_planted_communities():
+    # Four 6-cliques joined in a ring by single edges, three leaf accounts
+    # hanging off clique members, and a separate pair of accounts
+    src, dst = [], []
+    for clique in range(4):
+        members = range(clique * 6, clique * 6 + 6)
+        for a, b in combinations(members, 2):
+            src.append(a)
+            dst.append(b)
+        src.append(clique * 6)
+        dst.append((clique * 6 + 9) % 24)
+    for leaf, anchor in [(24, 1), (25, 13), (26, 13)]:
+        src.append(anchor)
+        dst.append(leaf)
+    src += [27]
+    dst += [28]
+    src, dst = np.array(src), np.array(dst)
+
+    labels = louvain(src, dst, 29)
+    planted = np.array([node // 6 for node in range(24)] + [0, 2, 2, 4, 4])
+    # Same partition up to renaming: the label pairs form a one-to-one mapping
+    pairs = set(zip(labels.tolist(), planted.tolist()))
+    assert len(pairs) == len(set(labels.tolist())) == 5
+    assert sorted(set(labels.tolist())) == list(range(5))
+    assert labels.dtype == np.int64
+
+
+def test_louvain_partition_is_valid_on_random_graphs():
+    components_src, components_dst = random_edges(200, 180, seed=31)
+    components = union_find_labels(200, components_src, components_dst)
+    for deadline in (None, 0.0):  # 0.0 is long past: the first level's result is returned
+        labels = louvain(components_src, components_dst, 200, deadline=deadline)
+        assert sorted(set(labels.tolist())) == list(range(labels.max() + 1))
+        # A community never spans two components
+        for community in range(labels.max() + 1):
+            assert len(set(components[labels == community].tolist())) == 1
+        assert modularity(labels, components_src, components_dst) > modularity(components, components_src, components_dst)
+
+
+if __name__ == "__main__":
+    failures = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                check()
+                print(f"✓ {name}")
+            except Exception:
+                failures += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,78 @@
+"""Checks personalized PageRank risk propagation against a dense linear solve"""
+
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SECRET_KEY", "test-only-secret")  # Settings refuse to load without one
+
+import numpy as np
+
+from ml_training.risk_propagation import DAMPING, propagate_risk
+
+N_NODES = 30
+
+# Random multigraph with self-loops, plus nodes 27..29 that have no edges
+_rng = np.random.default_rng(17)
+SRC = _rng.integers(0, 27, 120)
+DST = _rng.integers(0, 27, 120)
+SEEDS = np.zeros(N_NODES)
+SEEDS[[2, 5, 28]] = [3.0, 1.0, 2.0]  # 28 is a seed without edges
+
+
+def dense_ppr(src, dst, n_nodes, seeds, damping=DAMPING):
+    """Solve x = d * (A x + (dangling mass) r) + (1 - d) r exactly"""
+    restart = seeds / seeds.sum()
+    tails = np.concatenate([src, dst])
+    heads = np.concatenate([dst, src])
+    walk = np.zeros((n_nodes, n_nodes))
+    np.add.at(walk, (heads, tails), 1.0)
+    degree = walk.sum(axis=0)
+    dangling = degree == 0
+    walk[:, ~dangling] /= degree[~dangling]
+    walk[:, dangling] = restart[:, None]
+    return np.linalg.solve(np.eye(n_nodes) - damping * walk, (1 - damping) * restart)
+
+
+def test_scores_are_a_distribution():
+    scores, iterations, residual = propagate_risk(SRC, DST, N_NODES, SEEDS)
+    assert residual <= 1e-8 and iterations < 100
+    assert abs(scores.sum() - 1.0) < 1e-12
+    assert scores.min() >= 0
+    # Unreachable nodes only hold mass when they are seeds
+    assert scores[27] == scores[29] == 0 and scores[28] > 0
+
+
+def test_matches_dense_solution():
+    scores, _, _ = propagate_risk(SRC, DST, N_NODES, SEEDS, tol=1e-13, max_iter=1000)
+    assert np.allclose(scores, dense_ppr(SRC, DST, N_NODES, SEEDS), atol=1e-12)
+
+
+def test_warm_start_reaches_the_same_fixed_point():
+    cold, cold_iterations, _ = propagate_risk(SRC, DST, N_NODES, SEEDS, tol=1e-12, max_iter=1000)
+
+    # Last run's scores, from before a few more transactions and a new account arrived
+    previous, _, _ = propagate_risk(SRC[:-10], DST[:-10], N_NODES - 1, SEEDS[:-1])
+    x0 = np.append(previous, 0.0) * 7.0  # Scale does not matter, only the shape
+    warm, warm_iterations, _ = propagate_risk(SRC, DST, N_NODES, SEEDS, tol=1e-12, max_iter=1000, x0=x0)
+    assert np.abs(warm - cold).sum() < 1e-10
+    assert warm_iterations < cold_iterations
+
+    # An all-zero previous vector falls back to starting at the seeds
+    zero, zero_iterations, _ = propagate_risk(SRC, DST, N_NODES, SEEDS, tol=1e-12, max_iter=1000, x0=np.zeros(N_NODES))
+    assert zero_iterations == cold_iterations and np.array_equal(zero, cold)
+
+
+if __name__ == "__main__":
+    failures = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                check()
+                print(f"✓ {name}")
+            except Exception:
+                failures += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,116 @@
+"""Checks for the array-backed RL Q-table and its state discretizer"""
+
+import json
+import os
+import sys
+import tempfile
+import traceback
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from ml_training.rl_discretizer import StateDiscretizer
+from ml_training.rl_fraud_detector import RLFraudDetector
+
+
+@contextmanager
+def scratch_dir():
+    """Run inside a fresh directory; the detector keeps its files under ./backend/ml_models"""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(previous)
+
+
+def sample_transactions(n, seed=7):
+    rng = np.random.default_rng(seed)
+    types = ["TRANSFER", "CASH_OUT", "PAYMENT", "CASH_IN", "DEBIT"]
+    transactions = []
+    for i in range(n):
+        amount = float(rng.lognormal(8, 2))
+        old_orig = float(rng.lognormal(9, 2))
+        old_dest = float(rng.lognormal(9, 2)) if i % 3 else 0.0
+        transactions.append({
+            "type": types[i % len(types)],
+            "amount": amount,
+            "oldbalanceOrg": old_orig,
+            "newbalanceOrig": max(old_orig - amount, 0.0),
+            "oldbalanceDest": old_dest,
+            "newbalanceDest": old_dest + amount,
+        })
+    return transactions
+
+
+def test_discretizer_round_trip():
+    states = np.random.default_rng(1).lognormal(5, 3, size=(500, 18))
+    states[::4] *= -1
+    discretizer = StateDiscretizer(18, 4096).fit(states)
+    keys = discretizer.transform(states)
+    assert keys.dtype == np.int64
+    assert keys.min() >= 0 and keys.max() < 4096
+
+    restored = StateDiscretizer.from_dict(json.loads(json.dumps(discretizer.to_dict())))
+    assert restored.fitted
+    assert np.array_equal(restored.transform(states), keys)
+    # Row by row gives the same keys as the whole batch
+    assert [int(discretizer.transform(s)[0]) for s in states[:20]] == keys[:20].tolist()
+
+
+def test_snapshot_round_trip_is_bitwise():
+    with scratch_dir():
+        detector = RLFraudDetector()
+        assert detector.q_table.dtype == np.float32
+        assert detector.q_table.shape == (65536, 2)
+        np.random.seed(0)
+        transactions = sample_transactions(400)
+        detector.train_on_batch(transactions, [i % 7 == 0 for i in range(400)], epochs=2)
+        assert detector.state_count() > 0
+        expected = np.array(detector.q_table)
+        bins = detector.discretizer.to_dict()
+        model_path = os.path.abspath(detector.model_path)
+
+        # A detector with its own (empty) state directory, pointed at the snapshot
+        with scratch_dir():
+            loaded = RLFraudDetector()
+            assert loaded.state_count() == 0
+            loaded.model_path = model_path
+            loaded.load_model()
+            assert loaded.q_table.tobytes() == expected.tobytes()
+            assert loaded.discretizer.to_dict() == bins
+
+
+def test_legacy_dict_table_is_averaged_per_row():
+    with scratch_dir():
+        detector = RLFraudDetector()
+        # Two states that differ slightly fall into the same bins and share a row
+        state_a = [1000.0] + [0.0] * 17
+        state_b = [1001.0] + [0.0] * 17
+        legacy = {
+            json.dumps(state_a): {0: 0.5, 1: -1.0},
+            json.dumps(state_b): {0: 1.5, 1: 2.0},
+        }
+        row = detector._state_to_key(np.array(state_a))
+        assert row == detector._state_to_key(np.array(state_b))
+
+        detector._load_legacy_q_table(legacy)
+        assert detector.q_table[row].tolist() == [1.0, 0.5]
+        assert detector.state_count() == 1
+
+
+if __name__ == "__main__":
+    failures = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                check()
+                print(f"✓ {name}")
+            except Exception:
+                failures += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,85 @@
+"""Checks that RL workers share one Q-table and do not lose each other's feedback"""
+
+import multiprocessing
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from ml_training.rl_fraud_detector import RLFraudDetector
+from ml_training.rl_update_log import UpdateLog
+from test_rl_qtable import sample_transactions, scratch_dir
+
+FEEDBACK_PER_WORKER = 60
+
+
+def test_feedback_is_visible_to_other_detectors():
+    with scratch_dir():
+        first = RLFraudDetector()
+        second = RLFraudDetector()  # Same directory: maps the files the first one built
+
+        tx = sample_transactions(1)[0]
+        first.learn_from_feedback(tx, 1, 1)
+        row = first._state_to_key(first._get_state_features(tx))
+        assert second.q_table[row, 1] == first.q_table[row, 1] != 0
+        assert second.seq == 1 and second.correct_predictions == 1
+
+        second.predict(tx, use_exploration=False)
+        assert first.total_predictions == 1
+
+
+def test_refit_bins_reach_other_detectors():
+    with scratch_dir():
+        first = RLFraudDetector()
+        second = RLFraudDetector()
+        assert not second.discretizer.fitted
+
+        np.random.seed(1)
+        first.train_on_batch(sample_transactions(200), [0] * 200)
+        assert first.discretizer.fitted
+        second.get_statistics()  # Any call picks up the new generation
+        assert second.discretizer.to_dict() == first.discretizer.to_dict()
+
+        first.reset()
+        assert second.get_statistics()["total_states"] == 0
+        assert not second.discretizer.fitted
+
+
+def _send_feedback(worker):
+    detector = RLFraudDetector()
+    for i, tx in enumerate(sample_transactions(FEEDBACK_PER_WORKER, seed=worker)):
+        detector.learn_from_feedback(tx, i % 2, 1)
+
+
+def test_concurrent_workers_lose_no_updates():
+    with scratch_dir():
+        parent = RLFraudDetector()
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_send_feedback, args=(w,)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0
+
+        total = 4 * FEEDBACK_PER_WORKER
+        assert parent.seq == total
+        assert parent.correct_predictions == total // 2
+        assert UpdateLog(parent.log_path).read()["seq"].tolist() == list(range(1, total + 1))
+
+
+if __name__ == "__main__":
+    failures = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                check()
+                print(f"✓ {name}")
+            except Exception:
+                failures += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,67 @@
+"""Checks that vectorized RL training matches the per-transaction loop bit for bit"""
+
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from ml_training.rl_fraud_detector import RLFraudDetector
+from test_rl_qtable import sample_transactions, scratch_dir
+
+
+def train(transactions, labels, vectorized, seed=42, epochs=3):
+    """Train a fresh detector; returns everything the two paths must agree on"""
+    with scratch_dir():
+        detector = RLFraudDetector()
+        np.random.seed(seed)
+        detector.train_on_batch(transactions, labels, epochs=epochs, vectorized=vectorized)
+        return {
+            "q_table": np.array(detector.q_table).tobytes(),
+            "counters": (detector.total_predictions, detector.correct_predictions),
+            "rewards": detector.rewards_received,
+            "exploration_rate": detector.exploration_rate,
+            "next_draw": np.random.random(),
+        }
+
+
+def assert_same_training(transactions, labels):
+    vectorized = train(transactions, labels, vectorized=True)
+    sequential = train(transactions, labels, vectorized=False)
+    for key in sequential:
+        assert vectorized[key] == sequential[key], f"{key} differs"
+
+
+def test_uniform_batch():
+    transactions = sample_transactions(1500, seed=5)
+    labels = [int(i % 9 == 0) for i in range(1500)]
+    assert_same_training(transactions, labels)
+
+
+def test_skewed_batch():
+    # A few hot transactions repeated hundreds of times: large early rounds
+    # run vectorized, their long tail runs through the scalar loop
+    rng = np.random.default_rng(8)
+    distinct = sample_transactions(400, seed=9)
+    hot = distinct[:3]
+    transactions = distinct + [hot[i % 3] for i in range(600)]
+    order = rng.permutation(len(transactions))
+    transactions = [transactions[i] for i in order]
+    labels = rng.integers(0, 2, size=len(transactions)).tolist()
+    assert_same_training(transactions, labels)
+
+
+if __name__ == "__main__":
+    failures = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                check()
+                print(f"✓ {name}")
+            except Exception:
+                failures += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    sys.exit(1 if failures else 0)
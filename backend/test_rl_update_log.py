@@ -0,0 +1,91 @@
+"""Checks that RL feedback replayed from the update log rebuilds the same Q-table"""
+
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from ml_training.rl_fraud_detector import RLFraudDetector
+from ml_training.rl_update_log import RECORD_DTYPE, UpdateLog, apply_records
+from test_rl_qtable import sample_transactions, scratch_dir
+
+
+def test_torn_record_is_dropped():
+    with tempfile.TemporaryDirectory() as path:
+        log_path = os.path.join(path, "updates.log")
+        log = UpdateLog(log_path)
+        for seq in range(1, 6):
+            log.append(seq, seq * 10, seq % 2, True, 1.0, 0.1 * seq, seq)
+        log.close()
+
+        # A crash halfway through the sixth record
+        with open(log_path, "ab") as f:
+            f.write(b"\x07" * (RECORD_DTYPE.itemsize // 2))
+
+        assert UpdateLog(log_path).read()["seq"].tolist() == [1, 2, 3, 4, 5]
+        assert UpdateLog(log_path).read(after_seq=3)["state"].tolist() == [40, 50]
+
+        # Reopening for append cuts the torn bytes, so the next record stays aligned
+        log = UpdateLog(log_path)
+        log.append(6, 60, 0, False, -0.5, 0.25, 6)
+        assert log.size() == 6
+        assert log.read()["q"][-1] == np.float32(0.25)
+        log.close()
+
+
+def test_last_record_per_cell_wins():
+    records = np.array([
+        (1, 3, 1, 1, 1.0, 0.1, 1),
+        (2, 3, 0, 0, -0.5, -0.05, 2),
+        (3, 3, 1, 1, 1.0, 0.19, 3),
+        (4, 5, 1, 0, -2.0, -0.2, 4),
+    ], dtype=RECORD_DTYPE)
+    q_table = np.zeros((8, 2), dtype=np.float32)
+    apply_records(q_table, records)
+    assert q_table[3].tolist() == [np.float32(-0.05), np.float32(0.19)]
+    assert q_table[5, 1] == np.float32(-0.2)
+    assert np.count_nonzero(q_table) == 3
+
+
+def test_restart_replays_snapshot_and_log():
+    transactions = sample_transactions(100, seed=11)
+    with scratch_dir():
+        detector = RLFraudDetector()
+        detector.snapshot_every = 30  # Compacts three times; the last 10 updates stay in the log
+        np.random.seed(3)
+        for i, tx in enumerate(transactions):
+            prediction = detector.predict(tx)
+            detector.learn_from_feedback(tx, prediction["is_fraud"], int(i % 5 == 0))
+        assert detector.update_log.size() == 10
+
+        expected_q = np.array(detector.q_table)
+        expected = (detector.seq, detector.total_predictions, detector.correct_predictions)
+        expected_rewards = detector.rewards_received
+
+        # Drop the shared mapping, so the next detector rebuilds from the snapshot and log alone
+        detector.update_log.close()
+        shutil.rmtree(detector.shared_dir)
+
+        restarted = RLFraudDetector()
+        assert restarted.q_table.tobytes() == expected_q.tobytes()
+        assert (restarted.seq, restarted.total_predictions, restarted.correct_predictions) == expected
+        assert restarted.rewards_received == expected_rewards
+
+
+if __name__ == "__main__":
+    failures = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                check()
+                print(f"✓ {name}")
+            except Exception:
+                failures += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    sys.exit(1 if failures else 0)
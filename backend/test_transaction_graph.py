@@ -0,0 +1,215 @@
+"""Checks the transaction graph index against a brute-force walk over the same rows"""
+
+import json
+import os
+import sys
+import tempfile
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SECRET_KEY", "test-only-secret")  # Settings refuse to load without one
+
+import numpy as np
+
+from app.core.account_clusters import BULK_MERGE_MIN_EDGES, AccountClusters
+from app.core.graph_snapshot import CURRENT_FILE, SNAPSHOT_KEEP, read_snapshot
+from app.core.transaction_graph import TransactionGraph
+
+
+def make_rows(n_accounts, n_rows, seed, first_id=1):
+    """fraud_transactions tuples: (id, name_orig, name_dest, amount, step, is_fraud, type)"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n_rows):
+        rows.append((
+            first_id + i,
+            f"C{rng.integers(n_accounts)}",
+            f"C{rng.integers(n_accounts)}",
+            float(rng.integers(1, 10) * 100),
+            int(rng.integers(1, 50)),
+            int(rng.random() < 0.1),
+            "TRANSFER",
+        ))
+    return rows
+
+
+def brute_neighbourhood(rows, account, hops, direction, min_amount=None, fraud_only=False):
+    """Per-hop BFS straight over the row list; returns ({account: hop}, {tx id})"""
+    seen = {account: 0}
+    frontier = {account}
+    tx_ids = set()
+    for hop in range(1, hops + 1):
+        reached = set()
+        for tx_id, orig, dest, amount, _, is_fraud, _ in rows:
+            if (min_amount is not None and amount < min_amount) or (fraud_only and not is_fraud):
+                continue
+            if direction in ("out", "both") and orig in frontier:
+                tx_ids.add(tx_id)
+                reached.add(dest)
+            if direction in ("in", "both") and dest in frontier:
+                tx_ids.add(tx_id)
+                reached.add(orig)
+        frontier = reached - seen.keys()
+        seen.update((name, hop) for name in frontier)
+    return seen, tx_ids
+
+
+def test_neighbourhood_matches_brute_force():
+    loaded = make_rows(50, 250, seed=2)
+    appended = make_rows(60, 40, seed=3, first_id=251)  # Adds accounts C50..C59 too
+    graph = TransactionGraph()
+    graph.add_transactions(loaded)
+    graph._rebuild_csr()  # As after the initial load
+    graph.add_transactions(appended)  # Stays in the pending tail
+    assert graph.snapshot().csr_edges == 250 and graph.n_edges == 290
+
+    rows = loaded + appended
+    for account in ["C0", "C7", "C55"]:
+        for hops in (1, 2, 3):
+            for direction, min_amount, fraud_only in [("both", None, False), ("out", 500.0, False), ("in", None, True)]:
+                result = graph.neighbourhood(
+                    account, hops=hops, direction=direction, min_amount=min_amount, fraud_only=fraud_only
+                )
+                names = [graph.accounts[int(node)] for node in result["node_ids"]]
+                expected_hops, expected_tx = brute_neighbourhood(rows, account, hops, direction, min_amount, fraud_only)
+                assert dict(zip(names, result["node_hops"].tolist())) == expected_hops
+                assert len(names) == len(set(names))
+                assert set(graph.tx_id[result["edge_ids"]].tolist()) == expected_tx
+                assert not result["truncated"]
+
+
+def test_edge_cap_keeps_largest_transactions():
+    rows = [(i, "hub", f"C{i}", float(i), 1, 0, "TRANSFER") for i in range(1, 21)]
+    graph = TransactionGraph()
+    graph.add_transactions(rows)
+    result = graph.neighbourhood("hub", hops=2, max_edges=5)
+    assert result["truncated"]
+    assert sorted(graph.tx_id[result["edge_ids"]].tolist()) == [16, 17, 18, 19, 20]
+    assert graph.neighbourhood("nobody") is None
+
+
+def brute_components(rows):
+    """Per account: (members, transactions, fraud transactions) of its connected component"""
+    group = {}
+    for _, orig, dest, *_ in rows:
+        merged = group.get(orig, {orig}) | group.get(dest, {dest})
+        for name in merged:
+            group[name] = merged
+    per_component = {}
+    for row in rows:
+        counts = per_component.setdefault(id(group[row[1]]), [0, 0])
+        counts[0] += 1
+        counts[1] += row[5]
+    return {name: (members, *per_component[id(members)]) for name, members in group.items()}
+
+
+def test_clusters_match_for_incremental_and_bulk_sync():
+    rows = make_rows(1500, BULK_MERGE_MIN_EDGES + 200, seed=4)
+    incremental_graph, bulk_graph = TransactionGraph(), TransactionGraph()
+    incremental, bulk = AccountClusters(incremental_graph), AccountClusters(bulk_graph)
+    for start in range(0, len(rows), 150):
+        incremental_graph.add_transactions(rows[start:start + 150])
+        incremental.sync()  # Below the bulk threshold: one union per edge
+    bulk_graph.add_transactions(rows)
+    bulk.sync()  # One vectorized merge
+    assert incremental.components == bulk.components
+
+    expected = brute_components(rows)
+    assert len({id(members) for members, _, _ in expected.values()}) == bulk.components
+    assert max(len(members) for members, _, _ in expected.values()) > 100  # Ranked lists are kept past 100 members
+    transactions_of, fraud_of = {}, {}
+    for _, orig, dest, _, _, is_fraud, _ in rows:
+        for name in (orig, dest):
+            transactions_of[name] = transactions_of.get(name, 0) + 1
+            fraud_of[name] = fraud_of.get(name, 0) + is_fraud
+
+    for clusters in (incremental, bulk):
+        graph = clusters.graph
+        rankings = {}
+        for account, (members, transactions, fraud) in expected.items():
+            component = clusters.cluster(account, top=100)["component"]
+            assert (component["size"], component["transactions"], component["fraud_transactions"]) == (
+                len(members), transactions, fraud
+            )
+            # Ties go to the lower node id, which depends on the order accounts were interned
+            if id(members) not in rankings:
+                rankings[id(members)] = sorted(
+                    members, key=lambda name: (-fraud_of[name], -transactions_of[name], graph.account_id(name))
+                )[:100]
+            assert [member["id"] for member in component["top_members"]] == rankings[id(members)]
+
+
+def neighbourhood_by_name(graph, account):
+    result = graph.neighbourhood(account, hops=2)
+    names = [graph.accounts[int(node)] for node in result["node_ids"]]
+    return dict(zip(names, result["node_hops"].tolist())), sorted(graph.tx_id[result["edge_ids"]].tolist())
+
+
+def test_snapshot_round_trip_with_delta():
+    rows = make_rows(80, 300, seed=6)
+    delta = make_rows(90, 40, seed=7, first_id=301)  # Touches accounts C80..C89, new to the snapshot
+    built = TransactionGraph()
+    built.add_transactions(rows)  # All pending: save_snapshot folds them into the CSR
+
+    with tempfile.TemporaryDirectory() as directory:
+        built.save_snapshot(directory)
+        mapped = TransactionGraph()
+        assert mapped.load_snapshot(directory)
+        assert (mapped.n_edges, mapped.watermark, len(mapped.accounts)) == (300, 300, len(built.accounts))
+        assert mapped.account_id("C3") == built.account_id("C3")
+
+        built.add_transactions(delta)
+        mapped.add_transactions(delta)  # Written into the copy-on-write headroom
+        for account in ["C0", "C42", "C85"]:
+            assert neighbourhood_by_name(mapped, account) == neighbourhood_by_name(built, account)
+
+        # The appended rows never reach the files on disk
+        manifest, arrays, _ = read_snapshot(directory)
+        assert manifest["n_edges"] == 300
+        assert len(arrays["tx_id"]) > 340 and not arrays["tx_id"][300:].any()
+
+
+def test_unusable_snapshots_are_skipped():
+    graph = TransactionGraph()
+    graph.add_transactions(make_rows(20, 50, seed=8))
+    with tempfile.TemporaryDirectory() as directory:
+        assert not TransactionGraph().load_snapshot(directory)  # Nothing written yet
+        version = graph.save_snapshot(directory)
+        # The table was reset since: its highest id is below the snapshot's watermark
+        assert not TransactionGraph().load_snapshot(directory, latest_id=10)
+        assert not graph.load_snapshot(directory)  # Only into an empty index
+
+        manifest_path = os.path.join(directory, version, "manifest.json")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest["format"] += 1
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+        assert read_snapshot(directory) is None
+
+
+def test_old_snapshot_versions_are_pruned():
+    graph = TransactionGraph()
+    with tempfile.TemporaryDirectory() as directory:
+        versions = []
+        for batch in range(4):
+            graph.add_transactions(make_rows(30, 25, seed=batch, first_id=batch * 25 + 1))
+            versions.append(graph.save_snapshot(directory))
+        kept = sorted(name for name in os.listdir(directory) if name.startswith("v"))
+        assert kept == sorted(versions[-SNAPSHOT_KEEP:])
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            assert f.read() == versions[-1]
+
+
+if __name__ == "__main__":
+    failures = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                check()
+                print(f"✓ {name}")
+            except Exception:
+                failures += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    sys.exit(1 if failures else 0)
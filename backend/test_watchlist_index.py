@@ -0,0 +1,103 @@
+"""Checks for the watchlist membership index in set and Bloom filter modes"""
+
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SECRET_KEY", "test-only-secret")  # Settings refuse to load without one
+
+from sqlalchemy import create_engine
+
+from app.core.watchlist_index import BloomFilter, WatchlistIndex
+from app.db.models import WatchlistWallet
+
+MEMBERS = [f"0xwatch{i:06d}" for i in range(20000)]
+OUTSIDERS = [f"0xother{i:06d}" for i in range(20000)]
+
+
+def false_positive(index):
+    """An address the Bloom filter reports although it was never added"""
+    return next(address for address in OUTSIDERS if index.might_contain(address))
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(len(MEMBERS), error_rate=0.01)
+    for address in MEMBERS:
+        bloom.add(address)
+    assert all(address in bloom for address in MEMBERS)
+
+    rate = sum(address in bloom for address in OUTSIDERS) / len(OUTSIDERS)
+    assert rate < 0.02, rate
+    assert bloom.nbytes < 1.25 * len(MEMBERS)  # ~1.2 bytes per entry at 1%
+
+    # Filled past capacity it only gets less precise, never loses a member
+    small = BloomFilter(100, error_rate=0.01)
+    for address in MEMBERS[:2000]:
+        small.add(address)
+    assert all(address in small for address in MEMBERS[:2000])
+
+
+def test_set_and_bloom_modes_count_the_same():
+    exact = WatchlistIndex(bloom_min_entries=len(MEMBERS) + 1)
+    bloom = WatchlistIndex(bloom_min_entries=1000)
+    for index in (exact, bloom):
+        index.rebuild(MEMBERS)
+    assert exact.stats()["mode"] == "set" and bloom.stats()["mode"] == "bloom"
+
+    # Each call follows one row of watchlist_wallets changing state in the DB
+    newcomer = false_positive(bloom)  # Already looks present in the filter
+    changes = [
+        ("discard", MEMBERS[0]),
+        ("discard", MEMBERS[1]),
+        ("add", MEMBERS[0]),
+        ("add", newcomer),
+        ("discard", newcomer),
+        ("add", "0xbrand-new"),
+    ]
+    for method, address in changes:
+        for index in (exact, bloom):
+            getattr(index, method)(address)
+        assert exact.size == bloom.size
+
+    assert exact.size == len(MEMBERS)  # Three additions, three removals
+    for address in (MEMBERS[0], MEMBERS[2], "0xbrand-new"):
+        assert exact.might_contain(address) and bloom.might_contain(address)
+    for address in (MEMBERS[1], newcomer):
+        assert not exact.might_contain(address) and not bloom.might_contain(address)
+
+    # A removal can be repeated without counting twice
+    bloom.discard(MEMBERS[1])
+    assert bloom.size == exact.size
+
+
+def test_bloom_positives_are_confirmed_in_the_database():
+    engine = create_engine("sqlite://")
+    WatchlistWallet.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(WatchlistWallet.__table__.insert(), [
+            {"wallet_address": address, "active": address != MEMBERS[5]} for address in MEMBERS
+        ])
+
+    index = WatchlistIndex(bloom_min_entries=1000)
+    index.rebuild(MEMBERS)
+    stray = false_positive(index)
+    with engine.connect() as connection:
+        assert index.contains(MEMBERS[7], connection)
+        assert not index.contains(stray, connection)
+        assert not index.contains(MEMBERS[5], connection)  # Deactivated since the rebuild
+        assert not index.contains(None, connection)
+
+
+if __name__ == "__main__":
+    failures = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                check()
+                print(f"✓ {name}")
+            except Exception:
+                failures += 1
+                print(f"✗ {name}")
+                traceback.print_exc()
+    sys.exit(1 if failures else 0)